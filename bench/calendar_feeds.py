@@ -0,0 +1,106 @@
+"""
+Benchmark serializacji kalendarza instruktora przy 10k wydarzeń w jednej odpowiedzi.
+
+Porównuje dawną ścieżkę ORM (joinedload + słownik z każdej instancji) z lekką
+warstwą krotek kolumn z calendarproject.utils.calendar_feeds. Oba warianty są mierzone
+razem z serializacją odpowiedzi przez jsonify (dostawcę JSON aplikacji).
+
+Uruchomienie (baza SQLite w pamięci, bez Postgresa i Redisa):
+
+    SECRET_KEY=bench DATABASE_URL=sqlite:///:memory: python -m bench.calendar_feeds
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+from sqlalchemy.orm import joinedload
+
+from calendarproject.app import create_app
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.user import User
+from calendarproject.utils.calendar_feeds import instructor_events
+
+EVENTS = 10_000
+ROUNDS = 5
+STUDENTS = 50
+
+
+def orm_events(instructor_id, start, end):
+    appointments = Appointment.instructor_feed_query(instructor_id, start, end).options(
+        joinedload(Appointment.student)).all()
+    events = []
+    for appointment in appointments:
+        student_name = f"{appointment.student.first_name} {appointment.student.last_name}" if appointment.student else ""
+        events.append({
+            'id': appointment.id,
+            'titleMessage': 'Dostępny' if appointment.is_available else f'Temat konsultacji: {appointment.topic}',
+            'title': '',
+            'student': student_name,
+            'is_available': appointment.is_available,
+            'start': appointment.start_time,
+            'end': appointment.end_time,
+            'color': '#1B8359' if appointment.is_available else ('#996C00' if appointment.status == 'pending' else '#9C27B0'),
+            'status': appointment.status
+        })
+    return events
+
+
+def seed():
+    instructor = User(username='bench_instructor', email='bench_instructor@example.com', password_hash='-',
+                      first_name='Bench', last_name='Instructor', is_instructor=True)
+    students = [User(username=f'bench_student{i}', email=f'bench_student{i}@example.com', password_hash='-',
+                     first_name='Student', last_name=f'Nr {i}') for i in range(STUDENTS)]
+    db.session.add_all([instructor] + students)
+    db.session.commit()
+
+    start = datetime(2030, 1, 7, 8, 0)
+    rows = []
+    for i in range(EVENTS):
+        slot_start = start + timedelta(minutes=15 * i)
+        # Co trzeci termin zarezerwowany, z kopią imienia i nazwiska jak przy rezerwacji (try_book)
+        student = students[i % STUDENTS] if i % 3 == 0 else None
+        rows.append({
+            'instructor_id': instructor.id,
+            'student_id': student.id if student else None,
+            'student_name': f'{student.first_name} {student.last_name}' if student else None,
+            'start_time': slot_start,
+            'end_time': slot_start + timedelta(minutes=15),
+            'is_available': student is None,
+            'topic': f'Temat {i}' if student else None,
+            'status': ('confirmed' if i % 2 else 'pending') if student else 'available',
+        })
+    db.session.execute(Appointment.__table__.insert(), rows)
+    db.session.commit()
+    return instructor.id, start, start + timedelta(minutes=15 * EVENTS)
+
+
+def measure(name, build, *args):
+    best = None
+    for _ in range(ROUNDS):
+        db.session.expunge_all()
+        began = time.perf_counter()
+        events = build(*args)
+        body = jsonify(events).get_data()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    assert len(events) == EVENTS
+    print(f"{name:<8} {best * 1000:8.1f} ms / odpowiedź  {best / EVENTS * 1e6:6.2f} µs / wiersz  "
+          f"{len(body) / 1024:7.1f} KiB")
+    return best, body
+
+
+def main():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        args = seed()
+        orm, orm_body = measure('ORM', orm_events, *args)
+        rows, rows_body = measure('krotki', instructor_events, *args)
+        # Obie ścieżki muszą dawać tę samą odpowiedź, inaczej porównanie nie ma sensu
+        assert orm_body == rows_body
+        print(f"przyspieszenie: {orm / rows:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,18 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify
 from flask_login import login_required, current_user
-from calendarproject.models.appointment import Appointment
+from calendarproject import tasks
+from calendarproject.models.instructor_deletion_job import InstructorDeletionJob
+from calendarproject.models.instructor_import_job import InstructorImportJob
 from calendarproject.models.user import User
 from calendarproject.extensions import db
 from calendarproject.forms.forms import CreateInstructorForm
-from calendarproject.models.notification import Notification
+from calendarproject.utils import (admin_dashboard, instructor_deletion, instructor_directory, instructor_import,
+                                   utilization)
+from calendarproject.utils.calendar_cache import cache_stats
+from calendarproject.utils.weeks import parse_range
+import pytz
 import traceback
+from datetime import datetime, timedelta
 
 admin = Blueprint('admin', __name__)
 
@@ -16,24 +23,51 @@ def dashboard():
         flash('Access denied. You must be an admin to view this page.', 'error')
         return redirect(url_for('page.home'))
 
-    # Fetch appointments for the current instructor
-    appointments = Appointment.query.filter_by(instructor_id=current_user.id).all()
+    # Tabele instruktorów i terminów są ładowane stronami przez /admin/api/...
+    form = CreateInstructorForm()
+    return render_template('admin/dashboard.html',
+                           form=form,
+                           page_size=admin_dashboard.DEFAULT_PAGE_SIZE)
 
-    # Separate booked and available appointments
-    booked_appointments = [apt for apt in appointments if not apt.is_available]
-    available_appointments = [apt for apt in appointments if apt.is_available]
 
-    # Get instructors for the instructor list
-    instructors = User.query.filter_by(is_instructor=True, deleted=False).all()
+@admin.route('/admin/api/instructors', methods=['GET'])
+@login_required
+def get_instructor_page():
+    """
+    Strona instruktorów z liczbami terminów; następna strona: ?after_id=<next.after_id>.
+    """
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
 
-    # Form for adding a new instructor
-    form = CreateInstructorForm()
+    limit = admin_dashboard.page_size(request.args.get('limit', type=int))
+    items, next_id = admin_dashboard.instructor_page(request.args.get('after_id', type=int), limit)
+    return jsonify({'items': items, 'next': {'after_id': next_id} if next_id is not None else None})
 
-    return render_template('admin/dashboard.html',
-                           booked_appointments=booked_appointments,
-                           available_appointments=available_appointments,
-                           instructors=instructors,
-                           form=form)
+
+@admin.route('/admin/api/instructors/<int:instructor_id>/appointments', methods=['GET'])
+@login_required
+def get_appointment_page(instructor_id):
+    """
+    Strona terminów instruktora; następna strona: ?after=<next.after>&after_id=<next.after_id>.
+    """
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    after = None
+    after_str = request.args.get('after', type=str)
+    after_id = request.args.get('after_id', type=int)
+    if after_str or after_id is not None:
+        try:
+            after = (datetime.fromisoformat(after_str), after_id)
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Nieprawidłowy kursor strony.'}), 400
+        if after_id is None:
+            return jsonify({'status': 'error', 'message': 'Nieprawidłowy kursor strony.'}), 400
+
+    limit = admin_dashboard.page_size(request.args.get('limit', type=int))
+    items, cursor = admin_dashboard.appointment_page(instructor_id, after, limit)
+    return jsonify({'items': items,
+                    'next': {'after': cursor[0], 'after_id': cursor[1]} if cursor is not None else None})
 
 
 @admin.route('/admin/delete_instructor/<int:instructor_id>', methods=['POST'])
@@ -58,50 +92,30 @@ def delete_instructor(instructor_id):
             return jsonify({'status': 'error', 'message': 'Wskazany użytkownik nie jest instruktorem.'}), 400
 
         instructor_name = f"{instructor_to_delete.first_name} {instructor_to_delete.last_name}"
-        current_app.logger.info(f"Przygotowanie do usunięcia instruktora: {instructor_name} (ID: {instructor_id})")
-
-        # Pobierz tylko zarezerwowane terminy instruktora, aby poinformować studentów
-        booked_appointments = Appointment.query.filter(
-            Appointment.instructor_id == instructor_id,
-            Appointment.is_available == False
-        ).all()
-
-        current_app.logger.info(
-            f"Znaleziono {len(booked_appointments)} zarezerwowanych terminów instruktora do powiadomień.")
-
-        # Zbierz unikalne ID studentów do powiadomienia
-        student_ids = set()
-        for appointment in booked_appointments:
-            if appointment.student_id:
-                student_ids.add(appointment.student_id)
-
-        # Utwórz powiadomienia dla studentów
-        for student_id in student_ids:
-            notification = Notification(
-                user_id=student_id,
-                message=f'Konto instruktora {instructor_name} zostało usunięte, toteż wszystkie terminy spotkań zostały odwołane.',
-                type="instructor_deleted",
-                related_id=instructor_id
-            )
-            db.session.add(notification)
-
-        # Usuń wszystkie terminy instruktora (zarówno zarezerwowane jak i dostępne)
-        deleted_appointments_count = Appointment.query.filter(
-            Appointment.instructor_id == instructor_id
-        ).delete()
-
-        current_app.logger.info(f"Usunięto wszystkie ({deleted_appointments_count}) terminy instruktora.")
-
-        # Usuń instruktora
-        instructor_to_delete.soft_delete()
-        db.session.commit()
-
-        current_app.logger.info(f"Instruktor {instructor_name} (ID: {instructor_id}) został pomyślnie usunięty.")
+
+        # Usuwanie już trwa - zwracamy istniejące zadanie
+        job = instructor_deletion.active_job(instructor_id)
+        if job is None:
+            job = instructor_deletion.start(instructor_to_delete)
+            current_app.logger.info(
+                f"Zlecono usunięcie instruktora: {instructor_name} (ID: {instructor_id}), zadanie {job.id}")
+            try:
+                tasks.delete_instructor.delay(job.id)
+            except Exception as e:
+                current_app.logger.error(f"Nie udało się zlecić zadania usuwania {job.id}: {e}", exc_info=True)
+                job.status = instructor_deletion.FAILED
+                job.error = 'Kolejka zadań jest niedostępna.'
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                return jsonify({'status': 'error', 'message': 'Nie udało się zlecić usunięcia instruktora.',
+                                'job': instructor_deletion.job_to_dict(job)}), 503
+
         return jsonify({
             'status': 'success',
-            'message': f'Instruktor {instructor_name} został pomyślnie usunięty wraz z {deleted_appointments_count} terminami.',
-            'notified_students': len(student_ids)
-        })
+            'message': f'Usuwanie instruktora {instructor_name} zostało zlecone.',
+            'job': instructor_deletion.job_to_dict(job),
+            'status_url': url_for('admin.get_deletion_job', job_id=job.id)
+        }), 202
 
     except Exception as e:
         db.session.rollback()
@@ -109,6 +123,122 @@ def delete_instructor(instructor_id):
         return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas usuwania instruktora.'}), 500
 
 
+@admin.route('/admin/deletion_jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_deletion_job(job_id):
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    job = db.session.get(InstructorDeletionJob, job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Nie znaleziono zadania.'}), 404
+    return jsonify({'status': 'success', 'job': instructor_deletion.job_to_dict(job)})
+
+
+@admin.route('/admin/utilization', methods=['GET'])
+@login_required
+def utilization_report():
+    """
+    Wykorzystanie instruktorów w zakresie start-end (opcjonalnie instructor_id) z podsumowań dziennych.
+    Zakres jest rozszerzany do pełnych dni UTC; odpowiedź podaje objęty zakres (start, end).
+    """
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    try:
+        start_utc, end_utc = parse_range(
+            request.args.get('start', type=str),
+            request.args.get('end', type=str),
+            request.args.get('timeZone', type=str, default='UTC')
+        )
+    except pytz.UnknownTimeZoneError:
+        return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe żądanie'}), 400
+
+    max_days = current_app.config['UTILIZATION_REPORT_MAX_WINDOW_DAYS']
+    if end_utc <= start_utc or end_utc - start_utc > timedelta(days=max_days):
+        return jsonify({'status': 'error',
+                        'message': f'Zakres musi być dodatni i nie dłuższy niż {max_days} dni.'}), 400
+
+    try:
+        return jsonify(utilization.report(start_utc, end_utc, request.args.get('instructor_id', type=int)))
+    except Exception as e:
+        current_app.logger.error(f"Błąd podczas tworzenia raportu wykorzystania: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas tworzenia raportu.'}), 500
+
+
+@admin.route('/admin/cache_stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    try:
+        return jsonify(cache_stats())
+    except Exception as e:
+        current_app.logger.error(f"Błąd podczas pobierania statystyk cache: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Statystyki cache są niedostępne.'}), 503
+
+
+@admin.route('/admin/import_instructors', methods=['POST'])
+@login_required
+def import_instructors():
+    """
+    Zleca założenie kont instruktorów z pliku CSV (pole file); raport błędów wierszy
+    jest dostępny pod status_url po zakończeniu zadania.
+    """
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Brak pliku do importu.'}), 400
+
+    try:
+        data = upload.read().decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        current_app.logger.warning(f"Nieprawidłowy plik importu instruktorów: {e}")
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowy plik.'}), 400
+
+    try:
+        job = instructor_import.start(current_user, data)
+        try:
+            tasks.import_instructors.delay(job.id)
+        except Exception as e:
+            current_app.logger.error(f"Nie udało się zlecić zadania importu {job.id}: {e}", exc_info=True)
+            job.status = instructor_import.FAILED
+            job.error = 'Kolejka zadań jest niedostępna.'
+            job.data = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return jsonify({'status': 'error', 'message': 'Nie udało się zlecić importu instruktorów.',
+                            'job': instructor_import.job_to_dict(job)}), 503
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Błąd podczas importu instruktorów: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas importu instruktorów.'}), 500
+
+    current_app.logger.info(f"Zlecono import instruktorów, zadanie {job.id}")
+    return jsonify({
+        'status': 'success',
+        'job': instructor_import.job_to_dict(job),
+        'status_url': url_for('admin.get_import_job', job_id=job.id)
+    }), 202
+
+
+@admin.route('/admin/import_jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_import_job(job_id):
+    if not current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+
+    job = db.session.get(InstructorImportJob, job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Nie znaleziono zadania.'}), 404
+    return jsonify({'status': 'success', 'job': instructor_import.job_to_dict(job)})
+
+
 @admin.route('/create_instructor', methods=['POST'])
 @login_required
 def create_instructor():
@@ -144,6 +274,7 @@ def create_instructor():
         try:
             db.session.add(new_instructor)
             db.session.commit()
+            instructor_directory.refresh_instructor(new_instructor.id)
             flash(f'Instruktor {new_instructor.username} został pomyślnie utworzony.', 'success')
         except Exception as e:
             db.session.rollback()
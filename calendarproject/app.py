@@ -9,9 +9,12 @@ from calendarproject.up.views import up
 from calendarproject.auth.views import auth
 from calendarproject.calendar.views import calendar
 from calendarproject.admin.views import admin
+from calendarproject.cli import init_commands
 from calendarproject.models.user import User
 from calendarproject.instructor.views import instructor
 from calendarproject.notifications.views import notifications
+from calendarproject.utils.json_provider import CalendarJSONProvider
+from calendarproject.utils.rate_limit import init_rate_limit
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -71,6 +74,7 @@ def create_app(settings_override=None):
     Create a Flask application using the app factory pattern.
     """
     app = Flask(__name__, static_folder="../public", static_url_path="")
+    app.json = CalendarJSONProvider(app)
 
     app.config.from_object("config.settings")
 
@@ -106,6 +110,8 @@ def extensions(app):
     flask_static_digest.init_app(app)
     init_login_manager(app)
     init_mail(app)
+    init_rate_limit(app)
+    init_commands(app)
     return None
 
 
@@ -1,19 +1,28 @@
-from operator import or_
-
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment import BOOKING_LEAD_TIME, Appointment
 from calendarproject.extensions import db
-from dateutil import parser
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
+from itertools import chain
 import pytz
 
-from calendarproject.models.notification import Notification
-from calendarproject.utils.notifications import notify_instructor_new_appointment
+from calendarproject.models.user import User
+from calendarproject.utils import availability, availability_rules, ics_feeds, slot_search
+from calendarproject.utils.notifications import notify, notify_instructor_new_appointment
+from calendarproject.utils.calendar_cache import get_available_events, get_version, invalidate_slots
+from calendarproject.utils.calendar_feeds import (iter_available_events, iter_student_booking_events,
+                                                  rule_events, student_booking_events)
+from calendarproject.utils.http_cache import is_fresh, make_etag, not_modified, with_etag
+from calendarproject.utils.weeks import naive_utc, parse_datetime, parse_range
 import json
 
 calendar = Blueprint('calendar', __name__)
 
+MAX_AVAILABILITY_WINDOW = timedelta(weeks=5)
+MAX_SLOT_SEARCH_LIMIT = 50
+MAX_SLOT_SEARCH_INSTRUCTORS = 50
+
 
 @calendar.route('/view')
 @login_required
@@ -21,7 +30,7 @@ def view():
     if current_user.is_instructor or current_user.is_admin:
         flash('Odmowa dostępu. Musisz być studentem, aby zobaczyć tę stronę.', 'error')
         return redirect(url_for('page.home'))
-    return render_template('calendar/view.html')
+    return render_template('calendar/view.html', feed_url=ics_feeds.feed_url(current_user))
 
 
 @calendar.route('/calendar/get_appointments')
@@ -31,89 +40,68 @@ def get_appointments():
         flash('Odmowa dostępu. Musisz być studentem, aby zobaczyć tę stronę.', 'error')
         return redirect(url_for('page.home'))
 
-    # Pobierz parametry zapytania
-    start_str = request.args.get('start', type=str)
-    end_str = request.args.get('end', type=str)
-    tz_str = request.args.get('timeZone', type=str, default='UTC')
     instructor_id = request.args.get('instructor_id', type=int)
+    stream = request.args.get('stream', default=False, type=_flag)
 
     try:
-        # Parsowanie strefy czasowej
-        try:
-            tz = pytz.timezone(tz_str)
-        except pytz.UnknownTimeZoneError:
-            return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
-
-        # Parsowanie start i end
-        start = parser.isoparse(start_str)
-        end = parser.isoparse(end_str)
-
-        # Lokalizacja dat, jeśli są "naiwne"
-        if start.tzinfo is None:
-            start = tz.localize(start)
-        else:
-            start = start.astimezone(tz)
-
-        if end.tzinfo is None:
-            end = tz.localize(end)
-        else:
-            end = end.astimezone(tz)
-
-        # Konwersja na UTC, zakładając, że baza danych przechowuje czasy w UTC
-        start_utc = start.astimezone(pytz.UTC)
-        end_utc = end.astimezone(pytz.UTC)
-
-        # Przygotowanie zapytania bazowego
-        query = Appointment.query.filter(
-            Appointment.start_time >= start_utc,
-            Appointment.start_time <= end_utc
+        start_utc, end_utc = parse_range(
+            request.args.get('start', type=str),
+            request.args.get('end', type=str),
+            request.args.get('timeZone', type=str, default='UTC')
         )
+    except pytz.UnknownTimeZoneError:
+        return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe żądanie'}), 400
 
-        # Dodanie filtra instruktora, jeśli podano instructor_id
-        if instructor_id:
-            query = query.filter(Appointment.instructor_id == instructor_id)
+    # Górna granica okna, żeby jedno żądanie nie wczytało całej tabeli terminów
+    max_days = current_app.config['CALENDAR_STREAM_MAX_WINDOW_DAYS' if stream else 'CALENDAR_MAX_WINDOW_DAYS']
+    if end_utc <= start_utc or end_utc - start_utc > timedelta(days=max_days):
+        return jsonify({'status': 'error',
+                        'message': f'Zakres musi być dodatni i nie dłuższy niż {max_days} dni.'}), 400
 
-        # Filtrowanie terminów: dostępne lub zarezerwowane przez bieżącego użytkownika
-        query = query.filter(
-            or_(
-                Appointment.is_available == True,
-                Appointment.student_id == current_user.id
-            )
-        )
+    # ETag z wersji kalendarza - gdy klient ma aktualne dane, nie czytamy terminów z bazy
+    version = get_version(instructor_id)
+    etag = make_etag('student', current_user.id, version, request.query_string.decode()) if version else None
+    if is_fresh(etag):
+        return not_modified(etag)
 
-        appointments = query.all()
-
-        # Przygotowanie wydarzeń do zwrócenia
-        events = []
-        for appointment in appointments:
-            if appointment.is_available:
-                title = 'Dostępny'
-                color = '#1B8359'
-            elif appointment.student_id == current_user.id and appointment.status != 'confirmed':
-                title = f'Temat konsultacji: {appointment.topic}'
-                color = '#996C00'
-            elif appointment.student_id == current_user.id and appointment.status == 'confirmed':
-                title = f'Temat konsultacji: {appointment.topic}'
-                color = '#9C27B0'
-            else:
-                continue  # Pomijanie terminów zarezerwowanych przez innych uczniów
-
-            events.append({
-                'id': appointment.id,
-                'titleMessage': title,
-                'title': '',
-                'start': appointment.start_time.isoformat(),
-                'end': appointment.end_time.isoformat(),
-                'color': color,
-            })
-
-        return jsonify(events)
+    if stream:
+        return with_etag(_stream_events(current_user.id, start_utc, end_utc, instructor_id), etag)
+
+    try:
+        # Wolne terminy z cache tygodniowego (wspólne dla wszystkich studentów)
+        events = get_available_events(instructor_id, start_utc, end_utc)
+
+        # Nakładka z terminami zarezerwowanymi przez bieżącego użytkownika
+        events.extend(student_booking_events(current_user.id, start_utc, end_utc, instructor_id))
+
+        return with_etag(jsonify(events), etag)
 
     except Exception as e:
         current_app.logger.error(f"Błąd w get_appointments: {e}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Nieprawidłowe żądanie'}), 400
 
 
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _stream_events(student_id, start, end, instructor_id):
+    """
+    Wydarzenia z bazy porcjami (yield_per) zapisywane od razu do odpowiedzi - pamięć
+    procesu nie zależy od liczby terminów w oknie. Pomija cache tygodniowy.
+    """
+    chunk_size = current_app.config['CALENDAR_STREAM_CHUNK']
+    events = chain(
+        iter_available_events(start, end, instructor_id, yield_per=chunk_size),
+        rule_events(start, end, instructor_id),
+        iter_student_booking_events(student_id, start, end, instructor_id, yield_per=chunk_size)
+    )
+    body = stream_with_context(current_app.json.stream_array(events, chunk_size))
+    return current_app.response_class(body, mimetype='application/json')
+
+
 @calendar.route('/calendar/book/<int:appointment_id>', methods=['POST'])
 @login_required
 def book(appointment_id):
@@ -121,47 +109,78 @@ def book(appointment_id):
         flash('Odmowa dostępu. Musisz być studentem, aby zobaczyć tę stronę.', 'error')
         return redirect(url_for('page.home'))
 
-    appointment = Appointment.query.get_or_404(appointment_id)
-    current_time = datetime.utcnow()
-    appointment_time = appointment.start_time
+    data = json.loads(request.data)
+    topic = data.get('topic', '')
 
-    # Sprawdzenie, czy termin jest więcej niż 30 minut od teraz
-    if appointment_time - current_time <= timedelta(minutes=30):
-        current_app.logger.warning(f"Próba rezerwacji terminu mniej niż 30 minut od teraz: ID {appointment_id}")
+    try:
+        # Sprawdzenie dostępności, 30 minut wyprzedzenia i rezerwacja w jednym warunkowym UPDATE
+        booked = Appointment.try_book(appointment_id, current_user.id, topic, datetime.utcnow())
+        if booked is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba rezerwacji terminu: ID {appointment_id}")
+            return jsonify({'status': 'error',
+                            'message': 'Ten termin jest już zarezerwowany lub zaczyna się za mniej niż 30 minut.'}), 409
+
+        return _booked(appointment_id, booked.instructor_id, booked.start_time, booked.end_time, topic)
+    except Exception as e:
+        print(current_app.config['MAIL_USERNAME'])
+        current_app.logger.error(f"Błąd podczas rezerwacji terminu: {str(e)}", exc_info=True)
+        db.session.rollback()
         return jsonify(
-            {'status': 'error', 'message': 'Nie można rezerwować terminów mniej niż 30 minut od teraz.'}), 400
+            {'status': 'error', 'message': 'Wystąpił błąd podczas rezerwacji terminu. Proszę spróbować ponownie.'}), 500
 
-    if not appointment.is_available:
-        return jsonify({'status': 'error', 'message': 'Ten termin jest już zarezerwowany.'}), 400
+
+@calendar.route('/calendar/book/rule-<int:rule_id>-<int:start>', methods=['POST'])
+@login_required
+def book_rule_slot(rule_id, start):
+    """
+    Rezerwacja terminu reguły dostępności - dopiero teraz termin jest zapisywany w bazie.
+    """
+    if current_user.is_instructor or current_user.is_admin:
+        flash('Odmowa dostępu. Musisz być studentem, aby zobaczyć tę stronę.', 'error')
+        return redirect(url_for('page.home'))
 
     data = json.loads(request.data)
     topic = data.get('topic', '')
 
-    appointment.student_id = current_user.id
-    appointment.is_available = False
-    appointment.status = 'pending'
-    appointment.topic = topic
-
     try:
-        db.session.commit()
-        notify_instructor_new_appointment(appointment.instructor, appointment)
-        notification = Notification(
-            user_id=appointment.instructor_id,
-            message=f'Nowa wizyta do zaakceptowania na {appointment.start_time.strftime("%Y-%m-%d %H:%M")} od {current_user.first_name + " " + current_user.last_name} na temat: ' + appointment.topic + '.',
-            type='appointment',
-            related_id=appointment.id
-        )
-        db.session.add(notification)
-        db.session.commit()
-        return jsonify({'status': 'success', 'message': 'Termin został pomyślnie zarezerwowany!'})
+        # Zapis terminu i sprawdzenie kolizji w jednym INSERT ... WHERE NOT EXISTS
+        booked = availability_rules.book_occurrence(rule_id, start, current_user.id, topic, datetime.utcnow())
+        if booked is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba rezerwacji terminu reguły {rule_id} ({start})")
+            return jsonify({'status': 'error',
+                            'message': 'Ten termin jest już zarezerwowany lub zaczyna się za mniej niż 30 minut.'}), 409
+
+        return _booked(*booked, topic)
+    except IntegrityError:
+        # Postgres: równoległa rezerwacja tego samego terminu (ograniczenie wykluczające)
+        db.session.rollback()
+        return jsonify({'status': 'error',
+                        'message': 'Ten termin jest już zarezerwowany lub zaczyna się za mniej niż 30 minut.'}), 409
     except Exception as e:
-        print(current_app.config['MAIL_USERNAME'])
-        current_app.logger.error(f"Błąd podczas rezerwacji terminu: {str(e)}", exc_info=True)
+        current_app.logger.error(f"Błąd podczas rezerwacji terminu reguły: {str(e)}", exc_info=True)
         db.session.rollback()
         return jsonify(
             {'status': 'error', 'message': 'Wystąpił błąd podczas rezerwacji terminu. Proszę spróbować ponownie.'}), 500
 
 
+def _booked(appointment_id, instructor_id, start_time, end_time, topic):
+    """
+    Powiadomienia o nowej rezerwacji, commit i unieważnienie cache.
+    """
+    notify(
+        user_id=instructor_id,
+        message=f'Nowa wizyta do zaakceptowania na {start_time.strftime("%Y-%m-%d %H:%M")} od {current_user.first_name + " " + current_user.last_name} na temat: ' + topic + '.',
+        type='appointment',
+        related_id=appointment_id
+    )
+    notify_instructor_new_appointment(instructor_id, start_time)
+    db.session.commit()
+    invalidate_slots(instructor_id, start_time, end_time, current_user.id)
+    return jsonify({'status': 'success', 'message': 'Termin został pomyślnie zarezerwowany!'})
+
+
 @calendar.route('/calendar/cancel/<int:appointment_id>', methods=['POST'])
 @login_required
 def cancel(appointment_id):
@@ -169,34 +188,179 @@ def cancel(appointment_id):
         flash('Odmowa dostępu. Nie możesz być instruktorem, aby zobaczyć tę stronę.', 'error')
         return redirect(url_for('page.home'))
 
-    appointment = Appointment.query.get_or_404(appointment_id)
-    current_time = datetime.utcnow()
-    appointment_time = appointment.start_time
-
-    # Sprawdzenie, czy termin jest więcej niż 30 minut od teraz
-    if appointment_time - current_time <= timedelta(minutes=30):
-        current_app.logger.warning(f"Próba anulowania terminu mniej niż 30 minut od teraz: ID {appointment_id}")
-        return jsonify({'status': 'error', 'message': 'Nie można anulować terminów mniej niż 30 minut od teraz.'}), 400
-
-    if appointment.student_id != current_user.id:
-        return jsonify({'status': 'error', 'message': 'Możesz anulować tylko swoje własne terminy.'}), 403
-
     try:
-        appointment.is_available = True
-        appointment.student_id = None
-        appointment.status = 'available'
-        appointment.topic = None
-        notification = Notification(
-            user_id=appointment.instructor_id,
-            message=f'Wizyta na {appointment.start_time.strftime("%Y-%m-%d %H:%M")} została anulowana przez studenta {current_user.first_name + " " + current_user.last_name}.',
+        # Sprawdzenie właściciela, 30 minut wyprzedzenia i zwolnienie terminu w jednym warunkowym UPDATE
+        cancelled = Appointment.try_cancel(appointment_id, current_user.id, datetime.utcnow())
+        if cancelled is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba anulowania terminu: ID {appointment_id}")
+            return jsonify({'status': 'error',
+                            'message': 'Możesz anulować tylko swoje własne terminy, najpóźniej 30 minut przed ich rozpoczęciem.'}), 409
+
+        notify(
+            user_id=cancelled.instructor_id,
+            message=f'Wizyta na {cancelled.start_time.strftime("%Y-%m-%d %H:%M")} została anulowana przez studenta {current_user.first_name + " " + current_user.last_name}.',
             type="appointment",
-            related_id=appointment.id
+            related_id=appointment_id
         )
-        db.session.add(notification)
         db.session.commit()
+        invalidate_slots(cancelled.instructor_id, cancelled.start_time, cancelled.end_time, current_user.id)
         return jsonify({'status': 'success', 'message': 'Twoja rezerwacja została anulowana.'})
     except Exception as e:
         current_app.logger.error(f"Błąd podczas anulowania terminu: {str(e)}", exc_info=True)
         db.session.rollback()
         return jsonify({'status': 'error',
                         'message': 'Wystąpił błąd podczas anulowania rezerwacji. Proszę spróbować ponownie.'}), 500
+
+
+@calendar.route('/api/slots/earliest', methods=['GET'])
+@login_required
+def earliest_slots():
+    """
+    Najbliższe wolne terminy u dowolnego (lub wybranych) instruktora.
+    """
+    limit = request.args.get('limit', default=10, type=int)
+    min_duration = request.args.get('min_duration', type=int)
+    instructor_ids = request.args.getlist('instructor_id', type=int)
+    tz_str = request.args.get('timeZone', type=str, default='UTC')
+
+    if not 1 <= limit <= MAX_SLOT_SEARCH_LIMIT:
+        return jsonify({'status': 'error',
+                        'message': f'Parametr limit musi mieścić się w zakresie 1-{MAX_SLOT_SEARCH_LIMIT}.'}), 400
+    if min_duration is not None and min_duration <= 0:
+        return jsonify({'status': 'error', 'message': 'Minimalny czas trwania musi być dodatni.'}), 400
+    if len(instructor_ids) > MAX_SLOT_SEARCH_INSTRUCTORS:
+        return jsonify({'status': 'error',
+                        'message': f'Można wybrać najwyżej {MAX_SLOT_SEARCH_INSTRUCTORS} instruktorów.'}), 400
+
+    # Terminy, których nie da się już zarezerwować, nie są wynikami
+    after = datetime.utcnow() + BOOKING_LEAD_TIME
+    after_str = request.args.get('after', type=str)
+    if after_str:
+        try:
+            requested = parse_datetime(after_str, tz_str)
+        except pytz.UnknownTimeZoneError:
+            return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Nieprawidłowa data'}), 400
+        after = max(after, naive_utc(requested))
+
+    try:
+        rows = slot_search.earliest_free_slots(
+            after, limit, instructor_ids or None,
+            timedelta(minutes=min_duration) if min_duration else None
+        )
+        return jsonify(slot_search.slot_events(rows))
+    except Exception as e:
+        current_app.logger.error(f"Błąd podczas wyszukiwania terminów: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas wyszukiwania terminów.'}), 500
+
+
+@calendar.route('/api/availability', methods=['GET'])
+@login_required
+def get_availability():
+    """
+    Maski wolnych/zajętych komórek 15-minutowych wielu instruktorów w zadanym oknie.
+    """
+    instructor_ids = request.args.getlist('instructor_id', type=int)
+
+    try:
+        start_utc, end_utc = parse_range(
+            request.args.get('start', type=str),
+            request.args.get('end', type=str),
+            request.args.get('timeZone', type=str, default='UTC')
+        )
+    except pytz.UnknownTimeZoneError:
+        return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowy zakres dat'}), 400
+
+    if end_utc <= start_utc or end_utc - start_utc > MAX_AVAILABILITY_WINDOW:
+        return jsonify({'status': 'error', 'message': 'Zakres musi być dodatni i nie dłuższy niż 5 tygodni.'}), 400
+
+    try:
+        if not instructor_ids:
+            instructor_ids = db.session.execute(
+                db.select(User.id).filter_by(is_instructor=True, deleted=False)
+            ).scalars().all()
+
+        window_start, cells, masks = availability.window_masks(instructor_ids, start_utc, end_utc)
+        full = (1 << cells) - 1
+
+        return jsonify({
+            'start': window_start,
+            'cell_minutes': availability.CELL.seconds // 60,
+            'cells': cells,
+            'instructors': [{
+                'id': instructor_id,
+                'free': availability.to_bits(free, cells),
+                'busy': availability.to_bits(busy, cells),
+                # Wolny w całym oknie: każda komórka ma wolny termin i żadna nie jest zajęta
+                'free_all': free & ~busy & full == full,
+                'free_any': free & ~busy != 0,
+            } for instructor_id, (free, busy) in masks.items()]
+        })
+    except Exception as e:
+        current_app.logger.error(f"Błąd w get_availability: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas pobierania dostępności.'}), 500
+
+
+@calendar.route('/calendar/feed')
+@login_required
+def feed():
+    """
+    Adres subskrypcji kanału ICS zalogowanego studenta lub instruktora.
+    """
+    if current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+    return jsonify({'url': ics_feeds.feed_url(current_user)})
+
+
+@calendar.route('/calendar/feed/regenerate', methods=['POST'])
+@login_required
+def regenerate_feed():
+    """
+    Nowy adres kanału ICS; dotychczasowy adres (np. taki, który wyciekł) przestaje działać.
+    """
+    if current_user.is_admin:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu.'}), 403
+    ics_feeds.regenerate_feed_secret(current_user)
+    current_app.logger.info(f"Wygenerowano nowy adres kanału ICS użytkownika {current_user.id}")
+    return jsonify({'status': 'success', 'url': ics_feeds.feed_url(current_user)})
+
+
+@calendar.route('/calendar/feed/<token>.ics')
+def ics_feed(token):
+    """
+    Kanał iCalendar dostępny po podpisanym tokenie, bez sesji.
+
+    Token jest sprawdzany z sekretem kanału użytkownika (jeden odczyt po kluczu głównym).
+    Aktualny klient dostaje 304 po jednym odczycie wersji z Redis; gdy zmienił się
+    kalendarz, przebudowywane są tylko unieważnione tygodnie.
+    """
+    owner = ics_feeds.read_token(token)
+    if owner is None:
+        return jsonify({'status': 'error', 'message': 'Nie znaleziono kanału.'}), 404
+    kind, user_id, secret = owner
+    user = db.session.get(User, user_id)
+    if not ics_feeds.owns_feed(user, kind, secret):
+        return jsonify({'status': 'error', 'message': 'Nie znaleziono kanału.'}), 404
+
+    now = datetime.utcnow().replace(microsecond=0)
+    etag = ics_feeds.feed_etag(kind, user_id, now)
+    if is_fresh(etag):
+        return not_modified(etag)
+
+    cached = ics_feeds.cached_feed(kind, user_id, etag)
+    if cached is not None:
+        body, modified = cached
+    else:
+        body = ics_feeds.build_feed(kind, user, now)
+        # Bez Redisa (etag None) nie ma stałej daty modyfikacji, którą można by porównać
+        modified = now.replace(tzinfo=pytz.UTC) if etag else None
+        ics_feeds.store_feed(kind, user_id, etag, body, modified)
+
+    response = current_app.response_class(body, mimetype='text/calendar')
+    response.last_modified = modified
+    # Klienci bez If-None-Match dostają 304 na podstawie If-Modified-Since
+    return with_etag(response, etag).make_conditional(request)
@@ -0,0 +1,100 @@
+import click
+import pytz
+from datetime import datetime, timezone
+from flask import current_app
+from flask.cli import with_appcontext
+
+from calendarproject.extensions import db
+from calendarproject.models.user import User
+from calendarproject.utils import instructor_import, outbox, partitions, slot_import, utilization
+
+
+@click.command('import-appointments')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--instructor', 'instructor_id', type=int, required=True, help='ID instruktora.')
+@click.option('--format', 'file_format', type=click.Choice(slot_import.FORMATS),
+              help='Format pliku; domyślnie z rozszerzenia.')
+@click.option('--timezone', 'tz_name', default='UTC', show_default=True,
+              help='Strefa dat bez strefy czasowej.')
+@with_appcontext
+def import_appointments(path, instructor_id, file_format, tz_name):
+    """
+    Importuje wolne terminy instruktora z pliku CSV (kolumny start, end) lub ICS.
+    """
+    instructor = db.session.get(User, instructor_id)
+    if instructor is None or not instructor.is_instructor or instructor.deleted:
+        raise click.BadParameter('Nie ma takiego instruktora.', param_hint='--instructor')
+    file_format = file_format or slot_import.detect_format(path)
+    if file_format is None:
+        raise click.BadParameter('Nieznany format pliku.', param_hint='--format')
+    try:
+        tz = pytz.timezone(tz_name)
+    except pytz.UnknownTimeZoneError:
+        raise click.BadParameter('Nieznana strefa czasowa.', param_hint='--timezone')
+
+    report = None
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        for report in slot_import.import_slots(instructor_id, lines, file_format, tz, datetime.now(timezone.utc),
+                                               current_app.config['IMPORT_CHUNK_SIZE']):
+            for error in report['errors']:
+                click.echo(f"Linia {error['line']}: {error['message']}", err=True)
+            click.echo(f"Przetworzono {report['processed']}, zapisano {report['created']}, "
+                       f"błędy {report['failed']}")
+    if report is None:
+        click.echo('Plik nie zawiera terminów.')
+
+
+@click.command('import-instructors')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def import_instructors(path):
+    """
+    Zakłada konta instruktorów z pliku CSV (kolumny username, email, first_name, last_name, password).
+    """
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        report = instructor_import.import_instructors(lines, current_app.config['IMPORT_CHUNK_SIZE'],
+                                                      current_app.config['PASSWORD_HASH_WORKERS'])
+    for error in report['errors']:
+        click.echo(f"Linia {error['line']}: {error['message']}", err=True)
+    click.echo(f"Przetworzono {report['processed']}, utworzono {report['created']}, błędy {report['failed']}")
+
+
+@click.command('rebuild-utilization')
+@with_appcontext
+def rebuild_utilization():
+    """
+    Przelicza podsumowania wykorzystania wszystkich dni z terminami.
+    """
+    days = utilization.mark_all()
+    utilization.refresh()
+    click.echo(f"Przeliczono {days} dni.")
+
+
+@click.command('maintain-partitions')
+@with_appcontext
+def maintain_partitions():
+    """
+    Tworzy partycje terminów na kolejne miesiące i archiwizuje stare (tylko Postgres).
+    """
+    result = partitions.maintain()
+    click.echo(f"Utworzono: {', '.join(result['created']) or '-'}; "
+               f"zarchiwizowano: {', '.join(result['archived']) or '-'}")
+
+
+@click.command('outbox-retry')
+@click.argument('message_ids', type=int, nargs=-1)
+@with_appcontext
+def outbox_retry(message_ids):
+    """
+    Przywraca do kolejki porzucone wiadomości outboxa (wszystkie albo o podanych ID).
+    """
+    count = outbox.retry_dead(message_ids)
+    click.echo(f"Przywrócono {count} wiadomości.")
+
+
+def init_commands(app):
+    app.cli.add_command(import_appointments)
+    app.cli.add_command(import_instructors)
+    app.cli.add_command(rebuild_utilization)
+    app.cli.add_command(maintain_partitions)
+    app.cli.add_command(outbox_retry)
@@ -1,38 +1,52 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime
 from dateutil import parser
 import pytz
-from sqlalchemy.orm import joinedload
 from datetime import time
 from datetime import datetime, timedelta, timezone
-from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment import MAX_APPOINTMENT_LENGTH, Appointment
+from calendarproject.models.availability_rule import AvailabilityException, AvailabilityRule
 from calendarproject.extensions import db
-from sqlalchemy import cast, DateTime, func
+from sqlalchemy import cast, DateTime
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from calendarproject.models.user import User
+import csv
+import io
 import json
 
-from calendarproject.models.notification import Notification
+from calendarproject.utils.notifications import notify, notify_student_appointment_status
+from calendarproject.utils.calendar_cache import get_version, invalidate_changes, invalidate_instructor, invalidate_slots
+from calendarproject.utils import (availability_rules, batch_actions, ics_feeds, instructor_directory, instructor_stats,
+                                  recurring, slot_import)
+from calendarproject.utils.calendar_feeds import instructor_events
+from calendarproject.utils.http_cache import is_fresh, make_etag, not_modified, with_etag
+from calendarproject.utils.weeks import naive_utc, parse_range
 
 instructor = Blueprint('instructor', __name__)
 
+MAX_REPORTED_CONFLICTS = 50
+
 
 @instructor.route('/api/instructors', methods=['GET'])
 @login_required
 def get_instructors():
     current_app.logger.info(f"Dostęp do /api/instructors. Metoda: {request.method}")
+
+    # Aktualny klient dostaje 304 po jednym odczycie wersji katalogu z Redis
+    version = instructor_directory.get_version()
+    etag = make_etag('instructors', version) if version else None
+    if is_fresh(etag):
+        return not_modified(etag)
+
     try:
-        instructors = User.query.filter_by(is_instructor=True, deleted=False).all()
-        instructors_data = [{
-            'id': instructor.id,
-            'first_name': instructor.first_name,
-            'last_name': instructor.last_name,
-            'full_name': f"{instructor.first_name} {instructor.last_name}"
-        } for instructor in instructors]
+        version, instructors_data = instructor_directory.get_directory()
+        etag = make_etag('instructors', version) if version else None
 
         current_app.logger.info(f"Znaleziono {len(instructors_data)} instruktorów.")
-        return jsonify(instructors_data)
+        max_age = current_app.config.get('INSTRUCTOR_DIRECTORY_MAX_AGE', 60)
+        return with_etag(jsonify(instructors_data), etag, f'private, max-age={max_age}')
     except Exception as e:
         current_app.logger.error(f"Błąd podczas pobierania instruktorów: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas pobierania instruktorów.'}), 500
@@ -47,7 +61,7 @@ def calendar():
             f"Próba dostępu do kalendarza instruktora przez nieuprawnionego użytkownika: {current_user.id}")
         flash('Dostęp zabroniony. Musisz być instruktorem, aby wyświetlić tę stronę.', 'error')
         return redirect(url_for('page.home'))
-    return render_template('instructor/calendar.html')
+    return render_template('instructor/calendar.html', feed_url=ics_feeds.feed_url(current_user))
 
 
 @instructor.route('/instructor/get_appointments', methods=['GET'])
@@ -66,6 +80,13 @@ def get_appointments():
 
     current_app.logger.debug(f"Parametry zapytania: start={start_str}, end={end_str}, timeZone={tz_str}")
 
+    # ETag z wersji kalendarza - gdy klient ma aktualne dane, nie czytamy terminów z bazy
+    version = get_version(current_user.id)
+    etag = make_etag('instructor', current_user.id, version, request.query_string.decode()) if version else None
+    if is_fresh(etag):
+        current_app.logger.debug("Terminy instruktora nie zmieniły się, zwracam 304.")
+        return not_modified(etag)
+
     try:
         # Parsowanie strefy czasowej
         try:
@@ -93,38 +114,57 @@ def get_appointments():
         start_utc = start.astimezone(pytz.UTC)
         end_utc = end.astimezone(pytz.UTC)
 
-        # Filtrowanie terminów z joinedload dla studenta
-        appointments = Appointment.query.options(joinedload(Appointment.student)).filter(
-            Appointment.instructor_id == current_user.id,
-            Appointment.start_time >= start_utc,
-            Appointment.start_time <= end_utc
-        ).all()
-
-        current_app.logger.debug(f"Znaleziono {len(appointments)} terminów w zadanym okresie.")
-
-        # Przygotowanie wydarzeń do zwrócenia
-        events = []
-        for appointment in appointments:
-            student_name = f"{appointment.student.first_name} {appointment.student.last_name}" if appointment.student else ""
-            events.append({
-                'id': appointment.id,
-                'titleMessage': 'Dostępny' if appointment.is_available else f'Temat konsultacji: {appointment.topic}',
-                'title': '',
-                'student': student_name,
-                'is_available': appointment.is_available,
-                'start': appointment.start_time.isoformat(),
-                'end': appointment.end_time.isoformat(),
-                'color': '#1B8359' if appointment.is_available else ('#996C00' if appointment.status == 'pending' else '#9C27B0'),
-                'status': appointment.status
-            })
-
-        return jsonify(events)
+        # Terminy jako krotki kolumn z wąskim złączeniem na dane studenta
+        events = instructor_events(current_user.id, start_utc, end_utc)
+
+        current_app.logger.debug(f"Znaleziono {len(events)} terminów w zadanym okresie.")
+
+        return with_etag(jsonify(events), etag)
 
     except Exception as e:
         current_app.logger.error(f"Błąd w get_appointments: {e}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Nieprawidłowe żądanie'}), 400
 
 
+@instructor.route('/instructor/stats', methods=['GET'])
+@login_required
+def stats():
+    """
+    Liczby terminów według statusu i zarezerwowane godziny w tygodniach dla zakresu start-end.
+    """
+    current_app.logger.info(f"Dostęp do /instructor/stats. Metoda: {request.method}")
+    if not current_user.is_instructor:
+        current_app.logger.warning(f"Próba pobrania statystyk przez nieuprawnionego użytkownika: {current_user.id}")
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+
+    try:
+        start_utc, end_utc = parse_range(
+            request.args.get('start', type=str),
+            request.args.get('end', type=str),
+            request.args.get('timeZone', type=str, default='UTC')
+        )
+    except pytz.UnknownTimeZoneError:
+        return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe żądanie'}), 400
+
+    max_days = current_app.config['INSTRUCTOR_STATS_MAX_WINDOW_DAYS']
+    if end_utc <= start_utc or end_utc - start_utc > timedelta(days=max_days):
+        return jsonify({'status': 'error',
+                        'message': f'Zakres musi być dodatni i nie dłuższy niż {max_days} dni.'}), 400
+
+    version = get_version(current_user.id)
+    etag = make_etag('stats', current_user.id, version, request.query_string.decode()) if version else None
+    if is_fresh(etag):
+        return not_modified(etag)
+
+    try:
+        return with_etag(jsonify(instructor_stats.get_stats(current_user.id, start_utc, end_utc, version)), etag)
+    except Exception as e:
+        current_app.logger.error(f"Błąd podczas liczenia statystyk: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas pobierania statystyk.'}), 500
+
+
 @instructor.route('/instructor/add_appointment', methods=['POST'])
 @login_required
 def add_appointment():
@@ -162,33 +202,34 @@ def add_appointment():
             current_app.logger.warning("Czas zakończenia musi być po czasie rozpoczęcia.")
             return jsonify({'status': 'error', 'message': 'Czas zakończenia musi być po czasie rozpoczęcia.'}), 400
 
+        if end_time - start_time > MAX_APPOINTMENT_LENGTH:
+            current_app.logger.warning("Termin jest dłuższy niż jeden dzień.")
+            return jsonify({'status': 'error', 'message': 'Termin nie może być dłuższy niż jeden dzień.'}), 400
+
         # Sprawdź czy to termin całodniowy
         is_full_day = start_time.time() == time(0, 0) and end_time.time() == time(23, 59, 59)
 
-        if is_full_day:
-            # Sprawdź, czy istnieją już terminy na ten dzień
-            existing_appointments = Appointment.query.filter(
-                Appointment.instructor_id == current_user.id,
-                func.date(Appointment.start_time) == start_time.date()
-            ).first()
-
-            if existing_appointments:
-                current_app.logger.warning(
-                    "Nie można dodać całodniowego terminu, ponieważ istnieją już terminy w tym dniu.")
-                return jsonify({'status': 'error',
-                                'message': 'Nie można dodać całodniowego terminu, ponieważ istnieją już terminy w tym dniu.'}), 400
-
-        new_appointment = Appointment(
-            instructor_id=current_user.id,
-            start_time=start_time,
-            end_time=end_time,
-            is_available=True
-        )
-        db.session.add(new_appointment)
-        db.session.commit()
-        current_app.logger.info(f"Dodano nowy termin. ID: {new_appointment.id}")
-        return jsonify({'status': 'success', 'id': new_appointment.id}), 201
+        # Kolizje (także terminu całodniowego z terminami w tym dniu) sprawdza zakresowy
+        # warunek nakładania w tym samym INSERT, który dodaje termin
+        start_utc, end_utc = naive_utc(start_time), naive_utc(end_time)
+        appointment_id = Appointment.try_add(current_user.id, start_utc, end_utc)
+        if appointment_id is None:
+            db.session.rollback()
+            message = ('Nie można dodać całodniowego terminu, ponieważ istnieją już terminy w tym dniu.'
+                       if is_full_day else 'Termin nakłada się na inny Twój termin.')
+            current_app.logger.warning(message)
+            return jsonify({'status': 'error', 'message': message}), 409
 
+        db.session.commit()
+        invalidate_slots(current_user.id, start_utc, end_utc)
+        current_app.logger.info(f"Dodano nowy termin. ID: {appointment_id}")
+        return jsonify({'status': 'success', 'id': appointment_id}), 201
+
+    except IntegrityError:
+        # Postgres: równoległe żądanie dodało nakładający się termin (ograniczenie wykluczające)
+        db.session.rollback()
+        current_app.logger.warning("Termin nakłada się na inny termin dodany w tym samym czasie.")
+        return jsonify({'status': 'error', 'message': 'Termin nakłada się na inny Twój termin.'}), 409
     except json.JSONDecodeError:
         current_app.logger.error("Nieprawidłowe dane JSON.", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Nieprawidłowe dane JSON.'}), 400
@@ -203,6 +244,205 @@ def add_appointment():
         return jsonify({'status': 'error', 'message': 'Wystąpił nieoczekiwany błąd.'}), 500
 
 
+@instructor.route('/instructor/add_recurring_appointments', methods=['POST'])
+@login_required
+def add_recurring_appointments():
+    """
+    Dodaje terminy według tygodniowego wzorca w zakresie dat, w jednej transakcji.
+
+    Przy kolizjach z istniejącymi terminami nic nie jest zapisywane (409), chyba że
+    skip_conflicts=true - wtedy kolidujące terminy planu są pomijane.
+    """
+    current_app.logger.info(f"Dostęp do /instructor/add_recurring_appointments. Metoda: {request.method}")
+    if not current_user.is_instructor:
+        current_app.logger.warning(f"Próba dodania terminów przez nieuprawnionego użytkownika: {current_user.id}")
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+
+    try:
+        data = json.loads(request.data)
+        if not isinstance(data, dict):
+            raise recurring.PlanError('Nieprawidłowe dane JSON.')
+        slots = recurring.build_plan(data, datetime.now(timezone.utc))
+
+        conflicts = recurring.find_conflicts(current_user.id, slots)
+        if conflicts and not data.get('skip_conflicts'):
+            current_app.logger.warning(f"Plan koliduje z {len(conflicts)} istniejącymi terminami.")
+            return jsonify({
+                'status': 'error',
+                'message': f'{len(conflicts)} terminów planu koliduje z istniejącymi terminami.',
+                'conflicts': [{'start': start, 'end': end} for start, end in conflicts[:MAX_REPORTED_CONFLICTS]]
+            }), 409
+        if conflicts:
+            conflicting = set(conflicts)
+            slots = [slot for slot in slots if slot not in conflicting]
+
+        if slots:
+            recurring.insert_slots(current_user.id, slots)
+            db.session.commit()
+            invalidate_slots(current_user.id, slots[0][0], max(end for _, end in slots))
+
+        current_app.logger.info(f"Dodano {len(slots)} terminów cyklicznych, pominięto {len(conflicts)}.")
+        return jsonify({'status': 'success', 'created': len(slots), 'skipped': len(conflicts)}), 201
+
+    except json.JSONDecodeError:
+        current_app.logger.error("Nieprawidłowe dane JSON.", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe dane JSON.'}), 400
+    except recurring.PlanError as e:
+        current_app.logger.warning(f"Nieprawidłowy plan terminów: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        current_app.logger.warning("Plan koliduje z terminami dodanymi w tym samym czasie.")
+        return jsonify({'status': 'error', 'message': 'Plan koliduje z terminami dodanymi w tym samym czasie.'}), 409
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Wystąpił nieoczekiwany błąd: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił nieoczekiwany błąd.'}), 500
+
+
+@instructor.route('/instructor/import_appointments', methods=['POST'])
+@login_required
+def import_appointments():
+    """
+    Import wolnych terminów z pliku CSV lub ICS (pole file, opcjonalnie format i timeZone).
+    Administrator importuje terminy instruktora wskazanego w instructor_id.
+
+    Odpowiedź to strumień NDJSON: raport po każdej porcji (postęp i błędy z numerami linii)
+    i podsumowanie na końcu.
+    """
+    current_app.logger.info(f"Dostęp do /instructor/import_appointments. Metoda: {request.method}")
+    if current_user.is_admin:
+        instructor_id = request.form.get('instructor_id', type=int)
+        target = db.session.get(User, instructor_id) if instructor_id else None
+        if target is None or not target.is_instructor or target.deleted:
+            return jsonify({'status': 'error', 'message': 'Wskazany użytkownik nie jest instruktorem.'}), 404
+    elif current_user.is_instructor:
+        instructor_id = current_user.id
+    else:
+        current_app.logger.warning(f"Próba importu terminów przez nieuprawnionego użytkownika: {current_user.id}")
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Brak pliku do importu.'}), 400
+    file_format = request.form.get('format') or slot_import.detect_format(upload.filename)
+    if file_format not in slot_import.FORMATS:
+        return jsonify({'status': 'error', 'message': 'Obsługiwane formaty to CSV i ICS.'}), 400
+    try:
+        tz = pytz.timezone(request.form.get('timeZone') or 'UTC')
+    except pytz.UnknownTimeZoneError:
+        return jsonify({'status': 'error', 'message': 'Nieznana strefa czasowa'}), 400
+
+    # Plik jest czytany z uploadu linia po linii, bez wczytywania całości do pamięci
+    lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    reports = slot_import.import_slots(instructor_id, lines, file_format, tz, datetime.now(timezone.utc),
+                                       current_app.config['IMPORT_CHUNK_SIZE'])
+
+    def generate():
+        summary = {'processed': 0, 'created': 0, 'failed': 0}
+        try:
+            for report in reports:
+                summary = {key: report[key] for key in summary}
+                yield current_app.json.dumps_bytes(report) + b'\n'
+            current_app.logger.info(f"Import terminów instruktora {instructor_id}: {summary}")
+            yield current_app.json.dumps_bytes({'status': 'success', **summary}) + b'\n'
+        except (UnicodeDecodeError, csv.Error) as e:
+            current_app.logger.warning(f"Nieprawidłowy plik importu: {e}")
+            yield current_app.json.dumps_bytes({'status': 'error', 'message': 'Nieprawidłowy plik.', **summary}) + b'\n'
+        except Exception as e:
+            current_app.logger.error(f"Błąd podczas importu terminów: {str(e)}", exc_info=True)
+            yield current_app.json.dumps_bytes(
+                {'status': 'error', 'message': 'Wystąpił błąd podczas importu terminów.', **summary}) + b'\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@instructor.route('/instructor/availability_rules', methods=['GET'])
+@login_required
+def get_availability_rules():
+    if not current_user.is_instructor:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+    rules = AvailabilityRule.query.filter_by(instructor_id=current_user.id).order_by(AvailabilityRule.id).all()
+    return jsonify([availability_rules.rule_to_dict(rule) for rule in rules])
+
+
+@instructor.route('/instructor/availability_rules', methods=['POST'])
+@login_required
+def add_availability_rules():
+    """
+    Dodaje cotygodniowe reguły dostępności (format jak add_recurring_appointments, end_date
+    opcjonalne). Terminy reguł nie są zapisywane - kalendarz rozwija je dla żądanego okna.
+    """
+    current_app.logger.info(f"Dostęp do /instructor/availability_rules. Metoda: {request.method}")
+    if not current_user.is_instructor:
+        current_app.logger.warning(f"Próba dodania reguł przez nieuprawnionego użytkownika: {current_user.id}")
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+
+    try:
+        rules = availability_rules.parse_rules(json.loads(request.data))
+        for rule in rules:
+            rule.instructor_id = current_user.id
+        db.session.add_all(rules)
+        db.session.commit()
+        invalidate_instructor(current_user.id)
+
+        current_app.logger.info(f"Dodano {len(rules)} reguł dostępności.")
+        return jsonify({'status': 'success', 'rules': [availability_rules.rule_to_dict(rule) for rule in rules]}), 201
+    except json.JSONDecodeError:
+        current_app.logger.error("Nieprawidłowe dane JSON.", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe dane JSON.'}), 400
+    except recurring.PlanError as e:
+        current_app.logger.warning(f"Nieprawidłowa reguła dostępności: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Wystąpił nieoczekiwany błąd: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił nieoczekiwany błąd.'}), 500
+
+
+@instructor.route('/instructor/availability_rules/<int:rule_id>', methods=['DELETE'])
+@login_required
+def delete_availability_rule(rule_id):
+    if not current_user.is_instructor:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+    rule = db.session.get(AvailabilityRule, rule_id)
+    if rule is None or rule.instructor_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Reguła nie została znaleziona'}), 404
+
+    # Zarezerwowane terminy reguły są zwykłymi wierszami appointment i zostają
+    db.session.delete(rule)
+    db.session.commit()
+    invalidate_instructor(current_user.id)
+    current_app.logger.info(f"Usunięto regułę dostępności o ID: {rule_id}")
+    return jsonify({'status': 'success'})
+
+
+@instructor.route('/instructor/availability_rules/<int:rule_id>/exceptions', methods=['POST'])
+@login_required
+def add_availability_exception(rule_id):
+    """
+    Wyłącza regułę w podanym dniu (data lokalna strefy reguły).
+    """
+    if not current_user.is_instructor:
+        return jsonify({'status': 'error', 'message': 'Odmowa dostępu'}), 403
+    rule = db.session.get(AvailabilityRule, rule_id)
+    if rule is None or rule.instructor_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Reguła nie została znaleziona'}), 404
+
+    try:
+        day = recurring.parse_date((json.loads(request.data) or {}).get('date'), 'date')
+    except (json.JSONDecodeError, AttributeError):
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe dane JSON.'}), 400
+    except recurring.PlanError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if day not in {exception.day for exception in rule.exceptions}:
+        rule.exceptions.append(AvailabilityException(day=day))
+        db.session.commit()
+        invalidate_instructor(current_user.id)
+    return jsonify({'status': 'success', 'rule': availability_rules.rule_to_dict(rule)})
+
+
 @instructor.route('/instructor/delete_appointment', methods=['POST'])
 @login_required
 def delete_appointment():
@@ -218,8 +458,10 @@ def delete_appointment():
 
         appointment = Appointment.query.get(appointment_id)
         if appointment and appointment.instructor_id == current_user.id and appointment.is_available:
+            start_time, end_time = appointment.start_time, appointment.end_time
             db.session.delete(appointment)
             db.session.commit()
+            invalidate_slots(current_user.id, start_time, end_time)
             current_app.logger.info(f"Usunięto termin o ID: {appointment_id}")
             return jsonify({'status': 'success'})
         else:
@@ -245,32 +487,28 @@ def confirm_appointment(appointment_id):
         return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
 
     try:
-        appointment = Appointment.query.get_or_404(appointment_id)
-        if appointment.instructor_id != current_user.id:
-            current_app.logger.warning(f"Próba potwierdzenia terminu innego instruktora. Termin ID: {appointment_id}")
-            return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
-
-        if appointment.status != 'pending':
-            current_app.logger.warning(
-                f"Próba potwierdzenia terminu o statusie innym niż 'pending'. Status: {appointment.status}")
-            return jsonify({'status': 'error', 'message': 'Wizyta została już zaakceptowana'}), 403
-
-        appointment.status = 'confirmed'
-        db.session.commit()
+        # Sprawdzenie właściciela i statusu oraz zmiana w jednym warunkowym UPDATE
+        confirmed = Appointment.try_confirm(appointment_id, current_user.id)
+        if confirmed is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba potwierdzenia terminu. Termin ID: {appointment_id}")
+            return jsonify({'status': 'error', 'message': 'Wizyta została już zaakceptowana lub nie oczekuje na akceptację'}), 409
 
         instructor_name = f"{current_user.first_name} {current_user.last_name}"
-        notification = Notification(
-            user_id=appointment.student_id,
-            message=f'Twoja wizyta na {appointment.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została zaakceptowana.',
+        notify(
+            user_id=confirmed.student_id,
+            message=f'Twoja wizyta na {confirmed.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została zaakceptowana.',
             type="appointment",
-            related_id=appointment.id
+            related_id=appointment_id
         )
-        db.session.add(notification)
+        notify_student_appointment_status(confirmed.student_id, confirmed.start_time, 'confirmed')
         db.session.commit()
+        invalidate_slots(current_user.id, confirmed.start_time, confirmed.end_time, confirmed.student_id)
 
         current_app.logger.info(f"Zaakceptowano termin o ID: {appointment_id}")
         return jsonify({'status': 'success'})
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Wystąpił błąd podczas potwierdzania terminu: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas potwierdzania terminu.'}), 500
 
@@ -284,37 +522,28 @@ def cancel_appointment(appointment_id):
         return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
 
     try:
-        appointment = Appointment.query.get_or_404(appointment_id)
-        if appointment.instructor_id != current_user.id:
-            current_app.logger.warning(f"Próba anulowania terminu innego instruktora. Termin ID: {appointment_id}")
-            return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
-
-        if appointment.status != 'confirmed':
-            current_app.logger.warning(
-                f"Próba anulowania terminu o statusie innym niż 'confirmed'. Status: {appointment.status}")
-            return jsonify({'status': 'error', 'message': 'Wizyta została już anulowana'}), 403
-
-        student_id = appointment.student_id  # Zapisz ID studenta przed jego usunięciem
-
-        appointment.status = 'pending'
-        appointment.student_id = None
-        appointment.topic = None
-        appointment.is_available = True
-        db.session.commit()
+        # Blokada wiersza (SKIP LOCKED) i warunkowe zwolnienie potwierdzonego terminu
+        released = Appointment.try_release(appointment_id, current_user.id, 'confirmed', 'pending')
+        if released is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba anulowania terminu. Termin ID: {appointment_id}")
+            return jsonify({'status': 'error', 'message': 'Wizyta została już anulowana'}), 409
 
         instructor_name = f"{current_user.first_name} {current_user.last_name}"
-        notification = Notification(
-            user_id=student_id,
-            message=f'Twoja wizyta na {appointment.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została anulowana.',
+        notify(
+            user_id=released.student_id,
+            message=f'Twoja wizyta na {released.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została anulowana.',
             type="appointment",
-            related_id=appointment.id
+            related_id=appointment_id
         )
-        db.session.add(notification)
+        notify_student_appointment_status(released.student_id, released.start_time, 'cancelled')
         db.session.commit()
+        invalidate_slots(current_user.id, released.start_time, released.end_time, released.student_id)
 
         current_app.logger.info(f"Anulowano termin o ID: {appointment_id}")
         return jsonify({'status': 'success'})
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Wystąpił błąd podczas anulowania terminu: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas anulowania terminu.'}), 500
 
@@ -328,33 +557,67 @@ def reject_appointment(appointment_id):
         return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
 
     try:
-        appointment = Appointment.query.get_or_404(appointment_id)
-        if appointment.instructor_id != current_user.id:
-            current_app.logger.warning(f"Próba odrzucenia terminu innego instruktora. Termin ID: {appointment_id}")
-            return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
-
-        student_id = appointment.student_id  # Zapisz ID studenta przed jego usunięciem
+        # Blokada wiersza (SKIP LOCKED) i warunkowe zwolnienie oczekującego terminu
+        released = Appointment.try_release(appointment_id, current_user.id, 'pending', 'rejected')
+        if released is None:
+            db.session.rollback()
+            current_app.logger.warning(f"Nieudana próba odrzucenia terminu. Termin ID: {appointment_id}")
+            return jsonify({'status': 'error', 'message': 'Wizyta nie oczekuje już na akceptację'}), 409
 
         # Tworzenie notyfikacji dla studenta
         instructor_name = f"{current_user.first_name} {current_user.last_name}"
-        notification = Notification(
-            user_id=student_id,
-            message=f'Twoja wizyta na {appointment.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została odrzucona.',
+        notify(
+            user_id=released.student_id,
+            message=f'Twoja wizyta na {released.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została odrzucona.',
             type="appointment",
-            related_id=appointment.id
+            related_id=appointment_id
         )
-
-        appointment.status = 'rejected'
-        appointment.is_available = True
-        appointment.student_id = None
-        appointment.topic = None
-        db.session.commit()
-
-        db.session.add(notification)
+        notify_student_appointment_status(released.student_id, released.start_time, 'rejected')
         db.session.commit()
+        invalidate_slots(current_user.id, released.start_time, released.end_time, released.student_id)
 
         current_app.logger.info(f"Odrzucono termin o ID: {appointment_id}")
         return jsonify({'status': 'success'})
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Wystąpił błąd podczas odrzucania terminu: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas odrzucania terminu.'}), 500
+
+
+@instructor.route('/instructor/batch', methods=['POST'])
+@login_required
+def batch():
+    """
+    Wiele akcji (delete, confirm, reject, cancel) na terminach instruktora w jednej transakcji.
+
+    Akcje, których warunek nie jest spełniony, nie przerywają pozostałych - wynik każdej
+    akcji jest zwracany osobno, w kolejności z żądania.
+    """
+    current_app.logger.info(f"Dostęp do /instructor/batch. Metoda: {request.method}")
+    if not current_user.is_instructor:
+        current_app.logger.warning(f"Próba akcji wsadowej przez nieuprawnionego użytkownika: {current_user.id}")
+        return jsonify({'status': 'error', 'message': 'Brak autoryzacji'}), 403
+
+    try:
+        data = json.loads(request.data)
+        actions = batch_actions.parse_actions(data)
+
+        results, changes = batch_actions.apply_actions(current_user, actions)
+        db.session.commit()
+        invalidate_changes(current_user.id, changes)
+
+        succeeded = sum(1 for result in results if result['status'] == 'success')
+        current_app.logger.info(f"Akcje wsadowe: wykonano {succeeded} z {len(results)}.")
+        return jsonify({'status': 'success', 'succeeded': succeeded, 'failed': len(results) - succeeded,
+                        'results': results})
+
+    except json.JSONDecodeError:
+        current_app.logger.error("Nieprawidłowe dane JSON.", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe dane JSON.'}), 400
+    except batch_actions.BatchError as e:
+        current_app.logger.warning(f"Nieprawidłowa lista akcji: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Wystąpił błąd podczas akcji wsadowych: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Wystąpił błąd podczas wykonywania akcji.'}), 500
@@ -1,5 +1,23 @@
+from sqlalchemy import DDL, DateTime, Integer, String, and_, event, exists, literal, tuple_
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
 from calendarproject.extensions import db
-from datetime import datetime
+from calendarproject.models.user import User
+from calendarproject.models.utilization_rollup import UtilizationRollup
+from datetime import datetime, timedelta
+
+# Minimalne wyprzedzenie rezerwacji i anulowania terminu przez studenta
+BOOKING_LEAD_TIME = timedelta(minutes=30)
+# Najdłuższy termin (całodniowy to 00:00-23:59:59). Dzięki tej granicy warunek nakładania
+# ma dolne ograniczenie start_time i jest zakresem na indeksie, a nie skanem wcześniejszych terminów.
+MAX_APPOINTMENT_LENGTH = timedelta(days=1)
+
+def display_name(user_id):
+    """
+    Podzapytanie z imieniem i nazwiskiem użytkownika, do zapisu w tej samej instrukcji.
+    """
+    return db.select(User.first_name + ' ' + User.last_name).where(User.id == user_id).scalar_subquery()
+
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,9 +28,260 @@ class Appointment(db.Model):
     is_available = db.Column(db.Boolean, default=True)
     topic = db.Column(db.String(200), nullable=True)
     status = db.Column(db.String(20), default='pending')
+    # Kopia imienia i nazwiska zarezerwowanego studenta - kalendarz instruktora czyta
+    # tylko tę tabelę, bez złączenia z user. Aktualizowana przy zmianie nazwiska (niżej).
+    student_name = db.Column(db.String(101), nullable=True)
 
     instructor = db.relationship('User', foreign_keys=[instructor_id], backref='instructor_appointments')
     student = db.relationship('User', foreign_keys=[student_id], backref='student_appointments')
 
+    # Indeksy pod zapytania kalendarzy (zakres start_time + instruktor/dostępność/student).
+    # Warunek indeksu częściowego musi mieć tę samą postać co filtr w zapytaniu.
+    __table_args__ = (
+        db.Index('ix_appointment_instructor_id_start_time', 'instructor_id', 'start_time'),
+        db.Index('ix_appointment_available_start_time', 'start_time',
+                 sqlite_where=db.text('is_available = 1'),
+                 postgresql_where=db.text('is_available = true')),
+        db.Index('ix_appointment_student_id_start_time', 'student_id', 'start_time'),
+        # Postgres: terminy jednego instruktora nie mogą się nakładać (wymaga btree_gist); po
+        # partycjonowaniu (c9e2a7f4d813) ograniczenie jest osobne w każdej partycji
+        ExcludeConstraint(
+            (instructor_id, '='),
+            (db.func.tsrange(start_time, end_time), '&&'),
+            name='appointment_instructor_no_overlap',
+            using='gist'
+        ).ddl_if(dialect='postgresql'),
+    )
+
     def __repr__(self):
-        return f'<Appointment {self.id}>'
\ No newline at end of file
+        return f'<Appointment {self.id}>'
+
+    @classmethod
+    def overlapping(cls, start, end):
+        """
+        Warunek nakładania się terminu na przedział [start, end).
+
+        Terminy nie są dłuższe niż MAX_APPOINTMENT_LENGTH, więc nakładający się termin
+        zaczyna się w (start - MAX_APPOINTMENT_LENGTH, end) - zakres na drugiej kolumnie
+        indeksów złożonych, ograniczony z obu stron.
+        """
+        return and_(cls.start_time > start - MAX_APPOINTMENT_LENGTH, cls.start_time < end, cls.end_time > start)
+
+    @classmethod
+    def instructor_active(cls):
+        """
+        Warunek: instruktor terminu nie jest usunięty. Terminy usuniętego instruktora są
+        kasowane w tle, więc do końca zadania usuwania wciąż istnieją.
+        """
+        return ~exists().where(User.id == cls.instructor_id, User.deleted == True)
+
+    @classmethod
+    def available_slots_query(cls, start, end, instructor_id=None):
+        """
+        Wolne terminy aktywnych instruktorów nakładające się na przedział [start, end),
+        opcjonalnie jednego instruktora.
+        """
+        query = cls.query.filter(cls.overlapping(start, end))
+        if instructor_id:
+            query = query.filter(cls.instructor_id == instructor_id)
+        return query.filter(cls.is_available == True, cls.instructor_active())
+
+    @classmethod
+    def student_bookings_query(cls, student_id, start, end, instructor_id=None):
+        """
+        Terminy zarezerwowane przez studenta nakładające się na przedział [start, end).
+        """
+        query = cls.query.filter(
+            cls.student_id == student_id,
+            cls.overlapping(start, end)
+        )
+        if instructor_id:
+            query = query.filter(cls.instructor_id == instructor_id)
+        return query.filter(cls.is_available == False)
+
+    @classmethod
+    def instructor_feed_query(cls, instructor_id, start, end):
+        """
+        Wszystkie terminy instruktora nakładające się na przedział [start, end).
+        """
+        return cls.query.filter(
+            cls.instructor_id == instructor_id,
+            cls.overlapping(start, end)
+        )
+
+    @classmethod
+    def conflicts(cls, instructor_id, start, end):
+        """
+        Warunek istnienia terminu instruktora nakładającego się na [start, end).
+        """
+        return exists().where(cls.instructor_id == instructor_id, cls.overlapping(start, end))
+
+    @classmethod
+    def try_add(cls, instructor_id, start, end, student_id=None, topic=None):
+        """
+        Dodaje termin (wolny albo od razu zarezerwowany przez studenta), jeśli nie nakłada
+        się na inny termin instruktora.
+
+        Sprawdzenie i zapis to jedno INSERT ... SELECT ... WHERE NOT EXISTS, więc na SQLite
+        (zapisy szeregowane) nie ma wyścigu; na Postgresie równoległe wstawienia odrzuca
+        ograniczenie wykluczające (IntegrityError). Zwraca ID terminu albo None.
+
+        Po partycjonowaniu appointment ograniczenie działa tylko w obrębie jednej partycji
+        miesięcznej: dwa równoległe wstawienia w różnych miesiącach (np. termin 31. 23:30-00:30
+        i termin 1. o 00:00) mogą oba przejść. Sprawdzenie NOT EXISTS nadal obejmuje terminy
+        już zatwierdzone.
+        """
+        candidate = db.select(
+            literal(instructor_id),
+            literal(start, DateTime),
+            literal(end, DateTime),
+            literal(student_id is None),
+            literal('pending'),
+            literal(student_id, Integer),
+            literal(topic, String),
+            display_name(student_id) if student_id is not None else literal(None, String)
+        ).where(~cls.conflicts(instructor_id, start, end))
+        appointment_id = db.session.execute(
+            db.insert(cls).from_select(
+                ['instructor_id', 'start_time', 'end_time', 'is_available', 'status', 'student_id', 'topic',
+                 'student_name'],
+                candidate
+            ).returning(cls.id)
+        ).scalar()
+        if appointment_id is not None and student_id is not None:
+            UtilizationRollup.record([(instructor_id, start, 'bookings')])
+        return appointment_id
+
+    # Przejścia stanów wykonywane jednym warunkowym UPDATE ... RETURNING: warunek i zmiana
+    # są atomowe, więc z dwóch równoległych żądań zmianę wykona tylko jedno. Metody zwracają
+    # wiersz z danymi potrzebnymi do powiadomień albo None, gdy warunek nie jest spełniony.
+    # Zmiany nie są zatwierdzane - wywołujący commituje je razem z powiadomieniem.
+    # Rezerwacje, odrzucenia i anulowania są liczone w UtilizationRollup w tej samej transakcji.
+
+    @classmethod
+    def _transition(cls, conditions, values, returning):
+        return db.session.execute(
+            db.update(cls).where(*conditions).values(**values).returning(*returning),
+            execution_options={'synchronize_session': False}
+        ).first()
+
+    @classmethod
+    def try_book(cls, appointment_id, student_id, topic, now):
+        booked = cls._transition(
+            (cls.id == appointment_id, cls.is_available == True, cls.start_time > now + BOOKING_LEAD_TIME,
+             cls.instructor_active()),
+            dict(student_id=student_id, is_available=False, status='pending', topic=topic,
+                 student_name=display_name(student_id)),
+            (cls.instructor_id, cls.start_time, cls.end_time)
+        )
+        if booked is not None:
+            UtilizationRollup.record([(booked.instructor_id, booked.start_time, 'bookings')])
+        return booked
+
+    @classmethod
+    def try_cancel(cls, appointment_id, student_id, now):
+        cancelled = cls._transition(
+            (cls.id == appointment_id, cls.student_id == student_id, cls.start_time > now + BOOKING_LEAD_TIME),
+            dict(student_id=None, is_available=True, status='available', topic=None, student_name=None),
+            (cls.instructor_id, cls.start_time, cls.end_time)
+        )
+        if cancelled is not None:
+            UtilizationRollup.record([(cancelled.instructor_id, cancelled.start_time, 'cancellations')])
+        return cancelled
+
+    @classmethod
+    def try_confirm(cls, appointment_id, instructor_id):
+        return cls._transition(
+            (cls.id == appointment_id, cls.instructor_id == instructor_id,
+             cls.status == 'pending', cls.student_id.isnot(None)),
+            dict(status='confirmed'),
+            (cls.student_id, cls.start_time, cls.end_time)
+        )
+
+    @classmethod
+    def try_release(cls, appointment_id, instructor_id, from_status, to_status):
+        """
+        Zwolnienie zarezerwowanego terminu przez instruktora (odrzucenie lub anulowanie).
+        """
+        released = cls.release_many([appointment_id], instructor_id, from_status, to_status)
+        return released[0] if released else None
+
+    # Wersje zbiorcze dla akcji wsadowych instruktora: jedna instrukcja na cały zbiór ID,
+    # z tymi samymi warunkami co przejścia pojedynczych terminów. Zwracają listę wierszy
+    # (z ID) terminów, które zostały zmienione.
+
+    @classmethod
+    def delete_available_many(cls, appointment_ids, instructor_id):
+        return db.session.execute(
+            db.delete(cls).where(
+                cls.id.in_(appointment_ids),
+                cls.instructor_id == instructor_id,
+                cls.is_available == True
+            ).returning(cls.id, cls.start_time, cls.end_time),
+            execution_options={'synchronize_session': False}
+        ).all()
+
+    @classmethod
+    def confirm_many(cls, appointment_ids, instructor_id):
+        return db.session.execute(
+            db.update(cls).where(
+                cls.id.in_(appointment_ids),
+                cls.instructor_id == instructor_id,
+                cls.status == 'pending',
+                cls.student_id.isnot(None)
+            ).values(status='confirmed').returning(cls.id, cls.student_id, cls.start_time, cls.end_time),
+            execution_options={'synchronize_session': False}
+        ).all()
+
+    @classmethod
+    def release_many(cls, appointment_ids, instructor_id, from_status, to_status):
+        """
+        RETURNING zwraca wartości po zmianie, a powiadomienie potrzebuje ID studenta,
+        więc wiersze są najpierw blokowane (SKIP LOCKED - równoległe żądanie od razu
+        przegrywa), a UPDATE nadal sprawdza status i studenta na wypadek baz bez blokad wierszy.
+        """
+        locked = db.session.execute(
+            db.select(cls.id, cls.student_id, cls.start_time, cls.end_time).where(
+                cls.id.in_(appointment_ids),
+                cls.instructor_id == instructor_id,
+                cls.status == from_status,
+                cls.student_id.isnot(None)
+            ).with_for_update(skip_locked=True)
+        ).all()
+        if not locked:
+            return []
+        updated = set(db.session.execute(
+            db.update(cls).where(
+                tuple_(cls.id, cls.student_id).in_([(row.id, row.student_id) for row in locked]),
+                cls.status == from_status
+            ).values(status=to_status, student_id=None, is_available=True, topic=None, student_name=None).returning(cls.id),
+            execution_options={'synchronize_session': False}
+        ).scalars())
+        released = [row for row in locked if row.id in updated]
+        counter = 'rejections' if to_status == 'rejected' else 'cancellations'
+        UtilizationRollup.record([(instructor_id, row.start_time, counter) for row in released])
+        return released
+
+# Ograniczenie wykluczające z operatorem = na kolumnie całkowitej potrzebuje btree_gist
+event.listen(
+    Appointment.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
+
+
+@event.listens_for(Appointment, 'before_insert')
+def _fill_student_name(mapper, connection, target):
+    # Terminy tworzone jako obiekty ORM z od razu przypisanym studentem
+    if target.student_id is not None and target.student_name is None:
+        target.student_name = connection.scalar(db.select(display_name(target.student_id)))
+
+
+@event.listens_for(User, 'after_update')
+def _sync_student_name(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.first_name.history.has_changes() or state.attrs.last_name.history.has_changes():
+        connection.execute(
+            db.update(Appointment).where(Appointment.student_id == target.id)
+            .values(student_name=f'{target.first_name} {target.last_name}')
+        )
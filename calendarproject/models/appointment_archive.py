@@ -0,0 +1,27 @@
+from calendarproject.extensions import db
+
+class ArchivedAppointment(db.Model):
+    """
+    Terminy sprzed okresu przechowywania w tabeli appointment. Na Postgresie to tabela
+    partycjonowana miesięcznie, do której zadanie maintain_partitions przepina stare
+    partycje appointment; czytają ją tylko raporty (utils.partitions.appointment_history)
+    i szczegóły powiadomień o zarchiwizowanych terminach.
+    """
+    __tablename__ = 'appointment_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    instructor_id = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, nullable=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    is_available = db.Column(db.Boolean, default=True)
+    topic = db.Column(db.String(200), nullable=True)
+    status = db.Column(db.String(20), default='pending')
+    student_name = db.Column(db.String(101), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_appointment_archive_instructor_id_start_time', 'instructor_id', 'start_time'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedAppointment {self.id}>'
@@ -0,0 +1,46 @@
+from calendarproject.extensions import db
+from datetime import datetime
+
+class AvailabilityRule(db.Model):
+    """
+    Cotygodniowe godziny dostępności instruktora (odpowiednik RRULE FREQ=WEEKLY;BYDAY=...)
+    dzielone na terminy o stałej długości. Terminy reguły nie są zapisywane w appointment -
+    wiersz powstaje dopiero przy rezerwacji.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Dzień tygodnia (poniedziałek = 0) i godziny w czasie lokalnym strefy timezone
+    weekday = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    slot_minutes = db.Column(db.Integer, nullable=False)
+    timezone = db.Column(db.String(64), nullable=False, default='UTC')
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_until = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    exceptions = db.relationship('AvailabilityException', backref='rule', cascade='all, delete-orphan',
+                                 lazy='selectin')
+
+    __table_args__ = (
+        db.Index('ix_availability_rule_instructor_id', 'instructor_id'),
+    )
+
+    def __repr__(self):
+        return f'<AvailabilityRule {self.id}>'
+
+
+class AvailabilityException(db.Model):
+    """
+    Dzień (lokalny), w którym reguła nie obowiązuje (odpowiednik EXDATE).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    rule_id = db.Column(db.Integer, db.ForeignKey('availability_rule.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('rule_id', 'day', name='uq_availability_exception_rule_id_day'),
+    )
+
+    def __repr__(self):
+        return f'<AvailabilityException {self.rule_id} {self.day}>'
@@ -0,0 +1,23 @@
+from calendarproject.extensions import db
+from datetime import datetime
+
+class InstructorDeletionJob(db.Model):
+    """
+    Usuwanie konta instruktora w tle (zadanie Celery) - stan i postęp dla panelu administratora.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # pending -> running -> done | failed
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    deleted_appointments = db.Column(db.Integer, default=0, nullable=False)
+    notified_students = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_instructor_deletion_job_instructor_id', 'instructor_id'),
+    )
+
+    def __repr__(self):
+        return f'<InstructorDeletionJob {self.id} {self.status}>'
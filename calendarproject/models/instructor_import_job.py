@@ -0,0 +1,24 @@
+from calendarproject.extensions import db
+from datetime import datetime
+
+class InstructorImportJob(db.Model):
+    """
+    Import kont instruktorów z pliku CSV w tle (zadanie Celery) - stan, postęp i raport błędów.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # pending -> running -> done | failed
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    # Treść pliku (z hasłami) - czyszczona po zakończeniu zadania
+    data = db.Column(db.Text, nullable=True)
+    processed = db.Column(db.Integer, default=0, nullable=False)
+    created = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    # Błędy wierszy [{'line': ..., 'message': ...}]
+    errors = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<InstructorImportJob {self.id} {self.status}>'
@@ -0,0 +1,28 @@
+from calendarproject.extensions import db
+from datetime import datetime
+
+class OutboxMessage(db.Model):
+    """
+    Wiadomość do dostarczenia (powiadomienie, e-mail) zapisana w tej samej transakcji co zmiana stanu.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(255), nullable=True)
+    # Najwcześniejsza kolejna próba (NULL - od razu); po błędzie rośnie wykładniczo
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    # Wyczerpane próby: wiadomość zostaje w tabeli do ręcznego ponowienia (flask outbox-retry)
+    dead_at = db.Column(db.DateTime, nullable=True)
+
+    # Relay czyta tylko nieprzetworzone i nieporzucone wiadomości, po kolei
+    __table_args__ = (
+        db.Index('ix_outbox_message_pending', 'id',
+                 sqlite_where=db.text('processed_at IS NULL AND dead_at IS NULL'),
+                 postgresql_where=db.text('processed_at IS NULL AND dead_at IS NULL')),
+    )
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.channel}>'
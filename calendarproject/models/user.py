@@ -14,6 +14,8 @@ class User(UserMixin, db.Model):
     last_name = db.Column(db.String(50), nullable=False)
     deleted = db.Column(db.Boolean, default=False)
     deleted_at = db.Column(db.DateTime, nullable=True)
+    # Sekret podpisywany w adresie kanału ICS; nowy sekret unieważnia dotychczasowy adres
+    feed_secret = db.Column(db.String(32), nullable=True)
 
     def soft_delete(self):
         self.deleted = True
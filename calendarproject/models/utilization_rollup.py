@@ -0,0 +1,73 @@
+from collections import Counter
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from calendarproject.extensions import db
+
+# Liczniki zdarzeń, które nie zostawiają śladu w stanie terminu (zwolniony termin wraca do puli)
+COUNTERS = ('bookings', 'rejections', 'cancellations')
+
+
+class UtilizationRollup(db.Model):
+    """
+    Dzienne podsumowanie terminów instruktora do raportów (dzień = data UTC początku terminu).
+
+    Liczniki zdarzeń rosną w transakcji samego przejścia stanu. Godziny i liczby terminów są
+    przeliczane z tabeli appointment tylko dla dni z pending_changes > 0.
+    """
+    instructor_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    slots = db.Column(db.Integer, default=0, nullable=False)
+    booked = db.Column(db.Integer, default=0, nullable=False)
+    offered_seconds = db.Column(db.Integer, default=0, nullable=False)
+    booked_seconds = db.Column(db.Integer, default=0, nullable=False)
+    confirmed_seconds = db.Column(db.Integer, default=0, nullable=False)
+    bookings = db.Column(db.Integer, default=0, nullable=False)
+    rejections = db.Column(db.Integer, default=0, nullable=False)
+    cancellations = db.Column(db.Integer, default=0, nullable=False)
+    # Liczba zmian od ostatniego przeliczenia; przeliczenie odejmuje tylko zmiany, które widziało
+    pending_changes = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_utilization_rollup_pending', 'instructor_id', 'day',
+                 sqlite_where=db.text('pending_changes > 0'),
+                 postgresql_where=db.text('pending_changes > 0')),
+    )
+
+    def __repr__(self):
+        return f'<UtilizationRollup {self.instructor_id} {self.day}>'
+
+    @classmethod
+    def record(cls, events):
+        """
+        Zapisuje zdarzenia (instructor_id, start_time, licznik z COUNTERS albo None - tylko zmiana)
+        i oznacza ich dni do przeliczenia jednym INSERT ... ON CONFLICT DO UPDATE (bez commita).
+        """
+        changes = Counter()
+        counters = Counter()
+        for instructor_id, start_time, counter in events:
+            key = (instructor_id, start_time.date())
+            changes[key] += 1
+            if counter:
+                counters[key + (counter,)] += 1
+        if not changes:
+            return
+
+        dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(cls).values([{
+            'instructor_id': instructor_id,
+            'day': day,
+            'slots': 0,
+            'booked': 0,
+            'offered_seconds': 0,
+            'booked_seconds': 0,
+            'confirmed_seconds': 0,
+            'pending_changes': count,
+            **{counter: counters[(instructor_id, day, counter)] for counter in COUNTERS},
+        } for (instructor_id, day), count in sorted(changes.items())])
+        increments = ('pending_changes',) + COUNTERS
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[cls.instructor_id, cls.day],
+            set_={name: getattr(cls, name) + statement.excluded[name] for name in increments}
+        ))
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
 from calendarproject.models.notification import Notification
 from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment_archive import ArchivedAppointment
 from calendarproject.extensions import db
 
 notifications = Blueprint('notifications', __name__)
@@ -17,7 +18,7 @@ def get_notifications():
     notifications_data = [{
         'id': notification.id,
         'message': notification.message,
-        'timestamp': notification.timestamp.isoformat(),
+        'timestamp': notification.timestamp,
         'is_read': notification.is_read,
         'type': notification.type,
         'related_id': notification.related_id
@@ -37,18 +38,20 @@ def get_notification_details(notification_id):
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
 
     appointment = Appointment.query.get(notification.related_id)
+    archived = appointment is None
+    if archived:
+        # Termin mógł zostać przeniesiony do archiwum razem ze starą partycją
+        appointment = db.session.get(ArchivedAppointment, notification.related_id)
     if appointment:
-        # Bezpieczne pobieranie danych studenta
-        student_info = ""
-        if appointment.student:
-            student_info = f"{appointment.student.first_name} {appointment.student.last_name}"
+        # Kopia imienia i nazwiska w terminie - bez ładowania appointment.student
+        student_info = appointment.student_name or ""
 
         response = {
             'status': 'success',
             'appointment': {
                 'id': appointment.id,
-                'start': appointment.start_time.isoformat(),
-                'end': appointment.end_time.isoformat(),
+                'start': appointment.start_time,
+                'end': appointment.end_time,
                 'title': 'Temat konsultacji: ' + str(appointment.topic),
                 'extendedProps': {
                     'student': student_info,
@@ -57,7 +60,8 @@ def get_notification_details(notification_id):
             }
         }
 
-        if current_user.is_instructor and appointment.status == 'pending':
+        # Zarchiwizowanych terminów nie można już zaakceptować ani odrzucić
+        if current_user.is_instructor and not archived and appointment.status == 'pending':
             response['appointment']['extendedProps']['can_accept'] = True
             response['appointment']['extendedProps']['can_decline'] = True
 
@@ -0,0 +1,51 @@
+from celery import shared_task
+
+from calendarproject.utils import calendar_cache, instructor_deletion, instructor_import, outbox, partitions, utilization
+
+
+@shared_task(ignore_result=True)
+def relay_outbox():
+    """
+    Przenosi wiadomości z outboxa do powiadomień, e-maili i innych kanałów.
+    """
+    return outbox.relay()
+
+
+@shared_task(ignore_result=True)
+def refresh_calendar_views():
+    """
+    Przelicza maski dostępności, katalog instruktorów i dni wykorzystania po zmianach terminów.
+    """
+    return calendar_cache.refresh_pending()
+
+
+@shared_task(ignore_result=True)
+def delete_instructor(job_id):
+    """
+    Usuwa terminy instruktora porcjami; postęp jest zapisywany w InstructorDeletionJob.
+    """
+    instructor_deletion.run(job_id)
+
+
+@shared_task(ignore_result=True)
+def import_instructors(job_id):
+    """
+    Zakłada konta instruktorów z pliku CSV zapisanego w InstructorImportJob.
+    """
+    instructor_import.run(job_id)
+
+
+@shared_task(ignore_result=True)
+def refresh_utilization():
+    """
+    Przelicza podsumowania wykorzystania dni, w których zmieniły się terminy.
+    """
+    return utilization.refresh()
+
+
+@shared_task(ignore_result=True)
+def maintain_partitions():
+    """
+    Tworzy partycje terminów na kolejne miesiące i archiwizuje partycje sprzed okresu przechowywania.
+    """
+    return partitions.maintain()
@@ -0,0 +1,105 @@
+from sqlalchemy import and_, case, func, or_
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.user import User
+
+# Dane panelu administratora ładowane stronami z paginacją po kluczu (keyset): kolejna
+# strona zaczyna się za ostatnim wierszem poprzedniej, więc koszt strony nie zależy
+# od tego, jak daleko przewinięto listę ani od rozmiaru tabel.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(value):
+    if not value or value < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(value, MAX_PAGE_SIZE)
+
+
+def instructor_counts(instructor_ids):
+    """
+    {id instruktora: (terminy, zarezerwowane, oczekujące)} - jedno zapytanie grupujące
+    po indeksie (instructor_id, start_time), tylko dla instruktorów ze strony.
+    """
+    booked = Appointment.is_available == False
+    rows = db.session.execute(
+        db.select(
+            Appointment.instructor_id,
+            func.count(),
+            func.sum(case((booked, 1), else_=0)),
+            func.sum(case((and_(booked, Appointment.status == 'pending'), 1), else_=0))
+        ).where(Appointment.instructor_id.in_(instructor_ids)).group_by(Appointment.instructor_id)
+    )
+    return {instructor_id: (slots, int(booked), int(pending)) for instructor_id, slots, booked, pending in rows}
+
+
+def instructor_page(after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Strona aktywnych instruktorów (rosnąco po ID) z liczbami terminów. Zwraca
+    (wiersze, ID do parametru after_id następnej strony albo None).
+    """
+    query = db.select(User.id, User.first_name, User.last_name, User.username, User.email).where(
+        User.is_instructor == True,
+        User.deleted == False
+    )
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    # Jeden wiersz więcej mówi, czy istnieje następna strona
+    rows = db.session.execute(query.order_by(User.id).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    counts = instructor_counts([row.id for row in rows]) if rows else {}
+    items = []
+    for row in rows:
+        slots, booked, pending = counts.get(row.id, (0, 0, 0))
+        items.append({
+            'id': row.id,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'username': row.username,
+            'email': row.email,
+            'slots': slots,
+            'booked': booked,
+            'pending': pending,
+        })
+    return items, (rows[-1].id if more else None)
+
+
+def appointment_page(instructor_id, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Strona terminów instruktora rosnąco po (start_time, id) - zakres na indeksie
+    (instructor_id, start_time). after to (start_time, id) ostatniego wiersza poprzedniej
+    strony. Zwraca (wiersze, kursor następnej strony albo None).
+    """
+    query = db.select(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.end_time,
+        Appointment.is_available,
+        Appointment.status,
+        Appointment.topic,
+        Appointment.student_name
+    ).where(Appointment.instructor_id == instructor_id)
+    if after is not None:
+        after_start, after_id = after
+        query = query.where(or_(
+            Appointment.start_time > after_start,
+            and_(Appointment.start_time == after_start, Appointment.id > after_id)
+        ))
+    rows = db.session.execute(query.order_by(Appointment.start_time, Appointment.id).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [{
+        'id': row.id,
+        'start': row.start_time,
+        'end': row.end_time,
+        'is_available': row.is_available,
+        'status': row.status,
+        'topic': row.topic,
+        'student': row.student_name or '',
+    } for row in rows]
+    return items, ((rows[-1].start_time, rows[-1].id) if more else None)
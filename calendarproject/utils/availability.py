@@ -0,0 +1,222 @@
+import time
+from datetime import timedelta
+
+from flask import current_app
+from redis.exceptions import RedisError, WatchError
+
+from calendarproject.extensions import db
+from calendarproject.initializers import redis
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils import calendar_cache
+from calendarproject.utils.availability_rules import free_occurrences
+from calendarproject.utils.weeks import WEEK, naive_utc, weeks_overlapping
+
+# Tydzień instruktora jako mapa bitowa komórek 15-minutowych (bit i = i-ta komórka od
+# poniedziałku 00:00 UTC). Maski są liczbami całkowitymi Pythona, więc AND/OR dla całego
+# tygodnia to jedna operacja w C zamiast zapytania zakresowego na instruktora.
+
+CELL = timedelta(minutes=15)
+CELLS_PER_WEEK = WEEK // CELL
+MASK_BYTES = CELLS_PER_WEEK // 8
+
+# Hash Redis na tydzień: pole <instructor_id> -> maska wolnych + maska zajętych (po 84 bajty)
+WEEK_KEY = 'availability:week:{week}'
+
+
+def cell_range(start, end, origin):
+    """
+    Indeksy komórek [first, last) nakładających się na [start, end), liczone od origin.
+    """
+    first = (naive_utc(start) - origin) // CELL
+    last = -((origin - naive_utc(end)) // CELL)
+    return first, last
+
+
+def span_mask(first, last, size=CELLS_PER_WEEK):
+    """
+    Maska z ustawionymi bitami komórek [first, last), przyciętych do [0, size).
+    """
+    first = max(first, 0)
+    last = min(last, size)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def build_masks(rows, week):
+    """
+    Maski (wolne, zajęte) tygodnia z krotek (start_time, end_time, is_available).
+    """
+    free = busy = 0
+    for start_time, end_time, is_available in rows:
+        mask = span_mask(*cell_range(start_time, end_time, week))
+        if is_available:
+            free |= mask
+        else:
+            busy |= mask
+    return free, busy
+
+
+def _encode(free, busy):
+    return free.to_bytes(MASK_BYTES, 'little') + busy.to_bytes(MASK_BYTES, 'little')
+
+
+def _decode(value):
+    return int.from_bytes(value[:MASK_BYTES], 'little'), int.from_bytes(value[MASK_BYTES:], 'little')
+
+
+def week_key(week):
+    return WEEK_KEY.format(week=week.date().isoformat())
+
+
+def _load_from_db(instructor_ids, week):
+    rows = db.session.execute(
+        db.select(
+            Appointment.instructor_id,
+            Appointment.start_time,
+            Appointment.end_time,
+            Appointment.is_available
+        ).where(
+            Appointment.instructor_id.in_(instructor_ids),
+            Appointment.overlapping(week, week + WEEK),
+            Appointment.instructor_active()
+        )
+    ).all()
+    per_instructor = {instructor_id: [] for instructor_id in instructor_ids}
+    for instructor_id, start_time, end_time, is_available in rows:
+        per_instructor[instructor_id].append((start_time, end_time, is_available))
+    # Wolne terminy reguł dostępności (zarezerwowane są już wierszami appointment)
+    for _, instructor_id, start_time, end_time in free_occurrences(week, week + WEEK, instructor_ids=instructor_ids):
+        per_instructor[instructor_id].append((start_time, end_time, True))
+    return {instructor_id: build_masks(slots, week) for instructor_id, slots in per_instructor.items()}
+
+
+def _read_masks(key, instructor_ids):
+    # Wersje kalendarzy czytane przed ładowaniem z bazy; _store_masks zapisze maski tylko
+    # instruktorów, których wersja się nie zmieniła
+    version_keys = [calendar_cache.version_key(instructor_id) for instructor_id in instructor_ids]
+    pipe = redis.pipeline(transaction=False)
+    for version_key in version_keys:
+        pipe.set(version_key, time.time_ns(), nx=True)
+    pipe.mget(version_keys)
+    pipe.hmget(key, instructor_ids)
+    *_, versions, cached = pipe.execute()
+    return dict(zip(instructor_ids, versions)), cached
+
+
+def _store_masks(key, versions, loaded):
+    """
+    Zapisuje maski załadowane z bazy, pomijając instruktorów, których terminy zmieniły się
+    od odczytu (ich pole przelicza refresh_pending). Zwraca liczbę zapisanych masek.
+    """
+    version_keys = [calendar_cache.version_key(instructor_id) for instructor_id in loaded]
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(*version_keys)
+            current = pipe.mget(version_keys)
+            fresh = {instructor_id: _encode(*pair) for (instructor_id, pair), version in zip(loaded.items(), current)
+                     if version == versions[instructor_id]}
+            if not fresh:
+                return 0
+            pipe.multi()
+            pipe.hset(key, mapping=fresh)
+            pipe.expire(key, current_app.config.get('CALENDAR_CACHE_TTL', 86400))
+            pipe.execute()
+            return len(fresh)
+        except WatchError:
+            return 0
+
+
+def week_masks(instructor_ids, week):
+    """
+    Maski tygodnia dla wielu instruktorów: jeden HMGET, brakujące budowane z bazy dla wszystkich naraz.
+    """
+    if not instructor_ids:
+        return {}
+    key = week_key(week)
+    versions = {}
+    try:
+        versions, cached = _read_masks(key, instructor_ids)
+        redis_available = True
+    except RedisError as e:
+        current_app.logger.warning(f"Mapy dostępności niedostępne w Redis: {e}")
+        cached = [None] * len(instructor_ids)
+        redis_available = False
+
+    masks = {}
+    missing = []
+    for instructor_id, value in zip(instructor_ids, cached):
+        if value is None:
+            missing.append(instructor_id)
+        else:
+            masks[instructor_id] = _decode(value)
+
+    if missing:
+        loaded = _load_from_db(missing, week)
+        masks.update(loaded)
+        if redis_available:
+            try:
+                _store_masks(key, versions, loaded)
+            except RedisError as e:
+                current_app.logger.warning(f"Nie udało się zapisać map dostępności: {e}")
+    return masks
+
+
+def window_masks(instructor_ids, start, end):
+    """
+    Maski (wolne, zajęte) okna [start, end) zaokrąglonego do pełnych komórek.
+
+    Zwraca (początek okna, liczbę komórek, {instructor_id: (wolne, zajęte)}).
+    """
+    weeks = weeks_overlapping(start, end)
+    origin = weeks[0]
+    first, last = cell_range(start, end, origin)
+    size = last - first
+    window = (1 << size) - 1
+
+    combined = {instructor_id: [0, 0] for instructor_id in instructor_ids}
+    for index, week in enumerate(weeks):
+        shift = index * CELLS_PER_WEEK
+        for instructor_id, (free, busy) in week_masks(instructor_ids, week).items():
+            combined[instructor_id][0] |= free << shift
+            combined[instructor_id][1] |= busy << shift
+
+    result = {
+        instructor_id: ((free >> first) & window, (busy >> first) & window)
+        for instructor_id, (free, busy) in combined.items()
+    }
+    return origin + first * CELL, size, result
+
+
+def to_bits(mask, size):
+    """
+    Maska jako ciąg '0'/'1' w kolejności komórek.
+    """
+    return format(mask, f'0{size}b')[::-1] if size else ''
+
+
+def refresh_instructor(instructor_id, start_time, end_time):
+    """
+    Przebudowuje maski instruktora w tygodniach, na które nakłada się zmieniony termin.
+
+    Tygodnie, których nie ma jeszcze w Redis, zostaną zbudowane przy pierwszym odczycie.
+    """
+    try:
+        for week in weeks_overlapping(start_time, end_time):
+            key = week_key(week)
+            if redis.exists(key):
+                free, busy = _load_from_db([instructor_id], week)[instructor_id]
+                redis.hset(key, instructor_id, _encode(free, busy))
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się zaktualizować map dostępności: {e}")
+
+
+def drop_instructor(instructor_id):
+    """
+    Usuwa maski instruktora ze wszystkich tygodni.
+    """
+    try:
+        for key in redis.scan_iter(match=WEEK_KEY.format(week='*'), count=500):
+            redis.hdel(key, instructor_id)
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się usunąć map dostępności: {e}")
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import pytz
+from sqlalchemy import or_
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import BOOKING_LEAD_TIME, Appointment
+from calendarproject.models.availability_rule import AvailabilityException, AvailabilityRule
+from calendarproject.models.user import User
+from calendarproject.utils.recurring import (MAX_SLOT_MINUTES, MIN_SLOT_MINUTES, PlanError, day_slots,
+                                             overlapping_slots, parse_date, parse_pattern)
+from calendarproject.utils.weeks import WEEK, naive_utc, week_start, weeks_overlapping
+
+# Reguły dostępności rozwijane w terminy dopiero dla żądanego okna. Termin reguły,
+# na który nakłada się zapisany termin instruktora (np. rezerwacja tego terminu),
+# jest pomijany, więc tabela appointment rośnie z rezerwacjami, a nie z godzinami pracy.
+
+# ID wydarzenia terminu reguły: reguła i początek terminu (sekundy UTC)
+EVENT_ID = 'rule-{rule}-{start}'
+
+MAX_RULE_SLOT = timedelta(minutes=MAX_SLOT_MINUTES)
+# Jak daleko naprzód wyszukiwanie najbliższych terminów rozwija reguły
+SEARCH_HORIZON = timedelta(days=366)
+
+
+def _timestamp(value):
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def event_id(rule_id, start_time):
+    return EVENT_ID.format(rule=rule_id, start=_timestamp(start_time))
+
+
+def parse_rules(data):
+    """
+    Reguły z danych w formacie planu cyklicznego (pattern, slot_minutes, timeZone,
+    start_date, opcjonalnie end_date i exceptions) - jedna reguła na przedział wzorca.
+    """
+    if not isinstance(data, dict):
+        raise PlanError('Nieprawidłowe dane JSON.')
+    try:
+        tz = pytz.timezone(data.get('timeZone') or 'UTC')
+    except pytz.UnknownTimeZoneError:
+        raise PlanError('Nieznana strefa czasowa')
+
+    valid_from = parse_date(data.get('start_date'), 'start_date')
+    valid_until = parse_date(data['end_date'], 'end_date') if data.get('end_date') else None
+    if valid_until is not None and valid_until < valid_from:
+        raise PlanError('Data końcowa musi być taka sama lub późniejsza niż data początkowa.')
+
+    slot_minutes = data.get('slot_minutes')
+    if not isinstance(slot_minutes, int) or not MIN_SLOT_MINUTES <= slot_minutes <= MAX_SLOT_MINUTES:
+        raise PlanError(f'Długość terminu musi wynosić od {MIN_SLOT_MINUTES} do {MAX_SLOT_MINUTES} minut.')
+
+    exceptions = {parse_date(value, 'exceptions') for value in data.get('exceptions') or []}
+    rules = []
+    for weekday, intervals in sorted(parse_pattern(data.get('pattern')).items()):
+        for start, end in intervals:
+            rule = AvailabilityRule(weekday=weekday, start_time=start, end_time=end, slot_minutes=slot_minutes,
+                                    timezone=tz.zone, valid_from=valid_from, valid_until=valid_until)
+            rule.exceptions = [AvailabilityException(day=day) for day in sorted(exceptions)
+                               if day.weekday() == weekday]
+            rules.append(rule)
+    return rules
+
+
+def rule_to_dict(rule):
+    return {
+        'id': rule.id,
+        'weekday': rule.weekday,
+        'start': rule.start_time.strftime('%H:%M'),
+        'end': rule.end_time.strftime('%H:%M'),
+        'slot_minutes': rule.slot_minutes,
+        'timeZone': rule.timezone,
+        'start_date': rule.valid_from.isoformat(),
+        'end_date': rule.valid_until.isoformat() if rule.valid_until else None,
+        'exceptions': sorted(exception.day.isoformat() for exception in rule.exceptions),
+    }
+
+
+def _definition(rule):
+    return (rule.weekday, rule.start_time, rule.end_time, rule.slot_minutes, rule.timezone,
+            rule.valid_from, rule.valid_until, frozenset(exception.day for exception in rule.exceptions))
+
+
+@lru_cache(maxsize=4096)
+def _week_occurrences(definition, week):
+    """
+    Terminy reguły zaczynające się w tygodniu UTC week. Wynik zależy tylko od definicji
+    reguły i tygodnia, więc jest zapamiętywany w procesie dla pary (reguła, tydzień).
+    """
+    weekday, start, end, slot_minutes, tz_name, valid_from, valid_until, exceptions = definition
+    tz = pytz.timezone(tz_name)
+    occurrences = []
+    # Lokalny dzień reguły może zaczynać się w sąsiednim tygodniu UTC
+    for offset in range(-1, 8):
+        day = (week + timedelta(days=offset)).date()
+        if (day.weekday() != weekday or day < valid_from or day in exceptions
+                or (valid_until is not None and day > valid_until)):
+            continue
+        occurrences.extend(
+            slot for slot in day_slots(day, start, end, timedelta(minutes=slot_minutes), tz)
+            if week <= slot[0] < week + WEEK
+        )
+    return tuple(occurrences)
+
+
+def occurrences(rule, start, end):
+    """
+    Terminy reguły nakładające się na [start, end), bez uwzględnienia zapisanych terminów.
+    """
+    definition = _definition(rule)
+    return [
+        (slot_start, slot_end)
+        # Termin zaczęty w poprzednim tygodniu może sięgać do początku okna
+        for week in weeks_overlapping(start - MAX_RULE_SLOT, end)
+        for slot_start, slot_end in _week_occurrences(definition, week)
+        if slot_start < end and slot_end > start
+    ]
+
+
+def _rules(start, end, instructor_ids=None):
+    query = db.select(AvailabilityRule).join(User, User.id == AvailabilityRule.instructor_id).where(
+        User.deleted == False,
+        # Data lokalna może różnić się od daty UTC o jeden dzień
+        AvailabilityRule.valid_from <= (end + timedelta(days=1)).date(),
+        or_(AvailabilityRule.valid_until.is_(None), AvailabilityRule.valid_until >= (start - timedelta(days=1)).date())
+    )
+    if instructor_ids is not None:
+        query = query.where(AvailabilityRule.instructor_id.in_(instructor_ids))
+    return db.session.execute(query.order_by(AvailabilityRule.id)).scalars().all()
+
+
+def _free(rules, start, end):
+    by_instructor = {}
+    for rule in rules:
+        by_instructor.setdefault(rule.instructor_id, []).extend(
+            (slot_start, slot_end, rule.id) for slot_start, slot_end in occurrences(rule, start, end)
+        )
+
+    existing = {}
+    for owner, row_start, row_end in db.session.execute(
+        db.select(Appointment.instructor_id, Appointment.start_time, Appointment.end_time).where(
+            Appointment.instructor_id.in_(by_instructor),
+            Appointment.overlapping(start - MAX_RULE_SLOT, end + MAX_RULE_SLOT)
+        ).order_by(Appointment.start_time)
+    ):
+        existing.setdefault(owner, []).append((row_start, row_end))
+
+    free = []
+    for owner, slots in by_instructor.items():
+        slots.sort()
+        taken = set(overlapping_slots([(slot_start, slot_end) for slot_start, slot_end, _ in slots],
+                                      existing.get(owner, [])))
+        free.extend((rule_id, owner, slot_start, slot_end) for slot_start, slot_end, rule_id in slots
+                    if (slot_start, slot_end) not in taken)
+    free.sort(key=lambda occurrence: occurrence[2])
+    return free
+
+
+def free_occurrences(start, end, instructor_id=None, instructor_ids=None):
+    """
+    Wolne terminy reguł nakładające się na [start, end) jako krotki
+    (rule_id, instructor_id, start_time, end_time), posortowane po początku;
+    opcjonalnie jednego instruktora albo instruktorów instructor_ids.
+
+    Terminy nakładające się na zapisane terminy instruktora (rezerwacje terminów reguł,
+    ręcznie dodane terminy) są pomijane - jedno zapytanie zakresowe na całe okno.
+    """
+    if instructor_id:
+        instructor_ids = [instructor_id]
+    start, end = naive_utc(start), naive_utc(end)
+    rules = _rules(start, end, instructor_ids)
+    if not rules:
+        return []
+    return _free(rules, start, end)
+
+
+def iter_free_occurrences(after, instructor_ids=None, horizon=SEARCH_HORIZON):
+    """
+    Wolne terminy reguł zaczynające się po after, w kolejności początku (krotki jak
+    w free_occurrences), opcjonalnie tylko instruktorów instructor_ids, najdalej horizon
+    naprzód. Reguły są czytane raz, zapisane terminy - jednym zapytaniem na tydzień, więc
+    kolejne tygodnie są czytane tylko, gdy wywołujący potrzebuje dalszych terminów.
+    """
+    after = naive_utc(after)
+    limit = after + horizon
+    rules = _rules(after, limit, instructor_ids)
+    start = after
+    while rules and start < limit:
+        end = min(week_start(start) + WEEK, limit)
+        # Termin przechodzący przez granicę tygodni należy do tygodnia swojego początku
+        yield from (occurrence for occurrence in _free(rules, start, end)
+                    if occurrence[2] >= start and occurrence[2] > after)
+        start = end
+        rules = [rule for rule in rules
+                 if rule.valid_until is None or rule.valid_until >= (start - timedelta(days=1)).date()]
+
+
+def book_occurrence(rule_id, start_timestamp, student_id, topic, now):
+    """
+    Zapisuje termin reguły jako rezerwację studenta. Zwraca (ID terminu, instructor_id,
+    start_time, end_time) albo None, gdy termin nie należy do reguły, zaczyna się za mniej
+    niż 30 minut lub nakłada się na zapisany termin (np. zarezerwowany przez kogoś innego).
+    """
+    rule = db.session.execute(
+        db.select(AvailabilityRule).join(User, User.id == AvailabilityRule.instructor_id)
+        .where(AvailabilityRule.id == rule_id, User.deleted == False)
+    ).scalar()
+    if rule is None:
+        return None
+    start = datetime.fromtimestamp(start_timestamp, timezone.utc).replace(tzinfo=None)
+    end = next((slot_end for slot_start, slot_end in _week_occurrences(_definition(rule), week_start(start))
+                if slot_start == start), None)
+    if end is None or start <= naive_utc(now) + BOOKING_LEAD_TIME:
+        return None
+
+    appointment_id = Appointment.try_add(rule.instructor_id, start, end, student_id=student_id, topic=topic)
+    if appointment_id is None:
+        return None
+    return appointment_id, rule.instructor_id, start, end
+
+
+def delete_rules(instructor_id):
+    """
+    Usuwa reguły instruktora wraz z wyjątkami (bez commita).
+    """
+    rule_ids = db.select(AvailabilityRule.id).where(AvailabilityRule.instructor_id == instructor_id)
+    db.session.execute(db.delete(AvailabilityException).where(AvailabilityException.rule_id.in_(rule_ids)))
+    db.session.execute(db.delete(AvailabilityRule).where(AvailabilityRule.instructor_id == instructor_id))
@@ -0,0 +1,119 @@
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.notifications import notify_many, notify_students_appointment_status
+
+# Wsadowe akcje instruktora na terminach. Każdy rodzaj akcji to jedna instrukcja
+# DELETE/UPDATE na zbiorze ID, powiadomienia trafiają do outboxa wsadowym INSERT,
+# a całość zatwierdza wywołujący jednym commitem.
+
+MAX_BATCH_ACTIONS = 200
+
+DELETE = 'delete'
+CONFIRM = 'confirm'
+REJECT = 'reject'
+CANCEL = 'cancel'
+
+# Dla zwolnień: (status przed, status po, status w e-mailu, słowo w powiadomieniu)
+RELEASES = {
+    REJECT: ('pending', 'rejected', 'rejected', 'odrzucona'),
+    CANCEL: ('confirmed', 'pending', 'cancelled', 'anulowana'),
+}
+
+# Komunikaty jak w pojedynczych endpointach
+FAILURES = {
+    DELETE: 'Termin nie został znaleziony lub nie jest dostępny',
+    CONFIRM: 'Wizyta została już zaakceptowana lub nie oczekuje na akceptację',
+    REJECT: 'Wizyta nie oczekuje już na akceptację',
+    CANCEL: 'Wizyta została już anulowana',
+}
+
+
+class BatchError(ValueError):
+    """
+    Błąd walidacji listy akcji; komunikat jest zwracany użytkownikowi.
+    """
+
+
+def parse_actions(data):
+    """
+    Lista akcji [{'action': 'delete'|'confirm'|'reject'|'cancel', 'id': ID terminu}]
+    jako lista krotek (akcja, ID). Termin może wystąpić w liście tylko raz.
+    """
+    actions = data.get('actions') if isinstance(data, dict) else None
+    if not isinstance(actions, list) or not actions:
+        raise BatchError('Lista akcji musi zawierać co najmniej jedną akcję.')
+    if len(actions) > MAX_BATCH_ACTIONS:
+        raise BatchError(f'Jedno żądanie może zawierać najwyżej {MAX_BATCH_ACTIONS} akcji.')
+
+    parsed = []
+    seen = set()
+    for item in actions:
+        action = item.get('action') if isinstance(item, dict) else None
+        appointment_id = item.get('id') if isinstance(item, dict) else None
+        if action not in FAILURES:
+            raise BatchError(f'Nieznana akcja: {action}')
+        if not isinstance(appointment_id, int) or isinstance(appointment_id, bool):
+            raise BatchError('ID terminu musi być liczbą całkowitą.')
+        if appointment_id in seen:
+            raise BatchError(f'Termin {appointment_id} występuje w liście więcej niż raz.')
+        seen.add(appointment_id)
+        parsed.append((action, appointment_id))
+    return parsed
+
+
+def apply_actions(instructor, actions):
+    """
+    Wykonuje akcje bez commita. Zwraca (wyniki w kolejności akcji, zmiany do unieważnienia
+    cache jako krotki (start_time, end_time, student_id)).
+    """
+    ids = {}
+    for action, appointment_id in actions:
+        ids.setdefault(action, []).append(appointment_id)
+
+    done = set()
+    changes = []
+    notifications = []
+    emails = []
+    instructor_name = f"{instructor.first_name} {instructor.last_name}"
+
+    if DELETE in ids:
+        for row in Appointment.delete_available_many(ids[DELETE], instructor.id):
+            done.add(row.id)
+            changes.append((row.start_time, row.end_time, None))
+
+    if CONFIRM in ids:
+        for row in Appointment.confirm_many(ids[CONFIRM], instructor.id):
+            done.add(row.id)
+            changes.append((row.start_time, row.end_time, row.student_id))
+            notifications.append({
+                'user_id': row.student_id,
+                'message': f'Twoja wizyta na {row.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została zaakceptowana.',
+                'type': 'appointment',
+                'related_id': row.id,
+            })
+            emails.append((row.student_id, row.start_time, 'confirmed'))
+
+    for action, (from_status, to_status, email_status, word) in RELEASES.items():
+        if action not in ids:
+            continue
+        for row in Appointment.release_many(ids[action], instructor.id, from_status, to_status):
+            done.add(row.id)
+            changes.append((row.start_time, row.end_time, row.student_id))
+            notifications.append({
+                'user_id': row.student_id,
+                'message': f'Twoja wizyta na {row.start_time.strftime("%Y-%m-%d %H:%M")} u {instructor_name} została {word}.',
+                'type': 'appointment',
+                'related_id': row.id,
+            })
+            emails.append((row.student_id, row.start_time, email_status))
+
+    notify_many(notifications)
+    notify_students_appointment_status(emails)
+
+    results = []
+    for action, appointment_id in actions:
+        if appointment_id in done:
+            results.append({'id': appointment_id, 'action': action, 'status': 'success'})
+        else:
+            results.append({'id': appointment_id, 'action': action, 'status': 'error',
+                            'message': FAILURES[action]})
+    return results, changes
@@ -0,0 +1,315 @@
+import time
+from datetime import datetime
+
+from flask import current_app
+from redis.exceptions import RedisError, WatchError
+
+from calendarproject.initializers import redis
+from calendarproject.utils import availability, instructor_directory, utilization
+from calendarproject.utils.calendar_feeds import available_events, rule_events
+from calendarproject.utils.weeks import WEEK, naive_utc, weeks_overlapping
+
+# Klucze cache wolnych terminów: calendar:slots:<instructor_id|all>:<poniedziałek tygodnia UTC>
+SLOTS_KEY = 'calendar:slots:{instructor}:{week}'
+STATS_KEY = 'calendar:cache:stats'
+# Wersja zmian terminów instruktora (oraz wersja zbiorcza 'all'), z której liczone są ETagi
+VERSION_KEY = 'calendar:version:{instructor}'
+STUDENT_VERSION_KEY = 'calendar:version:student:{student}'
+ALL_INSTRUCTORS = 'all'
+# Tygodniowe bloki VEVENT kanałów ICS: calendar:ics:<instructor|student>:<id>:<poniedziałek tygodnia UTC>
+ICS_WEEK_KEY = 'calendar:ics:{owner}:{week}'
+# Zmiany czekające na przeliczenie w tle (refresh_pending): "<instructor_id>:<data>"
+# tygodni dla map dostępności i katalogu oraz dni dla podsumowań wykorzystania
+PENDING_WEEKS_KEY = 'calendar:pending:weeks'
+PENDING_DAYS_KEY = 'calendar:pending:days'
+
+
+def slots_key(instructor_id, week):
+    return SLOTS_KEY.format(instructor=instructor_id or ALL_INSTRUCTORS, week=week.date().isoformat())
+
+
+def _load_week(instructor_id, week):
+    events = available_events(week, week + WEEK, instructor_id) + rule_events(week, week + WEEK, instructor_id)
+    return current_app.json.dumps(events).encode()
+
+
+def _record(hits, misses):
+    try:
+        pipe = redis.pipeline(transaction=False)
+        if hits:
+            pipe.hincrby(STATS_KEY, 'hits', hits)
+        if misses:
+            pipe.hincrby(STATS_KEY, 'misses', misses)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def read_versioned(key, keys):
+    """
+    (wersja spod key, wartości keys) jednym pipeline. Wersja jest czytana przed ładowaniem
+    brakujących wartości z bazy; store_versioned zapisze je tylko przy tej samej wersji.
+    """
+    pipe = redis.pipeline(transaction=False)
+    pipe.set(key, time.time_ns(), nx=True)
+    pipe.get(key)
+    pipe.mget(keys)
+    _, version, cached = pipe.execute()
+    return version, cached
+
+
+def store_versioned(key, version, payloads, ttl):
+    """
+    Zapisuje wartości załadowane z bazy, o ile wersja spod key nie zmieniła się od odczytu.
+
+    Zmiana zatwierdzona w trakcie ładowania podbija wersję po usunięciu kluczy, więc
+    nieaktualny odczyt nie nadpisze już unieważnionego tygodnia. Zwraca True po zapisie.
+    """
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.get(key) != version:
+                return False
+            pipe.multi()
+            for week_key, payload in payloads.items():
+                pipe.setex(week_key, ttl, payload)
+            pipe.execute()
+            return True
+        except WatchError:
+            return False
+
+
+def get_available_events(instructor_id, start, end):
+    """
+    Wolne terminy nakładające się na [start, end), czytane z cache Redis tydzień po tygodniu.
+
+    Brakujące tygodnie są ładowane z bazy i zapisywane w cache, chyba że w międzyczasie
+    zmieniły się terminy. Gdy Redis jest niedostępny, wszystkie tygodnie są czytane z bazy.
+    """
+    weeks = weeks_overlapping(start, end)
+    keys = [slots_key(instructor_id, week) for week in weeks]
+
+    version = None
+    try:
+        version, cached = read_versioned(version_key(instructor_id), keys) if keys else (None, [])
+        redis_available = True
+    except RedisError as e:
+        current_app.logger.warning(f"Cache kalendarza niedostępny: {e}")
+        cached = [None] * len(keys)
+        redis_available = False
+
+    ttl = current_app.config.get('CALENDAR_CACHE_TTL', 86400)
+    payloads = []
+    missing = {}
+    for week, key, payload in zip(weeks, keys, cached):
+        if payload is None:
+            payload = _load_week(instructor_id, week)
+            missing[key] = payload
+        payloads.append(payload)
+
+    if redis_available:
+        try:
+            if missing and not store_versioned(version_key(instructor_id), version, missing, ttl):
+                current_app.logger.info("Pominięto zapis cache kalendarza: terminy zmieniły się w trakcie odczytu")
+        except RedisError as e:
+            current_app.logger.warning(f"Nie udało się zapisać cache kalendarza: {e}")
+        _record(len(keys) - len(missing), len(missing))
+
+    start = naive_utc(start)
+    end = naive_utc(end)
+    events = []
+    seen = set()
+    for payload in payloads:
+        for event in current_app.json.loads(payload):
+            # Termin obejmujący granicę tygodni jest zapisany w obu tygodniach
+            if event['id'] in seen:
+                continue
+            if datetime.fromisoformat(event['start']) < end and datetime.fromisoformat(event['end']) > start:
+                seen.add(event['id'])
+                events.append(event)
+    return events
+
+
+def ics_week_key(owner, week):
+    return ICS_WEEK_KEY.format(owner=owner, week=week.date().isoformat())
+
+
+def version_key(instructor_id):
+    return VERSION_KEY.format(instructor=instructor_id or ALL_INSTRUCTORS)
+
+
+def student_version_key(student_id):
+    return STUDENT_VERSION_KEY.format(student=student_id)
+
+
+def _bump(pipe, keys):
+    # Brakująca wersja (np. po wyczyszczeniu Redisa) startuje od znacznika czasu,
+    # żeby nie powtórzyć wartości, którą klient mógł już zapamiętać w ETagu.
+    for key in keys:
+        pipe.set(key, time.time_ns(), nx=True)
+        pipe.incr(key)
+
+
+def _bump_versions(pipe, instructor_id):
+    _bump(pipe, (version_key(instructor_id), version_key(None)))
+
+
+def get_version(instructor_id):
+    """
+    Bieżąca wersja terminów instruktora (lub wszystkich instruktorów), None gdy Redis jest niedostępny.
+    """
+    return _get_version(version_key(instructor_id))
+
+
+def get_student_version(student_id):
+    """
+    Bieżąca wersja rezerwacji studenta, None gdy Redis jest niedostępny.
+    """
+    return _get_version(student_version_key(student_id))
+
+
+def _get_version(key):
+    try:
+        version = redis.get(key)
+        if version is None:
+            redis.set(key, time.time_ns(), nx=True)
+            version = redis.get(key)
+        return version.decode()
+    except RedisError as e:
+        current_app.logger.warning(f"Wersja kalendarza niedostępna: {e}")
+        return None
+
+
+def invalidate_slots(instructor_id, start_time, end_time, student_id=None):
+    """
+    Usuwa z cache tygodnie, na które nakłada się zmieniony termin instruktora,
+    i podbija wersję jego kalendarza. Gdy termin dotyczy studenta, unieważnia
+    też jego kanał ICS.
+    """
+    invalidate_changes(instructor_id, [(start_time, end_time, student_id)])
+
+
+def invalidate_changes(instructor_id, changes):
+    """
+    Jak invalidate_slots dla wielu terminów instruktora (start_time, end_time, student_id)
+    naraz: jedno usunięcie kluczy i jedno podbicie wersji w jednym pipeline.
+
+    Przeliczenia z bazy (maski dostępności, katalog, dni wykorzystania) są tylko
+    zapisywane do kolejki i wykonywane w tle przez refresh_pending.
+    """
+    if not changes:
+        return
+    weeks = set()
+    days = set()
+    keys = set()
+    student_ids = set()
+    for start_time, end_time, student_id in changes:
+        days.add(f'{instructor_id}:{start_time.date().isoformat()}')
+        for week in weeks_overlapping(start_time, end_time):
+            weeks.add(f'{instructor_id}:{week.date().isoformat()}')
+            keys.add(slots_key(instructor_id, week))
+            keys.add(slots_key(None, week))
+            keys.add(ics_week_key(f'instructor:{instructor_id}', week))
+            if student_id:
+                keys.add(ics_week_key(f'student:{student_id}', week))
+        if student_id:
+            student_ids.add(student_id)
+    try:
+        pipe = redis.pipeline()
+        pipe.delete(*keys)
+        _bump_versions(pipe, instructor_id)
+        _bump(pipe, [student_version_key(student_id) for student_id in sorted(student_ids)])
+        pipe.sadd(PENDING_WEEKS_KEY, *sorted(weeks))
+        pipe.sadd(PENDING_DAYS_KEY, *sorted(days))
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się unieważnić cache kalendarza: {e}")
+        # Bez Redisa nie ma map ani katalogu do odświeżenia, ale dni wykorzystania są w bazie
+        utilization.mark_changed(instructor_id, [start_time for start_time, _, _ in changes])
+
+
+def _pending(members):
+    for member in members:
+        instructor_id, value = member.decode().split(':')
+        yield int(instructor_id), datetime.fromisoformat(value)
+
+
+def _refresh(weeks, days):
+    instructor_ids = set()
+    for instructor_id, week in sorted(set(_pending(weeks))):
+        availability.refresh_instructor(instructor_id, week, week + WEEK)
+        instructor_ids.add(instructor_id)
+    instructor_directory.refresh_instructors(sorted(instructor_ids))
+    changed_days = {}
+    for instructor_id, day in _pending(days):
+        changed_days.setdefault(instructor_id, []).append(day)
+    for instructor_id, start_times in sorted(changed_days.items()):
+        utilization.mark_changed(instructor_id, start_times)
+
+
+def refresh_pending(batch_size=500):
+    """
+    Przelicza maski dostępności, katalog instruktorów i oznacza dni wykorzystania dla
+    zmian zapisanych przez invalidate_changes, porcjami. Zwraca liczbę przetworzonych wpisów.
+    """
+    refreshed = 0
+    while True:
+        pipe = redis.pipeline()
+        pipe.spop(PENDING_WEEKS_KEY, batch_size)
+        pipe.spop(PENDING_DAYS_KEY, batch_size)
+        weeks, days = pipe.execute()
+        if not weeks and not days:
+            return refreshed
+        try:
+            _refresh(weeks, days)
+        except Exception:
+            # Wpisy wracają do kolejki na następne uruchomienie
+            pipe = redis.pipeline()
+            if weeks:
+                pipe.sadd(PENDING_WEEKS_KEY, *weeks)
+            if days:
+                pipe.sadd(PENDING_DAYS_KEY, *days)
+            pipe.execute()
+            raise
+        refreshed += len(weeks) + len(days)
+        if len(weeks) < batch_size and len(days) < batch_size:
+            return refreshed
+
+
+def invalidate_instructor(instructor_id, student_ids=()):
+    """
+    Usuwa z cache wszystkie tygodnie instruktora oraz zbiorcze tygodnie wszystkich instruktorów,
+    a także kanały ICS studentów, którzy mieli u niego rezerwacje.
+    """
+    patterns = [SLOTS_KEY.format(instructor=instructor_id, week='*'),
+                SLOTS_KEY.format(instructor=ALL_INSTRUCTORS, week='*'),
+                ICS_WEEK_KEY.format(owner=f'instructor:{instructor_id}', week='*')]
+    patterns.extend(ICS_WEEK_KEY.format(owner=f'student:{student_id}', week='*') for student_id in student_ids)
+    try:
+        for pattern in patterns:
+            keys = list(redis.scan_iter(match=pattern, count=500))
+            if keys:
+                redis.delete(*keys)
+        pipe = redis.pipeline()
+        _bump_versions(pipe, instructor_id)
+        _bump(pipe, [student_version_key(student_id) for student_id in student_ids])
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się unieważnić cache kalendarza: {e}")
+    availability.drop_instructor(instructor_id)
+    instructor_directory.drop_instructor(instructor_id)
+
+
+def cache_stats():
+    """
+    Liczniki trafień i chybień cache kalendarza.
+    """
+    stats = redis.hgetall(STATS_KEY)
+    hits = int(stats.get(b'hits', 0))
+    misses = int(stats.get(b'misses', 0))
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,127 @@
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.availability_rules import event_id, free_occurrences
+
+# Lekka warstwa zapytań dla kalendarzy: pobiera tylko potrzebne kolumny jako krotki,
+# bez budowania obiektów ORM i mapy tożsamości sesji.
+
+AVAILABLE_COLOR = '#1B8359'
+PENDING_COLOR = '#996C00'
+CONFIRMED_COLOR = '#9C27B0'
+
+
+def _stream(query, yield_per):
+    if yield_per:
+        # Kolejność indeksu, żeby kolejne porcje były czytane bez sortowania całego wyniku
+        return query.order_by(Appointment.start_time).yield_per(yield_per)
+    return query
+
+
+def iter_available_events(start, end, instructor_id=None, yield_per=None):
+    """
+    Wydarzenia wolnych terminów nakładających się na [start, end).
+
+    Z yield_per wiersze są pobierane z kursora porcjami, zamiast całego wyniku naraz.
+    """
+    rows = _stream(Appointment.available_slots_query(start, end, instructor_id).with_entities(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.end_time
+    ), yield_per)
+    for appointment_id, start_time, end_time in rows:
+        yield {
+            'id': appointment_id,
+            'titleMessage': 'Dostępny',
+            'title': '',
+            'start': start_time,
+            'end': end_time,
+            'color': AVAILABLE_COLOR,
+        }
+
+
+def available_events(start, end, instructor_id=None):
+    return list(iter_available_events(start, end, instructor_id))
+
+
+def rule_events(start, end, instructor_id=None):
+    """
+    Wydarzenia wolnych terminów reguł dostępności nakładających się na [start, end).
+    Rezerwacja takiego terminu idzie przez /calendar/book/<ID wydarzenia>.
+    """
+    return [{
+        'id': event_id(rule_id, start_time),
+        'titleMessage': 'Dostępny',
+        'title': '',
+        'start': start_time,
+        'end': end_time,
+        'color': AVAILABLE_COLOR,
+    } for rule_id, _, start_time, end_time in free_occurrences(start, end, instructor_id)]
+
+
+def iter_student_booking_events(student_id, start, end, instructor_id=None, yield_per=None):
+    """
+    Wydarzenia terminów zarezerwowanych przez studenta nakładających się na [start, end).
+    """
+    rows = _stream(Appointment.student_bookings_query(student_id, start, end, instructor_id).with_entities(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.end_time,
+        Appointment.topic,
+        Appointment.status
+    ), yield_per)
+    for appointment_id, start_time, end_time, topic, status in rows:
+        yield {
+            'id': appointment_id,
+            'titleMessage': f'Temat konsultacji: {topic}',
+            'title': '',
+            'start': start_time,
+            'end': end_time,
+            'color': CONFIRMED_COLOR if status == 'confirmed' else PENDING_COLOR,
+        }
+
+
+def student_booking_events(student_id, start, end, instructor_id=None):
+    return list(iter_student_booking_events(student_id, start, end, instructor_id))
+
+
+def instructor_events(instructor_id, start, end):
+    """
+    Wydarzenia kalendarza instruktora; imię i nazwisko studenta pochodzą z kopii w terminie,
+    więc zapytanie czyta tylko tabelę appointment. Wolne terminy reguł mają ID 'rule-...'.
+    """
+    rows = Appointment.instructor_feed_query(instructor_id, start, end).with_entities(
+        Appointment.id,
+        Appointment.start_time,
+        Appointment.end_time,
+        Appointment.is_available,
+        Appointment.topic,
+        Appointment.status,
+        Appointment.student_name
+    )
+
+    events = []
+    for appointment_id, start_time, end_time, is_available, topic, status, student_name in rows:
+        events.append({
+            'id': appointment_id,
+            'titleMessage': 'Dostępny' if is_available else f'Temat konsultacji: {topic}',
+            'title': '',
+            'student': student_name or "",
+            'is_available': is_available,
+            'start': start_time,
+            'end': end_time,
+            'color': AVAILABLE_COLOR if is_available else (PENDING_COLOR if status == 'pending' else CONFIRMED_COLOR),
+            'status': status
+        })
+    # Wolne terminy reguł dostępności nie mają wierszy, więc są rozwijane dla okna
+    events.extend({
+        'id': event_id(rule_id, start_time),
+        'titleMessage': 'Dostępny',
+        'title': '',
+        'student': "",
+        'is_available': True,
+        'start': start_time,
+        'end': end_time,
+        'color': AVAILABLE_COLOR,
+        'status': 'available',
+        'rule_id': rule_id
+    } for rule_id, _, start_time, end_time in free_occurrences(start, end, instructor_id))
+    return events
@@ -0,0 +1,32 @@
+import hashlib
+
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """
+    Silny ETag wyliczony z części opisujących stan odpowiedzi.
+    """
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def is_fresh(etag):
+    """
+    Czy klient ma aktualną wersję odpowiedzi (nagłówek If-None-Match).
+    """
+    return etag is not None and request.if_none_match.contains(etag)
+
+
+def not_modified(etag):
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag, cache_control='private, no-cache'):
+    """
+    Dodaje ETag do odpowiedzi; no-cache wymusza rewalidację przy każdym pobraniu.
+    """
+    if etag is not None and response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,298 @@
+import hmac
+import secrets
+from datetime import datetime, timezone
+
+from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+from redis.exceptions import RedisError
+from sqlalchemy.orm import aliased
+
+from calendarproject.extensions import db
+from calendarproject.initializers import redis
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.user import User
+from calendarproject.utils.availability_rules import event_id, free_occurrences
+from calendarproject.utils.calendar_cache import (get_student_version, get_version, ics_week_key, read_versioned,
+                                                  store_versioned, student_version_key, version_key)
+from calendarproject.utils.http_cache import make_etag
+from calendarproject.utils.weeks import WEEK, week_start
+
+# Kanały iCalendar (RFC 5545) do subskrypcji w zewnętrznych kalendarzach. Kanał składa
+# się z tygodniowych bloków VEVENT trzymanych w Redis i unieważnianych razem z cache
+# JSON (invalidate_slots), więc zmiana terminu przebudowuje tylko jeden tydzień.
+
+INSTRUCTOR = 'instructor'
+STUDENT = 'student'
+
+# Złożony kanał: hash z polami etag, modified (Last-Modified) i body
+FEED_KEY = 'calendar:ics:feed:{owner}'
+
+Instructor = aliased(User, name='instructor')
+
+_TOKEN_SALT = 'calendar-ics-feed'
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=_TOKEN_SALT)
+
+
+def _feed_secret(user):
+    # Sekret powstaje przy pierwszym pobraniu adresu kanału
+    if not user.feed_secret:
+        user.feed_secret = secrets.token_urlsafe(16)
+        db.session.commit()
+    return user.feed_secret
+
+
+def feed_token(user):
+    """
+    Podpisany token kanału użytkownika; adres z tokenem nie wymaga sesji.
+    Token zawiera sekret kanału, więc regenerate_feed_secret() unieważnia wyciekły adres.
+    """
+    kind = INSTRUCTOR if user.is_instructor else STUDENT
+    return _serializer().dumps([kind, user.id, _feed_secret(user)])
+
+
+def feed_url(user):
+    return url_for('calendar.ics_feed', token=feed_token(user), _external=True)
+
+
+def regenerate_feed_secret(user):
+    """
+    Zastępuje sekret kanału nowym; dotychczasowe adresy kanału przestają działać.
+    """
+    user.feed_secret = secrets.token_urlsafe(16)
+    db.session.commit()
+
+
+def read_token(token):
+    """
+    (rodzaj, id użytkownika, sekret kanału) z tokenu albo None, gdy podpis jest nieprawidłowy.
+    """
+    try:
+        kind, user_id, secret = _serializer().loads(token)
+    except (BadSignature, ValueError, TypeError):
+        return None
+    if kind not in (INSTRUCTOR, STUDENT) or not isinstance(user_id, int) or not isinstance(secret, str):
+        return None
+    return kind, user_id, secret
+
+
+def owns_feed(user, kind, secret):
+    """
+    Czy token z sekretem secret wskazuje aktualny kanał rodzaju kind użytkownika user.
+    """
+    return (user is not None and not user.deleted and user.is_instructor == (kind == INSTRUCTOR)
+            and bool(user.feed_secret) and hmac.compare_digest(user.feed_secret, secret))
+
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """
+    Zawija linię do 75 oktetów (RFC 5545 3.1), nie dzieląc znaków UTF-8.
+    """
+    if len(line.encode()) <= 75:
+        return line
+    parts = []
+    current = ''
+    limit = 75
+    for char in line:
+        if len((current + char).encode()) > limit:
+            parts.append(current)
+            current = ''
+            limit = 74  # kolejne linie zaczynają się spacją
+        current += char
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def format_utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(appointment_id, start_time, end_time, summary, description, status, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{appointment_id}@kalendarz-konsultacji',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{format_utc(start_time)}',
+        f'DTEND:{format_utc(end_time)}',
+        f'SUMMARY:{escape(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) + '\r\n' for line in lines)
+
+
+def _status(status):
+    return 'CONFIRMED' if status == 'confirmed' else 'TENTATIVE'
+
+
+def _instructor_week(instructor_id, week, stamp):
+    rows = db.session.execute(
+        db.select(
+            Appointment.id,
+            Appointment.start_time,
+            Appointment.end_time,
+            Appointment.is_available,
+            Appointment.topic,
+            Appointment.status,
+            Appointment.student_name
+        ).where(
+            Appointment.instructor_id == instructor_id,
+            Appointment.start_time >= week,
+            Appointment.start_time < week + WEEK
+        ).order_by(Appointment.start_time)
+    )
+    events = []
+    for appointment_id, start_time, end_time, is_available, topic, status, student_name in rows:
+        if is_available:
+            events.append((start_time, vevent(appointment_id, start_time, end_time, 'Wolny termin konsultacji',
+                                              None, 'TENTATIVE', stamp)))
+        else:
+            events.append((start_time, vevent(appointment_id, start_time, end_time, f'Konsultacja: {topic or ""}',
+                                              f'Student: {student_name or ""}', _status(status), stamp)))
+    # Wolne terminy reguł dostępności zaczynające się w tym tygodniu
+    events.extend(
+        (start_time, vevent(event_id(rule_id, start_time), start_time, end_time, 'Wolny termin konsultacji', None,
+                            'TENTATIVE', stamp))
+        for rule_id, _, start_time, end_time in free_occurrences(week, week + WEEK, instructor_id)
+        if start_time >= week
+    )
+    events.sort(key=lambda event: event[0])
+    return ''.join(block for _, block in events)
+
+
+def _student_week(student_id, week, stamp):
+    rows = db.session.execute(
+        db.select(
+            Appointment.id,
+            Appointment.start_time,
+            Appointment.end_time,
+            Appointment.topic,
+            Appointment.status,
+            Instructor.first_name,
+            Instructor.last_name
+        ).join(Instructor, Instructor.id == Appointment.instructor_id).where(
+            Appointment.student_id == student_id,
+            Appointment.is_available == False,
+            Appointment.start_time >= week,
+            Appointment.start_time < week + WEEK
+        ).order_by(Appointment.start_time)
+    )
+    return ''.join(
+        vevent(appointment_id, start_time, end_time, f'Konsultacja: {topic or ""}',
+               f'Prowadzący: {first_name} {last_name}', _status(status), stamp)
+        for appointment_id, start_time, end_time, topic, status, first_name, last_name in rows
+    )
+
+
+_BUILDERS = {INSTRUCTOR: _instructor_week, STUDENT: _student_week}
+
+
+def feed_weeks(now):
+    """
+    Tygodnie objęte kanałem: kilka wstecz i kilka miesięcy naprzód.
+    """
+    current = week_start(now)
+    past = current_app.config['ICS_FEED_PAST_WEEKS']
+    future = current_app.config['ICS_FEED_FUTURE_WEEKS']
+    return [current + WEEK * offset for offset in range(-past, future + 1)]
+
+
+def feed_etag(kind, user_id, now):
+    """
+    ETag kanału z wersji kalendarza i pierwszego tygodnia okna (okno przesuwa się co tydzień),
+    None gdy Redis jest niedostępny.
+    """
+    version = get_version(user_id) if kind == INSTRUCTOR else get_student_version(user_id)
+    if version is None:
+        return None
+    return make_etag('ics', kind, user_id, version, feed_weeks(now)[0].date())
+
+
+def _week_blocks(kind, user_id, weeks, stamp):
+    owner = f'{kind}:{user_id}'
+    keys = [ics_week_key(owner, week) for week in weeks]
+    # Bloki są zapisywane tylko przy wersji kalendarza przeczytanej razem z nimi
+    version_of = version_key(user_id) if kind == INSTRUCTOR else student_version_key(user_id)
+    version = None
+    try:
+        version, cached = read_versioned(version_of, keys)
+        redis_available = True
+    except RedisError as e:
+        current_app.logger.warning(f"Cache kanałów ICS niedostępny: {e}")
+        cached = [None] * len(keys)
+        redis_available = False
+
+    build = _BUILDERS[kind]
+    blocks = []
+    missing = {}
+    for week, key, block in zip(weeks, keys, cached):
+        if block is None:
+            block = build(user_id, week, stamp).encode()
+            missing[key] = block
+        blocks.append(block)
+
+    if missing and redis_available:
+        try:
+            ttl = current_app.config.get('CALENDAR_CACHE_TTL', 86400)
+            if not store_versioned(version_of, version, missing, ttl):
+                current_app.logger.info("Pominięto zapis kanału ICS: terminy zmieniły się w trakcie odczytu")
+        except RedisError as e:
+            current_app.logger.warning(f"Nie udało się zapisać cache kanałów ICS: {e}")
+    return blocks
+
+
+def build_feed(kind, user, now):
+    """
+    Pełny plik .ics złożony z tygodniowych bloków; brakujące tygodnie są czytane z bazy.
+    """
+    stamp = format_utc(now)
+    name = f'Konsultacje - {user.first_name} {user.last_name}'
+    header = ''.join(fold(line) + '\r\n' for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Kalendarz Konsultacji//PL',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+    ))
+    blocks = _week_blocks(kind, user.id, feed_weeks(now), stamp)
+    return header.encode() + b''.join(blocks) + b'END:VCALENDAR\r\n'
+
+
+def cached_feed(kind, user_id, etag):
+    """
+    (treść, Last-Modified) złożonego kanału, gdy w Redis jest wersja o tym ETagu, inaczej None.
+    """
+    if etag is None:
+        return None
+    try:
+        cached = redis.hmget(FEED_KEY.format(owner=f'{kind}:{user_id}'), 'etag', 'modified', 'body')
+    except RedisError as e:
+        current_app.logger.warning(f"Cache kanałów ICS niedostępny: {e}")
+        return None
+    cached_etag, modified, body = cached
+    if cached_etag is None or cached_etag.decode() != etag or body is None:
+        return None
+    return body, datetime.fromtimestamp(int(modified), timezone.utc)
+
+
+def store_feed(kind, user_id, etag, body, modified):
+    if etag is None:
+        return
+    key = FEED_KEY.format(owner=f'{kind}:{user_id}')
+    try:
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping={'etag': etag, 'modified': int(modified.timestamp()), 'body': body})
+        pipe.expire(key, current_app.config.get('CALENDAR_CACHE_TTL', 86400))
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.warning(f"Nie udało się zapisać kanału ICS: {e}")
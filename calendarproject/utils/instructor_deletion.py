@@ -0,0 +1,129 @@
+from datetime import datetime
+
+from flask import current_app
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.instructor_deletion_job import InstructorDeletionJob
+from calendarproject.models.user import User
+from calendarproject.utils import availability_rules
+from calendarproject.utils.calendar_cache import invalidate_instructor
+from calendarproject.utils.notifications import notify_many
+
+# Usuwanie konta instruktora w zadaniu Celery. Żądanie tylko oznacza konto jako usunięte
+# i zapisuje zadanie; terminy są kasowane porcjami, każda porcja razem z powiadomieniami
+# jej studentów w jednej krótkiej transakcji, a postęp jest zapisywany w zadaniu.
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE = (PENDING, RUNNING)
+
+
+def active_job(instructor_id):
+    return db.session.execute(
+        db.select(InstructorDeletionJob).where(
+            InstructorDeletionJob.instructor_id == instructor_id,
+            InstructorDeletionJob.status.in_(ACTIVE)
+        ).order_by(InstructorDeletionJob.id.desc())
+    ).scalars().first()
+
+
+def start(instructor):
+    """
+    Oznacza instruktora jako usuniętego (znika z kalendarza i wyszukiwania, a jego wolnych
+    terminów nie da się zarezerwować), usuwa jego reguły dostępności i zapisuje zadanie.
+    """
+    job = InstructorDeletionJob(instructor_id=instructor.id, status=PENDING)
+    db.session.add(job)
+    instructor.deleted = True
+    instructor.deleted_at = datetime.utcnow()
+    # Reguły dostępności przestają generować terminy razem z oznaczeniem konta
+    availability_rules.delete_rules(instructor.id)
+    db.session.commit()
+    invalidate_instructor(instructor.id)
+    return job
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'instructor_id': job.instructor_id,
+        'status': job.status,
+        'deleted_appointments': job.deleted_appointments,
+        'notified_students': job.notified_students,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def delete_chunk(instructor_id, message, notified, chunk_size):
+    """
+    Usuwa porcję terminów instruktora i powiadamia jej studentów, których jeszcze nie
+    powiadomiono (bez commita). Zwraca (usunięte terminy, nowo powiadomieni studenci).
+    """
+    rows = db.session.execute(
+        db.select(Appointment.id, Appointment.student_id, Appointment.is_available)
+        .where(Appointment.instructor_id == instructor_id)
+        .order_by(Appointment.id)
+        .limit(chunk_size)
+    ).all()
+    if not rows:
+        return 0, set()
+
+    students = {student_id for _, student_id, is_available in rows if student_id and not is_available} - notified
+    notify_many([{
+        'user_id': student_id,
+        'message': message,
+        'type': 'instructor_deleted',
+        'related_id': instructor_id,
+    } for student_id in sorted(students)])
+    db.session.execute(db.delete(Appointment).where(Appointment.id.in_([row.id for row in rows])))
+    return len(rows), students
+
+
+def run(job_id, chunk_size=None):
+    """
+    Wykonuje zadanie usuwania, zatwierdzając każdą porcję. Przerwane zadanie można
+    uruchomić ponownie - kontynuuje od pozostałych terminów.
+    """
+    chunk_size = chunk_size or current_app.config.get('INSTRUCTOR_DELETION_CHUNK_SIZE', 500)
+    job = db.session.get(InstructorDeletionJob, job_id)
+    if job is None or job.status not in ACTIVE:
+        return None
+
+    instructor = db.session.get(User, job.instructor_id)
+    message = (f'Konto instruktora {instructor.first_name} {instructor.last_name} zostało usunięte, '
+               f'toteż wszystkie terminy spotkań zostały odwołane.')
+    job.status = RUNNING
+    db.session.commit()
+
+    notified = set()
+    try:
+        while True:
+            deleted, students = delete_chunk(job.instructor_id, message, notified, chunk_size)
+            if not deleted:
+                break
+            notified |= students
+            job.deleted_appointments += deleted
+            job.notified_students += len(students)
+            db.session.commit()
+            current_app.logger.info(
+                f"Zadanie {job.id}: usunięto {job.deleted_appointments} terminów instruktora {job.instructor_id}.")
+
+        job.status = DONE
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Zadanie usuwania instruktora {job.id} nie powiodło się: {e}", exc_info=True)
+        job.status = FAILED
+        job.error = str(e)[:255]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    finally:
+        invalidate_instructor(job.instructor_id, notified)
+    return job
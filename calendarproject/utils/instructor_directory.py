@@ -0,0 +1,175 @@
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import case, func
+
+from calendarproject.extensions import db
+from calendarproject.initializers import redis
+from calendarproject.models.appointment import BOOKING_LEAD_TIME, Appointment
+from calendarproject.models.user import User
+from calendarproject.utils.availability_rules import free_occurrences
+
+# Katalog instruktorów z wyliczonym podsumowaniem wolnych terminów, trzymany w Redis:
+# hash <id instruktora> -> JSON podsumowania oraz wersja katalogu, z której liczony jest ETag.
+# Istnienie wersji oznacza, że hash zawiera wszystkich instruktorów.
+
+DIRECTORY_KEY = 'instructors:directory'
+DIRECTORY_VERSION_KEY = 'instructors:directory:version'
+
+SHORT_HORIZON = timedelta(days=7)
+LONG_HORIZON = timedelta(days=30)
+
+
+def _summary_query(now, instructor_ids=None):
+    """
+    Najbliższy wolny termin i liczby wolnych terminów w 7 i 30 dni - jedno zapytanie
+    grupujące po partial indeksie wolnych terminów.
+    """
+    bookable_from = now + BOOKING_LEAD_TIME
+    query = db.select(
+        Appointment.instructor_id,
+        func.min(Appointment.start_time),
+        func.sum(case((Appointment.start_time < now + SHORT_HORIZON, 1), else_=0)),
+        func.sum(case((Appointment.start_time < now + LONG_HORIZON, 1), else_=0))
+    ).where(
+        Appointment.is_available == True,
+        Appointment.start_time > bookable_from
+    ).group_by(Appointment.instructor_id)
+    if instructor_ids is not None:
+        query = query.where(Appointment.instructor_id.in_(instructor_ids))
+    return query
+
+
+def build_summaries(now, instructor_ids=None):
+    """
+    {id instruktora: podsumowanie} dla aktywnych instruktorów (lub podanych ID).
+    """
+    instructors = db.select(User.id, User.first_name, User.last_name).filter_by(is_instructor=True, deleted=False)
+    if instructor_ids is not None:
+        instructors = instructors.where(User.id.in_(instructor_ids))
+    stats = {
+        instructor_id: (next_free, short, long)
+        for instructor_id, next_free, short, long in db.session.execute(_summary_query(now, instructor_ids))
+    }
+    # Wolne terminy reguł dostępności w horyzoncie 30 dni
+    bookable_from = now + BOOKING_LEAD_TIME
+    for _, instructor_id, start_time, _ in free_occurrences(bookable_from, now + LONG_HORIZON,
+                                                            instructor_ids=instructor_ids):
+        if start_time <= bookable_from:
+            continue
+        next_free, short, long = stats.get(instructor_id, (None, 0, 0))
+        stats[instructor_id] = (min(next_free or start_time, start_time),
+                                short + (start_time < now + SHORT_HORIZON), long + 1)
+
+    summaries = {}
+    for instructor_id, first_name, last_name in db.session.execute(instructors):
+        next_free, short, long = stats.get(instructor_id, (None, 0, 0))
+        summaries[instructor_id] = {
+            'id': instructor_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': f"{first_name} {last_name}",
+            'next_free_slot': next_free,
+            'free_7d': int(short),
+            'free_30d': int(long),
+        }
+    return summaries
+
+
+def _sorted(summaries):
+    return sorted(summaries, key=lambda summary: (summary['last_name'], summary['first_name'], summary['id']))
+
+
+def _ttl():
+    return current_app.config.get('INSTRUCTOR_DIRECTORY_TTL', 300)
+
+
+def _rebuild(now):
+    summaries = build_summaries(now)
+    pipe = redis.pipeline()
+    pipe.delete(DIRECTORY_KEY)
+    if summaries:
+        pipe.hset(DIRECTORY_KEY, mapping={
+            instructor_id: current_app.json.dumps(summary) for instructor_id, summary in summaries.items()
+        })
+        pipe.expire(DIRECTORY_KEY, _ttl())
+    pipe.set(DIRECTORY_VERSION_KEY, time.time_ns(), ex=_ttl())
+    pipe.execute()
+    return summaries
+
+
+def get_directory():
+    """
+    (wersja, lista podsumowań) katalogu. Liczby wolnych terminów maleją z upływem czasu,
+    więc katalog wygasa po INSTRUCTOR_DIRECTORY_TTL i jest wtedy przeliczany w całości.
+    Gdy Redis jest niedostępny, zwraca (None, podsumowania z bazy).
+    """
+    try:
+        pipe = redis.pipeline()
+        pipe.get(DIRECTORY_VERSION_KEY)
+        pipe.hvals(DIRECTORY_KEY)
+        version, values = pipe.execute()
+        if version is None:
+            summaries = _rebuild(datetime.utcnow())
+            version = redis.get(DIRECTORY_VERSION_KEY)
+            return version.decode() if version else None, _sorted(summaries.values())
+        return version.decode(), _sorted(current_app.json.loads(value) for value in values)
+    except RedisError as e:
+        current_app.logger.warning(f"Katalog instruktorów niedostępny w Redis: {e}")
+        return None, _sorted(build_summaries(datetime.utcnow()).values())
+
+
+def get_version():
+    """
+    Wersja katalogu bez odczytu jego treści; None gdy katalog trzeba zbudować.
+    """
+    try:
+        version = redis.get(DIRECTORY_VERSION_KEY)
+    except RedisError:
+        return None
+    return version.decode() if version else None
+
+
+def refresh_instructor(instructor_id):
+    """
+    Przelicza podsumowanie jednego instruktora po zmianie jego terminów lub konta.
+    Niezbudowany katalog zostanie wyliczony w całości przy najbliższym odczycie.
+    """
+    refresh_instructors([instructor_id])
+
+
+def refresh_instructors(instructor_ids):
+    """
+    Przelicza podsumowania wielu instruktorów jednym zapytaniem i jednym pipeline.
+    """
+    try:
+        if not instructor_ids or not redis.exists(DIRECTORY_VERSION_KEY):
+            return
+        summaries = build_summaries(datetime.utcnow(), list(instructor_ids))
+        pipe = redis.pipeline()
+        for instructor_id in instructor_ids:
+            summary = summaries.get(instructor_id)
+            if summary is None:
+                pipe.hdel(DIRECTORY_KEY, instructor_id)
+            else:
+                pipe.hset(DIRECTORY_KEY, instructor_id, current_app.json.dumps(summary))
+        # XX: wersja, która zdążyła wygasnąć, nie może ożyć przy niepełnym hashu
+        pipe.set(DIRECTORY_VERSION_KEY, time.time_ns(), xx=True, keepttl=True)
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się zaktualizować katalogu instruktorów: {e}")
+
+
+def drop_instructor(instructor_id):
+    """
+    Usuwa instruktora z katalogu; usunięcie wersji wymusza pełne przeliczenie przy odczycie.
+    """
+    try:
+        pipe = redis.pipeline()
+        pipe.hdel(DIRECTORY_KEY, instructor_id)
+        pipe.delete(DIRECTORY_VERSION_KEY)
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.error(f"Nie udało się usunąć instruktora z katalogu: {e}")
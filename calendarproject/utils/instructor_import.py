@@ -0,0 +1,224 @@
+import csv
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from email_validator import EmailNotValidError, validate_email
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+from calendarproject.extensions import db
+from calendarproject.models.instructor_import_job import InstructorImportJob
+from calendarproject.models.user import User
+from calendarproject.utils.instructor_directory import refresh_instructors
+
+# Zakładanie kont instruktorów z pliku CSV (kolumny username, email, first_name,
+# last_name, password). Plik jest przetwarzany porcjami: unikalność nazw i adresów
+# sprawdzana jest dwoma zapytaniami IN na porcję, hasła hashowane równolegle w jednej
+# puli procesów na cały import (scrypt obciąża CPU), a konta zapisywane jednym wsadowym
+# INSERT. Import z panelu administratora działa w zadaniu Celery (InstructorImportJob).
+
+COLUMNS = ('username', 'email', 'first_name', 'last_name', 'password')
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def iter_rows(lines):
+    """
+    Wiersze CSV jako (numer linii, wiersz, None) albo (numer linii, None, komunikat błędu).
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not set(COLUMNS) <= {name.strip() for name in reader.fieldnames}:
+        yield 1, None, f"Plik CSV musi mieć nagłówek z kolumnami {', '.join(COLUMNS)}."
+        return
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, {column: (row.get(column) or '').strip() for column in COLUMNS}, None
+
+
+def _validate(row):
+    # Te same reguły co w CreateInstructorForm
+    if any(not row[column] for column in COLUMNS):
+        return 'Wszystkie kolumny są wymagane.'
+    if not 4 <= len(row['username']) <= 20:
+        return 'Nazwa użytkownika musi mieć od 4 do 20 znaków'
+    if len(row['email']) > 120:
+        return 'Nieprawidłowy adres email'
+    try:
+        validate_email(row['email'], check_deliverability=False)
+    except EmailNotValidError:
+        return 'Nieprawidłowy adres email'
+    if len(row['password']) < 6:
+        return 'Hasło musi mieć co najmniej 6 znaków'
+    if len(row['first_name']) > 50 or len(row['last_name']) > 50:
+        return 'Imię i nazwisko nie mogą przekraczać 50 znaków'
+    return None
+
+
+def _existing(column, values):
+    if not values:
+        return set()
+    return set(db.session.execute(db.select(column).where(column.in_(values))).scalars())
+
+
+@contextmanager
+def password_pool(workers):
+    """
+    Pula procesów do hashowania haseł na czas całego importu albo None dla jednego procesu.
+    """
+    if workers <= 1:
+        yield None
+        return
+    # spawn: proces potomny nie dziedziczy połączeń z bazą ani wątków aplikacji;
+    # procesy startują przy pierwszym zleceniu i obsługują wszystkie porcje pliku
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield pool
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """
+    Hashe haseł w kolejności wejścia; z pulą (password_pool) liczone równolegle.
+    """
+    if pool is None or len(passwords) < 2:
+        return [generate_password_hash(password) for password in passwords]
+    return list(pool.map(generate_password_hash, passwords,
+                         chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def import_chunk(rows, seen, pool=None, workers=1):
+    """
+    Waliduje i zapisuje porcję (bez commita). seen to {'username': set(), 'email': set()}
+    wartości z wcześniejszych porcji pliku. Zwraca (ID nowych kont, błędy [(linia, komunikat)]).
+    """
+    errors = []
+    valid = []
+    for line, row, error in rows:
+        error = error or _validate(row)
+        if error:
+            errors.append((line, error))
+        else:
+            valid.append((line, row))
+
+    taken_usernames = _existing(User.username, [row['username'] for _, row in valid])
+    taken_emails = _existing(User.email, [row['email'] for _, row in valid])
+    accepted = []
+    for line, row in valid:
+        if row['username'] in taken_usernames or row['username'] in seen['username']:
+            errors.append((line, f"Nazwa użytkownika {row['username']} już istnieje."))
+        elif row['email'] in taken_emails or row['email'] in seen['email']:
+            errors.append((line, f"Adres email {row['email']} jest już używany."))
+        else:
+            accepted.append(row)
+        seen['username'].add(row['username'])
+        seen['email'].add(row['email'])
+    errors.sort()
+    if not accepted:
+        return [], errors
+
+    hashes = hash_passwords([row['password'] for row in accepted], pool, workers)
+    created = db.session.execute(db.insert(User).returning(User.id), [{
+        'username': row['username'],
+        'email': row['email'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'password_hash': password_hash,
+        'is_instructor': True,
+        'is_admin': False,
+        'deleted': False,
+    } for row, password_hash in zip(accepted, hashes)]).scalars().all()
+    return created, errors
+
+
+def import_instructors(lines, chunk_size, workers, progress=None):
+    """
+    Zakłada konta z pliku porcjami po chunk_size wierszy, zatwierdzając każdą porcję.
+    Zwraca raport: przetworzone wiersze, utworzone konta i błędy z numerami linii;
+    progress(raport) jest wołane po każdej porcji.
+    """
+    rows = iter_rows(lines)
+    seen = {'username': set(), 'email': set()}
+    report = {'processed': 0, 'created': 0, 'failed': 0, 'errors': []}
+    with password_pool(workers) as pool:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return report
+            try:
+                created, errors = import_chunk(chunk, seen, pool, workers)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            refresh_instructors(created)
+
+            report['processed'] += len(chunk)
+            report['created'] += len(created)
+            report['failed'] += len(errors)
+            report['errors'].extend({'line': line, 'message': message} for line, message in errors)
+            if progress is not None:
+                progress(report)
+
+
+def start(admin, data):
+    """
+    Zapisuje zadanie importu z treścią pliku (tekst CSV).
+    """
+    job = InstructorImportJob(created_by=admin.id, status=PENDING, data=data)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'processed': job.processed,
+        'created': job.created,
+        'failed': job.failed,
+        'errors': job.errors or [],
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def run(job_id, chunk_size=None, workers=None):
+    """
+    Wykonuje zadanie importu; postęp jest zatwierdzany po każdej porcji. Treść pliku
+    jest usuwana z zadania po jego zakończeniu, także po błędzie.
+    """
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', 500)
+    workers = workers or current_app.config.get('PASSWORD_HASH_WORKERS', 1)
+    job = db.session.get(InstructorImportJob, job_id)
+    if job is None or job.status != PENDING:
+        return None
+    job.status = RUNNING
+    db.session.commit()
+
+    def progress(report):
+        job.processed, job.created, job.failed = report['processed'], report['created'], report['failed']
+        db.session.commit()
+
+    try:
+        report = import_instructors(io.StringIO(job.data, newline=''), chunk_size, workers, progress)
+        job.processed, job.created, job.failed = report['processed'], report['created'], report['failed']
+        job.errors = report['errors']
+        job.status = DONE
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Zadanie importu instruktorów {job.id} nie powiodło się: {e}", exc_info=True)
+        job.status = FAILED
+        job.error = ('Nieprawidłowy plik CSV.' if isinstance(e, csv.Error) else str(e))[:255]
+        raise
+    finally:
+        job.data = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
@@ -0,0 +1,108 @@
+from datetime import date, datetime, time
+
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import func
+
+from calendarproject.extensions import db
+from calendarproject.initializers import redis
+from calendarproject.utils.availability_rules import free_occurrences
+from calendarproject.utils.calendar_cache import get_version
+from calendarproject.utils.partitions import appointment_history
+from calendarproject.utils.sql import seconds_between
+from calendarproject.utils.weeks import naive_utc, week_start, weeks_overlapping
+
+# Statystyki obciążenia instruktora: liczby terminów według statusu i zarezerwowane godziny
+# w tygodniach UTC. Liczone jednym zapytaniem grupującym po indeksie (instructor_id, start_time)
+# i trzymane w Redis pod kluczem z wersją kalendarza instruktora, więc każda zmiana terminu
+# (invalidate_slots) unieważnia je bez osobnego kasowania.
+
+STATS_KEY = 'instructor:stats:{instructor}:{version}:{start}:{end}'
+
+
+def _grouped(instructor_id, start, end):
+    # Zakres może sięgać terminów już przeniesionych do archiwum
+    history = appointment_history()
+    day = func.date(history.c.start_time)
+    return db.select(
+        day,
+        history.c.is_available,
+        history.c.status,
+        func.count(),
+        func.sum(seconds_between(history.c.start_time, history.c.end_time))
+    ).where(
+        history.c.instructor_id == instructor_id,
+        history.c.start_time >= start,
+        history.c.start_time < end
+    ).group_by(day, history.c.is_available, history.c.status)
+
+
+def build_stats(instructor_id, start, end):
+    """
+    Statystyki terminów zaczynających się w [start, end).
+
+    'available' to wszystkie wolne terminy, także wolne terminy reguł dostępności;
+    'rejected' to wolne terminy, których rezerwację odrzucono (liczone też w 'available').
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    counts = {'available': 0, 'pending': 0, 'confirmed': 0, 'rejected': 0}
+    weeks = {week: {'booked': 0.0, 'confirmed': 0.0} for week in weeks_overlapping(start, end)}
+
+    for day, is_available, status, count, seconds in db.session.execute(_grouped(instructor_id, start, end)):
+        if is_available:
+            counts['available'] += count
+            if status == 'rejected':
+                counts['rejected'] += count
+            continue
+        if status in counts:
+            counts[status] += count
+        # SQLite zwraca date() jako tekst, Postgres jako datę
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        hours = weeks[week_start(datetime.combine(day, time()))]
+        # Postgres zwraca EXTRACT jako numeric (Decimal)
+        booked = float(seconds or 0) / 3600
+        hours['booked'] += booked
+        if status == 'confirmed':
+            hours['confirmed'] += booked
+
+    # Wolne terminy reguł dostępności nie mają wierszy w bazie
+    counts['available'] += sum(1 for _, _, slot_start, _ in free_occurrences(start, end, instructor_id)
+                               if slot_start >= start)
+
+    return {
+        'start': start,
+        'end': end,
+        'counts': counts,
+        'booked_hours': round(sum(hours['booked'] for hours in weeks.values()), 2),
+        'weeks': [{
+            'week': week.date().isoformat(),
+            'booked_hours': round(hours['booked'], 2),
+            'confirmed_hours': round(hours['confirmed'], 2),
+        } for week, hours in sorted(weeks.items())],
+    }
+
+
+def get_stats(instructor_id, start, end, version=None):
+    """
+    Statystyki z cache Redis dla bieżącej wersji kalendarza; przy braku Redisa liczone z bazy.
+    """
+    version = version or get_version(instructor_id)
+    if version is None:
+        return build_stats(instructor_id, start, end)
+
+    key = STATS_KEY.format(instructor=instructor_id, version=version,
+                           start=naive_utc(start).isoformat(), end=naive_utc(end).isoformat())
+    try:
+        cached = redis.get(key)
+        if cached is not None:
+            return current_app.json.loads(cached)
+    except RedisError as e:
+        current_app.logger.warning(f"Cache statystyk niedostępny: {e}")
+        return build_stats(instructor_id, start, end)
+
+    stats = build_stats(instructor_id, start, end)
+    try:
+        redis.setex(key, current_app.config.get('INSTRUCTOR_STATS_TTL', 3600), current_app.json.dumps(stats))
+    except RedisError as e:
+        current_app.logger.warning(f"Nie udało się zapisać cache statystyk: {e}")
+    return stats
@@ -0,0 +1,73 @@
+import decimal
+import json
+from datetime import date, time
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson jest opcjonalny
+    orjson = None
+
+
+def _default(obj):
+    """
+    Typy, których enkoder nie obsługuje sam: wiersze SQLAlchemy, daty (dla stdlib), Decimal.
+    """
+    if hasattr(obj, '_mapping'):
+        return dict(obj._mapping)
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class CalendarJSONProvider(JSONProvider):
+    """
+    Dostawca JSON dla wszystkich odpowiedzi API.
+
+    Używa orjson, gdy jest zainstalowany, a w przeciwnym razie modułu json.
+    Daty i czasy są zapisywane w formacie ISO 8601, więc widoki mogą zwracać
+    je (oraz wiersze zapytań) bez ręcznego wywoływania isoformat().
+    """
+
+    def dumps_bytes(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None:
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('ensure_ascii', False)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def stream_array(self, items, chunk_size=500):
+        """
+        Tablica JSON zapisywana porcjami po chunk_size elementów, dla odpowiedzi strumieniowych.
+        """
+        yield b'['
+        separator = b''
+        chunk = []
+        for item in items:
+            chunk.append(self.dumps_bytes(item))
+            if len(chunk) >= chunk_size:
+                yield separator + b','.join(chunk)
+                separator = b','
+                chunk = []
+        if chunk:
+            yield separator + b','.join(chunk)
+        yield b']'
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype='application/json')
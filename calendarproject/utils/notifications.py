@@ -1,17 +1,32 @@
-from flask_mail import Message
-from calendarproject.extensions import mail
+from calendarproject.utils.outbox import enqueue, enqueue_many
 
-def send_email_notification(to, subject, body):
-    msg = Message(subject, recipients=[to])
-    msg.body = body
-    mail.send(msg)
+# Powiadomienia i e-maile trafiają do outboxa w transakcji wywołującego, a dostarcza je
+# zadanie Celery (calendarproject.tasks.relay_outbox), więc żądanie nie czeka na wysyłkę.
 
-def notify_instructor_new_appointment(instructor, appointment):
+def notify(user_id, message, type, related_id=None):
+    enqueue('notification', user_id=user_id, message=message, type=type, related_id=related_id)
+
+def notify_instructor_new_appointment(instructor_id, start_time):
     subject = "New Appointment Request"
-    body = f"A new appointment has been requested for {appointment.start_time}."
-    # send_email_notification(instructor.email, subject, body)
+    body = f"A new appointment has been requested for {start_time}."
+    enqueue('email', user_id=instructor_id, subject=subject, body=body)
+
+def notify_many(notifications):
+    """
+    Powiadomienia [{'user_id', 'message', 'type', 'related_id'}] jednym wsadowym INSERT.
+    """
+    enqueue_many('notification', notifications)
+
+def _status_email(student_id, start_time, status):
+    subject = f"Appointment {status.capitalize()}"
+    body = f"Your appointment for {start_time} has been {status}."
+    return {'user_id': student_id, 'subject': subject, 'body': body}
+
+def notify_student_appointment_status(student_id, start_time, status):
+    enqueue('email', **_status_email(student_id, start_time, status))
 
-def notify_student_appointment_status(student, appointment):
-    subject = f"Appointment {appointment.status.capitalize()}"
-    body = f"Your appointment for {appointment.start_time} has been {appointment.status}."
-    # send_email_notification(student.email, subject, body)
\ No newline at end of file
+def notify_students_appointment_status(changes):
+    """
+    E-maile o zmianie statusu dla listy (student_id, start_time, status).
+    """
+    enqueue_many('email', [_status_email(*change) for change in changes])
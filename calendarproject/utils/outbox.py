@@ -0,0 +1,204 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import or_
+
+from calendarproject.extensions import db, mail
+from calendarproject.models.notification import Notification
+from calendarproject.models.outbox import OutboxMessage
+from calendarproject.models.user import User
+
+# Maksymalna liczba prób dostarczenia wiadomości przez relay; kolejne próby po
+# RETRY_BASE * 2^(próba - 1), najwyżej co RETRY_MAX (łącznie ok. 2 godziny)
+MAX_ATTEMPTS = 8
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+# Czas, na który relay rezerwuje pobrane wiadomości; po awarii workera wracają do kolejki
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# Kopia pobranej wiadomości - dostarczanie odbywa się już po zwolnieniu blokad wierszy
+ClaimedMessage = namedtuple('ClaimedMessage', 'id channel payload created_at attempts')
+
+
+def enqueue(channel, **payload):
+    """
+    Dodaje wiadomość do outboxa w bieżącej transakcji (bez commita).
+    """
+    message = OutboxMessage(channel=channel, payload=payload)
+    db.session.add(message)
+    return message
+
+
+def enqueue_many(channel, payloads):
+    """
+    Dodaje wiadomości jednym wsadowym INSERT w bieżącej transakcji (bez commita).
+    """
+    if not payloads:
+        return
+    now = datetime.utcnow()
+    db.session.execute(db.insert(OutboxMessage), [
+        {'channel': channel, 'payload': payload, 'created_at': now, 'attempts': 0} for payload in payloads
+    ])
+
+
+def send_email_notification(to, subject, body):
+    msg = Message(subject, recipients=[to])
+    msg.body = body
+    mail.send(msg)
+
+
+def _deliver_notifications(messages):
+    db.session.execute(db.insert(Notification), [{
+        'user_id': message.payload['user_id'],
+        'message': message.payload['message'],
+        'type': message.payload['type'],
+        'related_id': message.payload.get('related_id'),
+        'timestamp': message.created_at,
+    } for message in messages])
+    return {}
+
+
+def _deliver_emails(messages):
+    user_ids = {message.payload['user_id'] for message in messages}
+    emails = dict(db.session.execute(db.select(User.id, User.email).where(User.id.in_(user_ids))).all())
+    failed = {}
+    for message in messages:
+        email = emails.get(message.payload['user_id'])
+        if not email:
+            continue
+        try:
+            send_email_notification(email, message.payload['subject'], message.payload['body'])
+        except Exception as e:
+            failed[message.id] = str(e)
+    return failed
+
+
+# Kanały dostarczania; nowy kanał (np. push) to nowa funkcja przyjmująca listę wiadomości
+# i zwracająca {id wiadomości: błąd} dla nieudanych.
+CHANNELS = {
+    'notification': _deliver_notifications,
+    'email': _deliver_emails,
+}
+
+
+def retry_delay(attempts):
+    """
+    Odstęp przed kolejną próbą po attempts nieudanych próbach.
+    """
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def _claim(batch_size, now):
+    # Krótka transakcja: blokada SKIP LOCKED tylko na czas oznaczenia wiadomości jako pobranych
+    messages = db.session.execute(
+        db.select(OutboxMessage)
+        .where(OutboxMessage.processed_at.is_(None), OutboxMessage.dead_at.is_(None),
+               or_(OutboxMessage.next_attempt_at.is_(None), OutboxMessage.next_attempt_at <= now))
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    claimed = []
+    for message in messages:
+        message.attempts += 1
+        message.next_attempt_at = now + CLAIM_TIMEOUT
+        claimed.append(ClaimedMessage(message.id, message.channel, message.payload, message.created_at,
+                                      message.attempts))
+    db.session.commit()
+    return claimed
+
+
+def _deliver(messages):
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+
+    failed = {}
+    for channel, channel_messages in by_channel.items():
+        deliver = CHANNELS.get(channel)
+        if deliver is None:
+            failed.update({message.id: f'Nieznany kanał: {channel}' for message in channel_messages})
+            continue
+        try:
+            # Savepoint: błąd kanału nie wycofuje dostarczenia pozostałych kanałów
+            with db.session.begin_nested():
+                failed.update(deliver(channel_messages))
+        except Exception as e:
+            current_app.logger.error(f"Outbox: kanał {channel} zgłosił błąd: {e}", exc_info=True)
+            failed.update({message.id: f'{type(e).__name__}: {e}' for message in channel_messages})
+    return failed
+
+
+def relay_batch(batch_size=100, now=None):
+    """
+    Dostarcza jedną paczkę wiadomości, których termin próby minął, i zapisuje wynik.
+
+    Wiersze są pobierane z SKIP LOCKED i rezerwowane na CLAIM_TIMEOUT w osobnej transakcji,
+    więc kilka workerów może pracować równolegle, a e-maile są wysyłane bez blokad.
+    Nieudane wiadomości czekają retry_delay(), a po MAX_ATTEMPTS próbach są porzucane
+    (dead_at) i zostają w tabeli. Zwraca liczbę pobranych wiadomości.
+    """
+    now = now or datetime.utcnow()
+    messages = _claim(batch_size, now)
+    if not messages:
+        return 0
+
+    try:
+        failed = _deliver(messages)
+        finished = datetime.utcnow()
+        delivered = [{'id': message.id, 'processed_at': finished, 'next_attempt_at': None}
+                     for message in messages if message.id not in failed]
+        retried = []
+        dead = []
+        for message in messages:
+            if message.id not in failed:
+                continue
+            update = {'id': message.id, 'last_error': failed[message.id][:255]}
+            if message.attempts >= MAX_ATTEMPTS:
+                dead.append({**update, 'dead_at': finished, 'next_attempt_at': None})
+            else:
+                retried.append({**update, 'next_attempt_at': finished + retry_delay(message.attempts)})
+        for updates in (delivered, retried, dead):
+            if updates:
+                db.session.execute(db.update(OutboxMessage), updates)
+        db.session.commit()
+    except Exception:
+        # Wiadomości wrócą do kolejki po CLAIM_TIMEOUT
+        db.session.rollback()
+        raise
+
+    if retried:
+        current_app.logger.warning(f"Outbox: {len(retried)} wiadomości nie zostało dostarczonych, "
+                                   f"kolejna próba później.")
+    if dead:
+        current_app.logger.error(f"Outbox: porzucono wiadomości po {MAX_ATTEMPTS} próbach: "
+                                 f"{[update['id'] for update in dead]}")
+    return len(messages)
+
+
+def retry_dead(message_ids=None):
+    """
+    Przywraca porzucone wiadomości (wszystkie albo o podanych ID) do kolejki z nową pulą prób.
+    Zwraca liczbę przywróconych wiadomości.
+    """
+    query = db.update(OutboxMessage).where(OutboxMessage.dead_at.isnot(None))
+    if message_ids:
+        query = query.where(OutboxMessage.id.in_(message_ids))
+    result = db.session.execute(query.values(dead_at=None, attempts=0, next_attempt_at=None))
+    db.session.commit()
+    return result.rowcount
+
+
+def relay(batch_size=100, max_batches=50):
+    """
+    Opróżnia outbox paczkami; zwraca liczbę obsłużonych wiadomości.
+    """
+    handled = 0
+    for _ in range(max_batches):
+        count = relay_batch(batch_size)
+        handled += count
+        if count < batch_size:
+            break
+    return handled
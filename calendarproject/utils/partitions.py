@@ -0,0 +1,214 @@
+import re
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+from sqlalchemy import text, union_all
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment_archive import ArchivedAppointment
+
+# Na Postgresie appointment jest partycjonowana miesięcznie po start_time (migracja
+# c9e2a7f4d813). Zapytania kalendarzy zawsze ograniczają start_time, więc czytają tylko
+# partycje z zakresu. Zadanie maintain_partitions tworzy partycje z wyprzedzeniem, a partycje
+# sprzed okresu przechowywania przepina do appointment_archive, czytanej tylko przez raporty
+# i szczegóły powiadomień (related_id zarchiwizowanego terminu).
+#
+# Migracja zawsze tworzy partycję domyślną, a przy niej Postgres nie pozwala na DETACH ...
+# CONCURRENTLY. W tym schemacie archiwizacja każdej partycji to więc zwykłe DETACH, które
+# bierze blokadę ACCESS EXCLUSIVE na appointment i na czas odłączania wstrzymuje zapytania
+# kalendarzy. Odłączanie bez blokowania działa tylko na bazie bez partycji domyślnej.
+
+PARENT = 'appointment'
+ARCHIVE = 'appointment_archive'
+# Terminy spoza utworzonych partycji (np. dalej niż wyprzedzenie) trafiają do partycji domyślnej
+DEFAULT_PARTITION = 'appointment_default'
+# Zwykłe DETACH PARTITION czeka w kolejce po blokadę ACCESS EXCLUSIVE całej appointment,
+# a zapytania kalendarzy czekają za nim - po tym czasie rezygnuje (kolejna próba przy
+# następnym uruchomieniu zadania), więc wstrzymuje je najwyżej na tyle plus samo odłączenie
+DETACH_LOCK_TIMEOUT = '5s'
+PARTITION_NAME = 'appointment_{month:%Y_%m}'
+PARTITION_PATTERN = re.compile(r'^appointment_(\d{4})_(\d{2})$')
+
+COLUMNS = ('id', 'instructor_id', 'student_id', 'start_time', 'end_time', 'is_available', 'topic', 'status',
+           'student_name')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def partition_name(month):
+    return PARTITION_NAME.format(month=month)
+
+
+def partition_month(name):
+    match = PARTITION_PATTERN.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def plan(existing, now, months_ahead, retention_months):
+    """
+    (miesiące partycji do utworzenia, miesiące partycji do archiwizacji) dla zbioru
+    miesięcy istniejących partycji. Tworzone są bieżący i months_ahead kolejnych miesięcy,
+    archiwizowane partycje starsze niż retention_months pełnych miesięcy przed bieżącym.
+    """
+    current = month_start(now)
+    create = [current + relativedelta(months=offset) for offset in range(months_ahead + 1)]
+    cutoff = current - relativedelta(months=retention_months)
+    return [month for month in create if month not in existing], sorted(month for month in existing if month < cutoff)
+
+
+def is_partitioned(table):
+    return db.session.execute(text(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = :table)'
+    ), {'table': table}).scalar()
+
+
+def partitions(parent):
+    """
+    Miesiące partycji tabeli parent (bez partycji domyślnej).
+    """
+    names = db.session.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :parent'
+    ), {'parent': parent}).scalars()
+    return {month for month in map(partition_month, names) if month is not None}
+
+
+def _bounds(month):
+    return f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{month + relativedelta(months=1):%Y-%m-%d}')"
+
+
+def create_partition(month):
+    """
+    Tworzy partycję miesiąca (bez commita). Terminy tego miesiąca są przenoszone z partycji
+    domyślnej (jeśli istnieje), a partycja dostaje ograniczenie wykluczające nakładanie się
+    terminów instruktora. Ograniczenie nie sięga sąsiednich partycji, więc nie chroni przed
+    równoległym wstawieniem nakładających się terminów z dwóch miesięcy (zob. Appointment.try_add).
+    """
+    name = partition_name(month)
+    columns = ', '.join(COLUMNS)
+    db.session.execute(text(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)'))
+    if has_default_partition():
+        db.session.execute(text(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE start_time >= :start AND start_time < :end '
+            f'RETURNING {columns}) INSERT INTO {name} ({columns}) SELECT {columns} FROM moved'
+        ), {'start': month, 'end': month + relativedelta(months=1)})
+    db.session.execute(text(
+        f'ALTER TABLE {name} ADD CONSTRAINT {name}_no_overlap '
+        f'EXCLUDE USING gist (instructor_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    ))
+    db.session.execute(text(f'ALTER TABLE {PARENT} ATTACH PARTITION {name} {_bounds(month)}'))
+
+
+def has_default_partition(parent=PARENT):
+    return db.session.execute(text(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = :table AND p.partdefid <> 0)'
+    ), {'table': parent}).scalar()
+
+
+def detach_concurrently_supported(parent=PARENT):
+    """
+    Czy partycje parent można odłączać bez blokowania zapytań (DETACH ... CONCURRENTLY):
+    wymaga Postgresa 14+ i tabeli bez partycji domyślnej.
+    """
+    version = db.session.execute(text("SELECT current_setting('server_version_num')::int")).scalar()
+    return version >= 140000 and not has_default_partition(parent)
+
+
+def _inheritance(name):
+    """
+    (tabela nadrzędna, czy trwa odłączanie) partycji name albo None dla samodzielnej tabeli.
+    """
+    return db.session.execute(text(
+        'SELECT p.relname, i.inhdetachpending FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent WHERE c.relname = :name'
+    ), {'name': name}).first()
+
+
+def detached_partitions():
+    """
+    Miesiące partycji odłączonych od appointment, ale jeszcze niedołączonych do archiwum
+    (archiwizacja przerwana po zatwierdzonym DETACH ... CONCURRENTLY).
+    """
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname LIKE 'appointment\\_%' "
+        'AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)'
+    )).scalars()
+    return {month for month in map(partition_month, names) if month is not None}
+
+
+def detach_concurrently(name, pending=False):
+    """
+    Odłącza partycję przez DETACH PARTITION ... CONCURRENTLY. Polecenie nie może działać
+    w transakcji, więc idzie osobnym połączeniem w trybie autocommit; odłączenie przerwane
+    w połowie (pending) jest kończone przez FINALIZE.
+    """
+    # Sesja nie może trzymać otwartej transakcji - CONCURRENTLY czeka na jej zakończenie
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        mode = 'FINALIZE' if pending else 'CONCURRENTLY'
+        connection.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION {name} {mode}'))
+
+
+def archive_partition(month):
+    """
+    Odłącza partycję miesiąca od appointment i dołącza ją do appointment_archive (bez commita).
+
+    W schemacie z migracji (z partycją domyślną) to zawsze zwykłe DETACH, które blokuje
+    zapytania kalendarzy i czeka na blokadę najwyżej DETACH_LOCK_TIMEOUT. Tylko na bazie bez
+    partycji domyślnej (Postgres 14+) odłączenie idzie przez CONCURRENTLY i nie blokuje zapytań.
+    """
+    name = partition_name(month)
+    inheritance = _inheritance(name)
+    if inheritance is not None and inheritance[0] == PARENT:
+        if inheritance[1] or detach_concurrently_supported():
+            detach_concurrently(name, pending=inheritance[1])
+        else:
+            db.session.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+            db.session.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION {name}'))
+    db.session.execute(text(f'ALTER TABLE {ARCHIVE} ATTACH PARTITION {name} {_bounds(month)}'))
+
+
+def maintain(now=None):
+    """
+    Tworzy brakujące partycje i archiwizuje stare, każdą zmianę w osobnej transakcji.
+    Na bazie bez partycjonowania (SQLite) nic nie robi.
+    """
+    if db.session.get_bind().dialect.name != 'postgresql' or not is_partitioned(PARENT):
+        return {'created': [], 'archived': []}
+
+    create, archive = plan(partitions(PARENT), now or datetime.utcnow(),
+                           current_app.config['APPOINTMENT_PARTITION_MONTHS_AHEAD'],
+                           current_app.config['APPOINTMENT_RETENTION_MONTHS'])
+    archive = sorted(set(archive) | detached_partitions())
+    result = {'created': [], 'archived': []}
+    for key, months, action in (('created', create, create_partition), ('archived', archive, archive_partition)):
+        for month in months:
+            try:
+                action(month)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Nie udało się zmienić partycji {partition_name(month)}: {e}")
+                continue
+            result[key].append(partition_name(month))
+    if result['created'] or result['archived']:
+        current_app.logger.info(f"Partycje terminów: utworzono {result['created']}, "
+                                f"zarchiwizowano {result['archived']}")
+    return result
+
+
+def appointment_history():
+    """
+    Terminy bieżące i zarchiwizowane (UNION ALL) do raportów. Warunki na start_time trafiają
+    do obu gałęzi, więc Postgres czyta tylko partycje z zakresu raportu.
+    """
+    return union_all(
+        db.select(*(getattr(Appointment, column) for column in COLUMNS)),
+        db.select(*(getattr(ArchivedAppointment, column) for column in COLUMNS))
+    ).subquery('appointment_history')
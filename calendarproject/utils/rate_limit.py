@@ -0,0 +1,130 @@
+import math
+from collections import namedtuple
+
+from flask import current_app, jsonify, request, session
+from redis.exceptions import RedisError
+
+from calendarproject.initializers import redis
+
+# Limity zapytań jako kubełki żetonów w Redis. Sprawdzane w before_request, czyli przed
+# widokiem, login_required (ładowanie użytkownika z bazy) i haszowaniem hasła.
+
+# capacity żetonów, uzupełnianych w całości co period sekund
+Limit = namedtuple('Limit', 'scope capacity period')
+
+KEY = 'ratelimit:{rule}:{scope}:{identity}'
+
+# Metody, które nie zużywają żetonów (formularze GET, preflight)
+EXEMPT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Wszystkie kubełki są sprawdzane i obciążane atomowo: żeton jest pobierany tylko wtedy,
+# gdy każdy kubełek go ma, więc odrzucone żądanie nie uszczupla pozostałych limitów.
+# KEYS[i] - kubełek, ARGV[2i-1] - pojemność, ARGV[2i] - żetony na milisekundę.
+# Zwraca {1, 0} albo {0, ms do uzupełnienia brakującego żetonu}.
+TOKEN_BUCKET = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+if wait > 0 then
+    return {0, wait}
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+end
+return {1, 0}
+"""
+
+_token_bucket = redis.register_script(TOKEN_BUCKET)
+
+
+def rules_for(endpoint, config):
+    """
+    Limity dla endpointu: reguła trasy ('calendar.book') ma pierwszeństwo przed regułą
+    blueprintu ('calendar'). Zwraca (nazwę reguły, listę Limit) albo (None, []).
+    """
+    if not endpoint:
+        return None, []
+    for rule in (endpoint, endpoint.rpartition('.')[0]):
+        if rule in config:
+            return rule, [Limit(*limit) for limit in config[rule]]
+    return None, []
+
+
+def _identity(scope):
+    if scope == 'ip':
+        return request.remote_addr or 'unknown'
+    if scope == 'user':
+        # Id z podpisanej sesji - bez zapytania o użytkownika do bazy
+        return session.get('_user_id')
+    raise ValueError(f"Nieznany zakres limitu: {scope}")
+
+
+def consume(rule, limits):
+    """
+    Pobiera po żetonie z kubełków reguły. Zwraca liczbę sekund do ponowienia
+    albo None, gdy żądanie mieści się w limitach (także gdy Redis jest niedostępny).
+    """
+    keys = []
+    args = []
+    for limit in limits:
+        identity = _identity(limit.scope)
+        if identity is None:
+            continue
+        keys.append(KEY.format(rule=rule, scope=limit.scope, identity=identity))
+        args.extend((limit.capacity, limit.capacity / (limit.period * 1000)))
+    if not keys:
+        return None
+
+    try:
+        allowed, wait_ms = _token_bucket(keys=keys, args=args)
+    except RedisError as e:
+        current_app.logger.warning(f"Limity zapytań niedostępne, żądanie przepuszczone: {e}")
+        return None
+    if allowed:
+        return None
+    return max(1, math.ceil(int(wait_ms) / 1000))
+
+
+def too_many_requests(retry_after):
+    message = 'Zbyt wiele żądań. Spróbuj ponownie za chwilę.'
+    if request.accept_mimetypes.best == 'text/html':
+        response = current_app.response_class(message, status=429, mimetype='text/plain')
+    else:
+        response = jsonify({'status': 'error', 'message': message})
+        response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def check_rate_limit():
+    if request.method in EXEMPT_METHODS or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    rule, limits = rules_for(request.endpoint, current_app.config.get('RATE_LIMITS', {}))
+    if not limits:
+        return None
+
+    retry_after = consume(rule, limits)
+    if retry_after is None:
+        return None
+    current_app.logger.warning(f"Limit zapytań przekroczony: {rule} z {request.remote_addr}")
+    return too_many_requests(retry_after)
+
+
+def init_rate_limit(app):
+    app.before_request(check_rate_limit)
@@ -0,0 +1,195 @@
+import heapq
+from datetime import date, datetime, time, timedelta
+
+import pytz
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.weeks import naive_utc
+
+# Generator cyklicznych terminów: tygodniowy wzorzec godzin dzielony na sloty o stałej
+# długości w zakresie dat, z pominięciem wyjątków. Cały plan jest walidowany przed zapisem,
+# kolizje są wykrywane jednym zapytaniem, a wiersze wstawiane jednym wsadowym INSERT.
+
+MAX_PLAN_DAYS = 366
+MAX_PLAN_SLOTS = 5000
+MIN_SLOT_MINUTES = 5
+MAX_SLOT_MINUTES = 8 * 60
+# Jak add_appointment: termin musi zaczynać się co najmniej godzinę od teraz
+MIN_NOTICE = timedelta(hours=1)
+
+
+class PlanError(ValueError):
+    """
+    Błąd walidacji planu; komunikat jest zwracany użytkownikowi.
+    """
+
+
+def parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise PlanError(f'Nieprawidłowa data w polu {field}: {value}')
+
+
+def parse_time(value, field):
+    try:
+        return time.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise PlanError(f'Nieprawidłowa godzina w polu {field}: {value}')
+
+
+def parse_pattern(pattern):
+    """
+    Wzorzec [{'weekday': 0-6 (poniedziałek = 0), 'start': 'HH:MM', 'end': 'HH:MM'}] jako
+    {dzień tygodnia: [(start, end)]}. Przedziały jednego dnia nie mogą się nakładać.
+    """
+    if not isinstance(pattern, list) or not pattern:
+        raise PlanError('Wzorzec tygodniowy musi zawierać co najmniej jeden przedział.')
+    days = {}
+    for entry in pattern:
+        weekday = entry.get('weekday') if isinstance(entry, dict) else None
+        if not isinstance(weekday, int) or not 0 <= weekday <= 6:
+            raise PlanError('Dzień tygodnia musi być liczbą od 0 (poniedziałek) do 6 (niedziela).')
+        start = parse_time(entry.get('start'), 'start')
+        end = parse_time(entry.get('end'), 'end')
+        if end <= start:
+            raise PlanError(f'Koniec przedziału {entry["start"]}-{entry["end"]} musi być po jego początku.')
+        days.setdefault(weekday, []).append((start, end))
+
+    for intervals in days.values():
+        intervals.sort()
+        for (_, previous_end), (start, _) in zip(intervals, intervals[1:]):
+            if start < previous_end:
+                raise PlanError('Przedziały wzorca w tym samym dniu tygodnia nie mogą się nakładać.')
+    return days
+
+
+def local_to_utc(value, tz):
+    """
+    Czas lokalny strefy tz jako UTC bez strefy czasowej albo None, gdy takiej godziny nie ma
+    (przeskok na czas letni). Godzina powtórzona przy zmianie na czas zimowy oznacza
+    pierwsze wystąpienie (jeszcze w czasie letnim).
+    """
+    try:
+        return naive_utc(tz.localize(value, is_dst=None))
+    except pytz.NonExistentTimeError:
+        return None
+    except pytz.AmbiguousTimeError:
+        return naive_utc(tz.localize(value, is_dst=True))
+
+
+def day_slots(day, start, end, slot, tz):
+    """
+    Terminy długości slot w przedziale start-end (czas lokalny strefy tz) dnia day,
+    jako pary (start, end) w UTC bez strefy czasowej.
+
+    W dniu zmiany czasu pomijane są sloty, których początek lub koniec nie istnieje
+    w czasie lokalnym, oraz sloty obejmujące zmianę (ich rzeczywista długość nie jest slot).
+    """
+    slots = []
+    slot_start = datetime.combine(day, start)
+    interval_end = datetime.combine(day, end)
+    while slot_start + slot <= interval_end:
+        start_utc = local_to_utc(slot_start, tz)
+        end_utc = local_to_utc(slot_start + slot, tz)
+        if start_utc is not None and end_utc is not None and end_utc - start_utc == slot:
+            slots.append((start_utc, end_utc))
+        slot_start += slot
+    return slots
+
+
+def build_plan(data, now):
+    """
+    Lista terminów (start, end) w UTC bez strefy czasowej, posortowana po początku.
+
+    Godziny wzorca są czasem lokalnym strefy timeZone, więc sloty zachowują godzinę
+    także po zmianie czasu letniego.
+    """
+    try:
+        tz = pytz.timezone(data.get('timeZone') or 'UTC')
+    except pytz.UnknownTimeZoneError:
+        raise PlanError('Nieznana strefa czasowa')
+
+    first_day = parse_date(data.get('start_date'), 'start_date')
+    last_day = parse_date(data.get('end_date'), 'end_date')
+    if last_day < first_day:
+        raise PlanError('Data końcowa musi być taka sama lub późniejsza niż data początkowa.')
+    if (last_day - first_day).days >= MAX_PLAN_DAYS:
+        raise PlanError(f'Zakres dat może obejmować najwyżej {MAX_PLAN_DAYS} dni.')
+
+    slot_minutes = data.get('slot_minutes')
+    if not isinstance(slot_minutes, int) or not MIN_SLOT_MINUTES <= slot_minutes <= MAX_SLOT_MINUTES:
+        raise PlanError(f'Długość terminu musi wynosić od {MIN_SLOT_MINUTES} do {MAX_SLOT_MINUTES} minut.')
+    slot = timedelta(minutes=slot_minutes)
+
+    days = parse_pattern(data.get('pattern'))
+    exceptions = {parse_date(value, 'exceptions') for value in data.get('exceptions') or []}
+
+    slots = []
+    day = first_day
+    while day <= last_day:
+        if day not in exceptions:
+            for start, end in days.get(day.weekday(), ()):
+                slots.extend(day_slots(day, start, end, slot, tz))
+                if len(slots) > MAX_PLAN_SLOTS:
+                    raise PlanError(f'Plan może zawierać najwyżej {MAX_PLAN_SLOTS} terminów.')
+        day += timedelta(days=1)
+
+    if not slots:
+        raise PlanError('Plan nie zawiera żadnego terminu.')
+    # Jeden termin na chwilę UTC, także gdy godziny wzorca spotykają się na zmianie czasu
+    slots = sorted(set(slots))
+    if slots[0][0] < naive_utc(now) + MIN_NOTICE:
+        raise PlanError('Terminy muszą zaczynać się co najmniej godzinę od obecnego czasu.')
+    return slots
+
+
+def find_conflicts(instructor_id, slots):
+    """
+    Terminy planu nakładające się na istniejące terminy instruktora.
+
+    Istniejące terminy z całego zakresu planu są czytane jednym zapytaniem zakresowym
+    po indeksie (instructor_id, start_time).
+    """
+    existing = db.session.execute(
+        db.select(Appointment.start_time, Appointment.end_time).where(
+            Appointment.instructor_id == instructor_id,
+            Appointment.overlapping(slots[0][0], max(end for _, end in slots))
+        ).order_by(Appointment.start_time)
+    ).all()
+    return overlapping_slots(slots, existing)
+
+
+def overlapping_slots(slots, existing):
+    """
+    Terminy z slots nakładające się na któryś z existing; obie listy par (start, end)
+    posortowane po początku. Przebieg po obu listach z kopcem końców aktywnych terminów.
+    """
+    conflicts = []
+    active = []
+    index = 0
+    for start, end in slots:
+        while index < len(existing) and existing[index][0] < end:
+            heapq.heappush(active, existing[index][1])
+            index += 1
+        # Sloty są posortowane po początku, więc termin kończący się przed tym slotem
+        # nie koliduje też z żadnym kolejnym
+        while active and active[0] <= start:
+            heapq.heappop(active)
+        if active:
+            conflicts.append((start, end))
+    return conflicts
+
+
+def insert_slots(instructor_id, slots):
+    """
+    Wstawia terminy jednym wsadowym INSERT (executemany); zatwierdza wywołujący.
+    """
+    db.session.execute(db.insert(Appointment), [{
+        'instructor_id': instructor_id,
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_available': True,
+        'status': 'pending',
+    } for start_time, end_time in slots])
@@ -0,0 +1,192 @@
+import csv
+from datetime import datetime
+from itertools import islice
+
+import pytz
+from dateutil import parser
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import MAX_APPOINTMENT_LENGTH
+from calendarproject.utils.calendar_cache import invalidate_changes
+from calendarproject.utils.recurring import MIN_NOTICE, find_conflicts, insert_slots
+from calendarproject.utils.weeks import naive_utc
+
+# Import wolnych terminów z plików CSV (kolumny start, end) i iCalendar (VEVENT z DTSTART
+# i DTEND). Pliki są czytane strumieniowo, wiersz po wierszu, a terminy walidowane
+# i zapisywane porcjami - pamięć zależy od wielkości porcji, nie pliku. Każda porcja
+# to jedna transakcja z wsadowym INSERT.
+
+CSV = 'csv'
+ICS = 'ics'
+FORMATS = (CSV, ICS)
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else None
+    return extension if extension in FORMATS else None
+
+
+def _parse_local(value, tz):
+    value = parser.isoparse(value.strip())
+    return tz.localize(value) if value.tzinfo is None else value
+
+
+def iter_csv(lines, tz):
+    """
+    Terminy z CSV z nagłówkiem start,end jako (numer linii, start, end) albo
+    (numer linii, None, komunikat błędu). Daty bez strefy są w strefie tz.
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not {'start', 'end'} <= {name.strip() for name in reader.fieldnames}:
+        yield 1, None, 'Plik CSV musi mieć nagłówek z kolumnami start i end.'
+        return
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+    for row in reader:
+        try:
+            yield reader.line_num, _parse_local(row['start'], tz), _parse_local(row['end'], tz)
+        except (TypeError, ValueError, AttributeError, OverflowError):
+            yield reader.line_num, None, f"Nieprawidłowa data: {row.get('start')} - {row.get('end')}"
+
+
+def _unfold(lines):
+    """
+    Linie logiczne iCalendar (RFC 5545 3.1) jako (numer pierwszej linii, treść).
+    """
+    current = None
+    start = 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _ics_datetime(name, value, tz):
+    params = dict(param.split('=', 1) for param in name.split(';')[1:] if '=' in param)
+    if params.get('VALUE') == 'DATE':
+        raise ValueError('Wydarzenia całodniowe nie są obsługiwane.')
+    parsed = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        return pytz.UTC.localize(parsed)
+    return pytz.timezone(params['TZID']).localize(parsed) if 'TZID' in params else tz.localize(parsed)
+
+
+def iter_ics(lines, tz):
+    """
+    Terminy z wydarzeń VEVENT jako (numer linii BEGIN:VEVENT, start, end) albo
+    (numer linii, None, komunikat błędu). Wydarzenia z RRULE są odrzucane.
+    """
+    event = None
+    for number, line in _unfold(lines):
+        name, _, value = line.partition(':')
+        key = name.split(';', 1)[0].upper()
+        if line == 'BEGIN:VEVENT':
+            event = {'line': number}
+        elif event is None:
+            continue
+        elif line == 'END:VEVENT':
+            if 'RRULE' in event:
+                yield event['line'], None, 'Wydarzenia cykliczne (RRULE) nie są obsługiwane.'
+            elif 'error' in event:
+                yield event['line'], None, event['error']
+            elif 'DTSTART' not in event or 'DTEND' not in event:
+                yield event['line'], None, 'Wydarzenie musi mieć DTSTART i DTEND.'
+            else:
+                yield event['line'], event['DTSTART'], event['DTEND']
+            event = None
+        elif key in ('DTSTART', 'DTEND'):
+            try:
+                event[key] = _ics_datetime(name, value, tz)
+            except (KeyError, ValueError, pytz.UnknownTimeZoneError) as e:
+                event['error'] = f'Nieprawidłowe {key}: {value} ({e})'
+        elif key == 'RRULE':
+            event['RRULE'] = value
+
+
+PARSERS = {CSV: iter_csv, ICS: iter_ics}
+
+
+def _validate(start, end, now):
+    if end <= start:
+        return 'Czas zakończenia musi być po czasie rozpoczęcia.'
+    if end - start > MAX_APPOINTMENT_LENGTH:
+        return 'Termin nie może być dłuższy niż jeden dzień.'
+    if start < now + MIN_NOTICE:
+        return 'Termin musi być co najmniej godzinę do przodu od obecnego czasu.'
+    return None
+
+
+def import_chunk(instructor_id, rows, now):
+    """
+    Waliduje i zapisuje porcję (bez commita). Zwraca (zapisane terminy, błędy [(linia, komunikat)]).
+    """
+    errors = []
+    slots = {}
+    for line, start, end in rows:
+        if start is None:
+            errors.append((line, end))
+            continue
+        start, end = naive_utc(start), naive_utc(end)
+        error = _validate(start, end, now)
+        if error:
+            errors.append((line, error))
+        elif (start, end) in slots:
+            errors.append((line, f'Termin powtarza się w pliku (linia {slots[(start, end)]}).'))
+        else:
+            slots[(start, end)] = line
+    if not slots:
+        return [], errors
+
+    ordered = sorted(slots)
+    # Kolizje z zapisanymi terminami (także z wcześniejszych porcji) - jedno zapytanie zakresowe
+    rejected = set(find_conflicts(instructor_id, ordered))
+    accepted = []
+    latest_end = None
+    for slot in ordered:
+        # Terminy są posortowane po początku, więc kolizja w porcji to start przed końcem przyjętego
+        if slot in rejected or (latest_end is not None and slot[0] < latest_end):
+            errors.append((slots[slot], 'Termin nakłada się na inny termin instruktora.'))
+        else:
+            accepted.append(slot)
+            latest_end = slot[1] if latest_end is None else max(latest_end, slot[1])
+
+    if accepted:
+        insert_slots(instructor_id, accepted)
+    errors.sort()
+    return accepted, errors
+
+
+def import_slots(instructor_id, lines, file_format, tz, now, chunk_size):
+    """
+    Importuje terminy porcjami po chunk_size wierszy, zatwierdzając każdą porcję.
+    Po każdej porcji zwraca (generator) raport: przetworzone linie, zapisane terminy i błędy.
+    """
+    rows = PARSERS[file_format](lines, tz)
+    now = naive_utc(now)
+    processed = created = failed = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        try:
+            accepted, errors = import_chunk(instructor_id, chunk, now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_changes(instructor_id, [(start, end, None) for start, end in accepted])
+
+        processed += len(chunk)
+        created += len(accepted)
+        failed += len(errors)
+        yield {
+            'processed': processed,
+            'created': created,
+            'failed': failed,
+            'errors': [{'line': line, 'message': message} for line, message in errors],
+        }
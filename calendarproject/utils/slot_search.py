@@ -0,0 +1,100 @@
+import heapq
+from collections import namedtuple
+from itertools import islice
+
+from sqlalchemy import and_, or_
+
+from calendarproject.extensions import db
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.user import User
+from calendarproject.utils.availability_rules import event_id, iter_free_occurrences
+
+# Wyszukiwanie najbliższych wolnych terminów. Każdy kursor czyta terminy w kolejności
+# indeksu (start_time, id) porcjami z paginacją po kluczu, więc koszt zależy od liczby
+# zwróconych terminów, a nie od rozmiaru tabeli. Terminy reguł dostępności są rozwijane
+# tydzień po tygodniu i scalane z terminami z bazy.
+
+# Znaleziony termin; id to ID terminu albo ID wydarzenia terminu reguły ('rule-...')
+FreeSlot = namedtuple('FreeSlot', 'start_time id instructor_id end_time')
+
+
+def _scan(after, batch_size, instructor_id=None):
+    """
+    Wolne terminy zaczynające się po after jako krotki (start_time, id, instructor_id, end_time),
+    rosnąco po (start_time, id). Bez instruktora czyta partial indeks wolnych terminów,
+    z instruktorem - indeks (instructor_id, start_time).
+    """
+    last = None
+    while True:
+        query = db.select(
+            Appointment.start_time,
+            Appointment.id,
+            Appointment.instructor_id,
+            Appointment.end_time
+        ).where(
+            Appointment.is_available == True,
+            Appointment.start_time > after,
+            Appointment.instructor_active()
+        )
+        if instructor_id is not None:
+            query = query.where(Appointment.instructor_id == instructor_id)
+        if last is not None:
+            query = query.where(or_(
+                Appointment.start_time > last[0],
+                and_(Appointment.start_time == last[0], Appointment.id > last[1])
+            ))
+        rows = db.session.execute(query.order_by(Appointment.start_time, Appointment.id).limit(batch_size)).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+def _rule_slots(after, instructor_ids=None):
+    for rule_id, instructor_id, start_time, end_time in iter_free_occurrences(after, instructor_ids):
+        yield FreeSlot(start_time, event_id(rule_id, start_time), instructor_id, end_time)
+
+
+def _order(row):
+    # Przy równym początku terminy z bazy przed terminami reguł; ID liczbowe i tekstowe
+    # nie są ze sobą porównywane
+    return row.start_time, isinstance(row.id, str), row.id
+
+
+def earliest_free_slots(after, limit, instructor_ids=None, min_duration=None):
+    """
+    Pierwsze limit wolnych terminów po after, opcjonalnie wybranych instruktorów
+    i nie krótszych niż min_duration.
+
+    Dla zbioru instruktorów kursory poszczególnych instruktorów są scalane kopcem
+    (k-way merge), każdy kursor czyta tylko swój fragment indeksu. Terminy reguł
+    dostępności wszystkich wybranych instruktorów są jednym dodatkowym źródłem.
+    """
+    # Odrzucanie krótkich terminów może wymagać doczytania kolejnych porcji
+    batch_size = limit if min_duration is None else limit * 4
+    if instructor_ids:
+        sources = [_scan(after, batch_size, instructor_id) for instructor_id in instructor_ids]
+    else:
+        sources = [_scan(after, batch_size)]
+    sources.append(_rule_slots(after, instructor_ids))
+    rows = heapq.merge(*sources, key=_order)
+    if min_duration is not None:
+        rows = (row for row in rows if row.end_time - row.start_time >= min_duration)
+    return list(islice(rows, limit))
+
+
+def slot_events(rows):
+    """
+    Znalezione terminy z imieniem i nazwiskiem instruktora (jedno zapytanie o nazwiska).
+    """
+    instructor_ids = {row.instructor_id for row in rows}
+    names = dict(db.session.execute(
+        db.select(User.id, User.first_name + ' ' + User.last_name).where(User.id.in_(instructor_ids))
+    ).all()) if instructor_ids else {}
+    return [{
+        'id': row.id,
+        'instructor_id': row.instructor_id,
+        'instructor': names.get(row.instructor_id, ''),
+        'start': row.start_time,
+        'end': row.end_time,
+    } for row in rows]
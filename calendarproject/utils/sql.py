@@ -0,0 +1,25 @@
+from sqlalchemy import Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+# Wyrażenia SQL zależne od bazy (Postgres w produkcji, SQLite w testach)
+
+
+class seconds_between(FunctionElement):
+    """
+    Długość przedziału (start, end) w sekundach.
+    """
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(seconds_between)
+def _seconds_between(element, compiler, **kw):
+    start, end = element.clauses
+    return f'EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)}))'
+
+
+@compiles(seconds_between, 'sqlite')
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = element.clauses
+    return f'((julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)})) * 86400)'
@@ -0,0 +1,220 @@
+from datetime import date, datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, case, func, or_, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from calendarproject.extensions import db
+from calendarproject.models.user import User
+from calendarproject.models.utilization_rollup import COUNTERS, UtilizationRollup
+from calendarproject.utils.partitions import appointment_history
+from calendarproject.utils.sql import seconds_between
+from calendarproject.utils.weeks import naive_utc, week_start
+
+# Raporty wykorzystania czytają tylko dzienne podsumowania (UtilizationRollup), a nie
+# terminy i powiadomienia. Zmiana terminu oznacza jego dzień (mark_changed, wołane przy
+# unieważnianiu cache), a okresowe zadanie Celery przelicza godziny tylko tych dni.
+# Wolne terminy reguł dostępności nie mają wierszy, więc do godzin oferowanych wchodzą
+# dopiero po rezerwacji; wykorzystanie instruktorów z regułami jest przez to zawyżone.
+
+# Dni przeliczane w jednym zapytaniu (warunek OR po zakresach indeksu instruktor + start)
+REFRESH_BATCH_SIZE = 200
+
+
+def mark_changed(instructor_id, start_times):
+    """
+    Oznacza dni terminów do przeliczenia; wołane po zatwierdzeniu zmiany terminów.
+    """
+    try:
+        UtilizationRollup.record([(instructor_id, start_time, None) for start_time in start_times])
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Nie udało się oznaczyć dni do przeliczenia wykorzystania: {e}")
+
+
+def _as_date(value):
+    # SQLite zwraca date() jako tekst, Postgres jako datę
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def mark_all(batch_size=1000):
+    """
+    Oznacza do przeliczenia wszystkie dni z terminami (pierwsze wypełnienie podsumowań).
+    Liczniki zdarzeń sprzed wdrożenia podsumowań nie są odtwarzane. Zwraca liczbę dni.
+    """
+    history = appointment_history()
+    day = func.date(history.c.start_time)
+    rows = db.session.execute(db.select(history.c.instructor_id, day).distinct()).all()
+    for offset in range(0, len(rows), batch_size):
+        UtilizationRollup.record([(instructor_id, datetime.combine(_as_date(value), time()), None)
+                                  for instructor_id, value in rows[offset:offset + batch_size]])
+        db.session.commit()
+    return len(rows)
+
+
+def _day_totals(days):
+    """
+    {(instructor_id, dzień): wiersz sum} dla par (instructor_id, dzień) - jedno zapytanie grupujące.
+    """
+    history = appointment_history()
+    day = func.date(history.c.start_time)
+    booked = history.c.is_available == False
+    seconds = seconds_between(history.c.start_time, history.c.end_time)
+    ranges = [
+        and_(history.c.instructor_id == instructor_id,
+             history.c.start_time >= datetime.combine(rollup_day, time()),
+             history.c.start_time < datetime.combine(rollup_day + timedelta(days=1), time()))
+        for instructor_id, rollup_day in days
+    ]
+    rows = db.session.execute(
+        db.select(
+            history.c.instructor_id,
+            day.label('day'),
+            func.count().label('slots'),
+            func.sum(case((booked, 1), else_=0)).label('booked'),
+            func.sum(seconds).label('offered'),
+            func.sum(case((booked, seconds), else_=0)).label('booked_seconds'),
+            func.sum(case((and_(booked, history.c.status == 'confirmed'), seconds), else_=0)).label('confirmed')
+        ).where(or_(*ranges)).group_by(history.c.instructor_id, day)
+    )
+    return {(row.instructor_id, _as_date(row.day)): row for row in rows}
+
+
+def refresh(batch_size=REFRESH_BATCH_SIZE):
+    """
+    Przelicza godziny i liczby terminów dni oznaczonych jako zmienione, porcjami.
+    Zwraca liczbę przeliczonych dni.
+    """
+    table = UtilizationRollup.__table__
+    update = db.update(table).where(
+        table.c.instructor_id == bindparam('b_instructor_id'),
+        table.c.day == bindparam('b_day')
+    ).values(
+        slots=bindparam('b_slots'),
+        booked=bindparam('b_booked'),
+        offered_seconds=bindparam('b_offered'),
+        booked_seconds=bindparam('b_booked_seconds'),
+        confirmed_seconds=bindparam('b_confirmed'),
+        # Zmiany zapisane w trakcie przeliczania zostają na następny przebieg
+        pending_changes=table.c.pending_changes - bindparam('b_seen'),
+        updated_at=bindparam('b_updated_at')
+    )
+
+    refreshed = 0
+    after = None
+    while True:
+        query = db.select(
+            UtilizationRollup.instructor_id, UtilizationRollup.day, UtilizationRollup.pending_changes
+        ).where(UtilizationRollup.pending_changes > 0)
+        # Jedno przejście po kluczu: dni zmienione w trakcie czekają na kolejne uruchomienie
+        if after is not None:
+            query = query.where(tuple_(UtilizationRollup.instructor_id, UtilizationRollup.day) > after)
+        pending = db.session.execute(
+            query.order_by(UtilizationRollup.instructor_id, UtilizationRollup.day).limit(batch_size)
+        ).all()
+        if not pending:
+            return refreshed
+        after = (pending[-1].instructor_id, pending[-1].day)
+
+        totals = _day_totals([(row.instructor_id, row.day) for row in pending])
+        now = datetime.utcnow()
+        params = []
+        for row in pending:
+            total = totals.get((row.instructor_id, row.day))
+            params.append({
+                'b_instructor_id': row.instructor_id,
+                'b_day': row.day,
+                'b_slots': total.slots if total else 0,
+                'b_booked': int(total.booked) if total else 0,
+                # Postgres zwraca EXTRACT jako numeric (Decimal)
+                'b_offered': round(float(total.offered or 0)) if total else 0,
+                'b_booked_seconds': round(float(total.booked_seconds or 0)) if total else 0,
+                'b_confirmed': round(float(total.confirmed or 0)) if total else 0,
+                'b_seen': row.pending_changes,
+                'b_updated_at': now,
+            })
+        try:
+            db.session.execute(update, params)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        refreshed += len(pending)
+
+
+def _hours(seconds):
+    return round(seconds / 3600, 2)
+
+
+def _rate(part, whole):
+    return round(part / whole, 3) if whole else None
+
+
+def _summary(totals):
+    return {
+        'offered_hours': _hours(totals['offered_seconds']),
+        'booked_hours': _hours(totals['booked_seconds']),
+        'confirmed_hours': _hours(totals['confirmed_seconds']),
+        'utilization': _rate(totals['booked_seconds'], totals['offered_seconds']),
+        **{counter: totals[counter] for counter in COUNTERS},
+        'rejection_rate': _rate(totals['rejections'], totals['bookings']),
+        'cancellation_rate': _rate(totals['cancellations'], totals['bookings']),
+    }
+
+
+def report(start, end, instructor_id=None):
+    """
+    Raport wykorzystania dni [start, end) z podsumowań: dla każdego instruktora godziny
+    oferowane, zarezerwowane i potwierdzone, liczniki zdarzeń oraz te same dane w tygodniach UTC.
+
+    Podsumowania są dzienne w UTC, więc raport obejmuje pełne dni UTC, na które nachodzi
+    [start, end) - dla zakresu w innej strefie czasowej szerszy niż żądany. start i end
+    raportu to faktycznie objęty zakres, requested_start i requested_end - zakres żądany.
+    """
+    requested_start, requested_end = naive_utc(start), naive_utc(end)
+    first_day, last_day = requested_start.date(), (requested_end - timedelta(microseconds=1)).date()
+    start = datetime.combine(first_day, time())
+    end = datetime.combine(last_day + timedelta(days=1), time())
+    columns = ('offered_seconds', 'booked_seconds', 'confirmed_seconds') + COUNTERS
+    query = db.select(
+        UtilizationRollup, User.first_name, User.last_name
+    ).join(User, User.id == UtilizationRollup.instructor_id).where(
+        UtilizationRollup.day >= first_day,
+        UtilizationRollup.day <= last_day,
+        User.deleted == False
+    )
+    if instructor_id:
+        query = query.where(UtilizationRollup.instructor_id == instructor_id)
+
+    instructors = {}
+    pending_days = 0
+    for rollup, first_name, last_name in db.session.execute(
+            query.order_by(UtilizationRollup.instructor_id, UtilizationRollup.day)):
+        entry = instructors.setdefault(rollup.instructor_id, {
+            'id': rollup.instructor_id,
+            'full_name': f'{first_name} {last_name}',
+            'totals': dict.fromkeys(columns, 0),
+            'weeks': {},
+        })
+        week = entry['weeks'].setdefault(week_start(datetime.combine(rollup.day, time())), dict.fromkeys(columns, 0))
+        for column in columns:
+            entry['totals'][column] += getattr(rollup, column)
+            week[column] += getattr(rollup, column)
+        pending_days += rollup.pending_changes > 0
+
+    return {
+        'start': start,
+        'end': end,
+        'requested_start': requested_start,
+        'requested_end': requested_end,
+        # Dni, których godziny czekają na przeliczenie (liczniki zdarzeń są zawsze aktualne)
+        'pending_days': pending_days,
+        'instructors': [{
+            'id': entry['id'],
+            'full_name': entry['full_name'],
+            **_summary(entry['totals']),
+            'weeks': [{'week': week.date().isoformat(), **_summary(totals)}
+                      for week, totals in sorted(entry['weeks'].items())],
+        } for entry in instructors.values()],
+    }
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytz
+from dateutil import parser
+
+WEEK = timedelta(days=7)
+
+
+def naive_utc(value):
+    """
+    Baza przechowuje czasy UTC bez strefy czasowej.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def week_start(value):
+    """
+    Początek tygodnia UTC (poniedziałek 00:00) zawierającego podaną chwilę.
+    """
+    value = naive_utc(value)
+    day = datetime(value.year, value.month, value.day)
+    return day - timedelta(days=day.weekday())
+
+
+def weeks_overlapping(start, end):
+    """
+    Początki wszystkich tygodni UTC nakładających się na przedział [start, end).
+    """
+    start = naive_utc(start)
+    end = naive_utc(end)
+    weeks = []
+    week = week_start(start)
+    while week < end:
+        weeks.append(week)
+        week += WEEK
+    return weeks
+
+
+def parse_datetime(value, tz_str='UTC'):
+    """
+    Data w formacie ISO 8601 jako czas UTC; data bez strefy jest interpretowana w strefie tz_str.
+
+    Zgłasza pytz.UnknownTimeZoneError lub ValueError przy błędnych danych.
+    """
+    tz = pytz.timezone(tz_str)
+    value = parser.isoparse(value)
+    value = tz.localize(value) if value.tzinfo is None else value
+    return value.astimezone(pytz.UTC)
+
+
+def parse_range(start_str, end_str, tz_str='UTC'):
+    """
+    Zakres z parametrów FullCalendar (start, end, timeZone) jako czasy UTC.
+
+    Daty bez strefy czasowej są interpretowane w strefie tz_str.
+    Zgłasza pytz.UnknownTimeZoneError lub ValueError przy błędnych danych.
+    """
+    return parse_datetime(start_str, tz_str), parse_datetime(end_str, tz_str)
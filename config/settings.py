@@ -36,11 +36,76 @@ MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", "random")  # Fixed this l
 
 # Redis.
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CALENDAR_CACHE_TTL = int(os.getenv("CALENDAR_CACHE_TTL", 24 * 60 * 60))
+
+# Najdłuższe okno kalendarza studenta (dni); dłuższe zakresy tylko w trybie ?stream=1,
+# który czyta terminy z bazy porcjami po CALENDAR_STREAM_CHUNK wierszy.
+CALENDAR_MAX_WINDOW_DAYS = int(os.getenv("CALENDAR_MAX_WINDOW_DAYS", 62))
+CALENDAR_STREAM_MAX_WINDOW_DAYS = int(os.getenv("CALENDAR_STREAM_MAX_WINDOW_DAYS", 366))
+CALENDAR_STREAM_CHUNK = int(os.getenv("CALENDAR_STREAM_CHUNK", 500))
+
+# Katalog instruktorów (/api/instructors): czas życia podsumowań w Redis i max-age odpowiedzi
+INSTRUCTOR_DIRECTORY_TTL = int(os.getenv("INSTRUCTOR_DIRECTORY_TTL", 300))
+INSTRUCTOR_DIRECTORY_MAX_AGE = int(os.getenv("INSTRUCTOR_DIRECTORY_MAX_AGE", 60))
+
+# Statystyki instruktora (/instructor/stats): najdłuższy zakres (dni) i czas życia cache w Redis
+INSTRUCTOR_STATS_MAX_WINDOW_DAYS = int(os.getenv("INSTRUCTOR_STATS_MAX_WINDOW_DAYS", 366))
+INSTRUCTOR_STATS_TTL = int(os.getenv("INSTRUCTOR_STATS_TTL", 3600))
+
+# Raport wykorzystania (/admin/utilization): najdłuższy zakres w dniach
+UTILIZATION_REPORT_MAX_WINDOW_DAYS = int(os.getenv("UTILIZATION_REPORT_MAX_WINDOW_DAYS", 400))
+
+# Partycje miesięczne appointment (Postgres): ile miesięcy naprzód tworzyć i ile pełnych
+# miesięcy wstecz trzymać w tabeli bieżącej, zanim partycja trafi do appointment_archive
+APPOINTMENT_PARTITION_MONTHS_AHEAD = int(os.getenv("APPOINTMENT_PARTITION_MONTHS_AHEAD", 3))
+APPOINTMENT_RETENTION_MONTHS = int(os.getenv("APPOINTMENT_RETENTION_MONTHS", 12))
+
+# Import terminów z CSV/ICS: liczba wierszy walidowanych i zapisywanych w jednej transakcji
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 500))
+
+# Import instruktorów z CSV: liczba procesów hashujących hasła (domyślnie liczba rdzeni)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+# Usuwanie instruktora w tle: liczba terminów usuwanych w jednej transakcji
+INSTRUCTOR_DELETION_CHUNK_SIZE = int(os.getenv("INSTRUCTOR_DELETION_CHUNK_SIZE", 500))
+
+# Zakres kanałów ICS w tygodniach wstecz i naprzód od bieżącego tygodnia
+ICS_FEED_PAST_WEEKS = int(os.getenv("ICS_FEED_PAST_WEEKS", 4))
+ICS_FEED_FUTURE_WEEKS = int(os.getenv("ICS_FEED_FUTURE_WEEKS", 26))
 DEBUG_TB_INTERCEPT_REDIRECTS = False
 
+# Limity zapytań (kubełki żetonów w Redis) dla żądań innych niż GET.
+# Klucz to endpoint ("auth.login") albo cały blueprint ("calendar"),
+# wartość to lista (zakres "ip" | "user", pojemność, sekundy na pełne uzupełnienie).
+RATE_LIMIT_ENABLED = bool(strtobool(os.getenv("RATE_LIMIT_ENABLED", "true")))
+RATE_LIMITS = {
+    "calendar.book": [("user", 5, 60), ("ip", 30, 60)],
+    "calendar.book_rule_slot": [("user", 5, 60), ("ip", 30, 60)],
+    "auth.login": [("ip", 10, 60)],
+    "auth.register": [("ip", 5, 300)],
+}
+
 # Celery.
 CELERY_CONFIG = {
     "broker_url": REDIS_URL,
     "result_backend": REDIS_URL,
-    "include": [],
+    "include": ["calendarproject.tasks"],
+    "beat_schedule": {
+        "relay-outbox": {
+            "task": "calendarproject.tasks.relay_outbox",
+            "schedule": float(os.getenv("OUTBOX_RELAY_INTERVAL", 5)),
+        },
+        "refresh-calendar-views": {
+            "task": "calendarproject.tasks.refresh_calendar_views",
+            "schedule": float(os.getenv("CALENDAR_REFRESH_INTERVAL", 5)),
+        },
+        "refresh-utilization": {
+            "task": "calendarproject.tasks.refresh_utilization",
+            "schedule": float(os.getenv("UTILIZATION_REFRESH_INTERVAL", 300)),
+        },
+        "maintain-partitions": {
+            "task": "calendarproject.tasks.maintain_partitions",
+            "schedule": float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", 86400)),
+        },
+    },
 }
\ No newline at end of file
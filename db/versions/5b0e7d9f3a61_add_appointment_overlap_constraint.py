@@ -0,0 +1,36 @@
+"""add appointment overlap constraint
+
+Revision ID: 5b0e7d9f3a61
+Revises: c67388e1fbf3
+Create Date: 2026-10-18 15:02:44.731590
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e7d9f3a61'
+down_revision = 'c67388e1fbf3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tylko Postgres; na SQLite nakładanie sprawdza INSERT ... WHERE NOT EXISTS w Appointment.try_add.
+    # Istniejące nakładające się terminy trzeba usunąć przed migracją, inaczej ALTER się nie powiedzie.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE appointment DROP CONSTRAINT IF EXISTS appointment_instructor_no_overlap'
+    )
+    op.execute(
+        'ALTER TABLE appointment ADD CONSTRAINT appointment_instructor_no_overlap '
+        'EXCLUDE USING gist (instructor_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE appointment DROP CONSTRAINT IF EXISTS appointment_instructor_no_overlap')
@@ -0,0 +1,48 @@
+"""add appointment student name
+
+Revision ID: 8d2f4a6c1e07
+Revises: 5b0e7d9f3a61
+Create Date: 2026-10-18 16:05:12.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4a6c1e07'
+down_revision = '5b0e7d9f3a61'
+branch_labels = None
+depends_on = None
+
+
+appointment = sa.table(
+    'appointment',
+    sa.column('student_id', sa.Integer),
+    sa.column('student_name', sa.String),
+)
+user = sa.table(
+    'user',
+    sa.column('id', sa.Integer),
+    sa.column('first_name', sa.String),
+    sa.column('last_name', sa.String),
+)
+
+
+def upgrade():
+    # Kolumna może już istnieć, gdy tabelę utworzył db.create_all()
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('appointment')}
+    if 'student_name' not in columns:
+        op.add_column('appointment', sa.Column('student_name', sa.String(length=101), nullable=True))
+
+    op.execute(
+        appointment.update()
+        .where(appointment.c.student_id.isnot(None))
+        .values(student_name=sa.select(user.c.first_name + ' ' + user.c.last_name)
+                .where(user.c.id == appointment.c.student_id)
+                .scalar_subquery())
+    )
+
+
+def downgrade():
+    op.drop_column('appointment', 'student_name')
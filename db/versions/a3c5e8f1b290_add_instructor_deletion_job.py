@@ -0,0 +1,40 @@
+"""add instructor deletion job
+
+Revision ID: a3c5e8f1b290
+Revises: e41b7c93d5a2
+Create Date: 2026-10-18 19:04:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e8f1b290'
+down_revision = 'e41b7c93d5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'instructor_deletion_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('instructor_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('deleted_appointments', sa.Integer(), nullable=False),
+        sa.Column('notified_students', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['instructor_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_instructor_deletion_job_instructor_id', 'instructor_deletion_job', ['instructor_id'],
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_instructor_deletion_job_instructor_id', table_name='instructor_deletion_job')
+    op.drop_table('instructor_deletion_job')
@@ -0,0 +1,47 @@
+"""add utilization rollup
+
+Revision ID: b7d1f4a9c6e3
+Revises: a3c5e8f1b290
+Create Date: 2026-10-18 20:11:37.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d1f4a9c6e3'
+down_revision = 'a3c5e8f1b290'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Podsumowania wypełnia "flask rebuild-utilization" i zadanie refresh_utilization
+    op.create_table(
+        'utilization_rollup',
+        sa.Column('instructor_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('slots', sa.Integer(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.Column('offered_seconds', sa.Integer(), nullable=False),
+        sa.Column('booked_seconds', sa.Integer(), nullable=False),
+        sa.Column('confirmed_seconds', sa.Integer(), nullable=False),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.Column('rejections', sa.Integer(), nullable=False),
+        sa.Column('cancellations', sa.Integer(), nullable=False),
+        sa.Column('pending_changes', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['instructor_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('instructor_id', 'day'),
+        if_not_exists=True
+    )
+    op.create_index('ix_utilization_rollup_pending', 'utilization_rollup', ['instructor_id', 'day'],
+                    sqlite_where=sa.text('pending_changes > 0'),
+                    postgresql_where=sa.text('pending_changes > 0'),
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_utilization_rollup_pending', table_name='utilization_rollup')
+    op.drop_table('utilization_rollup')
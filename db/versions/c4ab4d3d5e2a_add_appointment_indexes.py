@@ -0,0 +1,35 @@
+"""add appointment indexes
+
+Revision ID: c4ab4d3d5e2a
+Revises: 
+Create Date: 2026-10-18 10:12:41.204511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4ab4d3d5e2a'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() tworzy schemat przez db.create_all(), więc na świeżej bazie
+    # indeksy mogą już istnieć.
+    op.create_index('ix_appointment_instructor_id_start_time', 'appointment',
+                    ['instructor_id', 'start_time'], if_not_exists=True)
+    op.create_index('ix_appointment_available_start_time', 'appointment',
+                    ['start_time'], if_not_exists=True,
+                    sqlite_where=sa.text('is_available = 1'),
+                    postgresql_where=sa.text('is_available = true'))
+    op.create_index('ix_appointment_student_id_start_time', 'appointment',
+                    ['student_id', 'start_time'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_appointment_student_id_start_time', table_name='appointment')
+    op.drop_index('ix_appointment_available_start_time', table_name='appointment')
+    op.drop_index('ix_appointment_instructor_id_start_time', table_name='appointment')
@@ -0,0 +1,39 @@
+"""add outbox message
+
+Revision ID: c67388e1fbf3
+Revises: c4ab4d3d5e2a
+Create Date: 2026-10-18 12:40:03.518274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c67388e1fbf3'
+down_revision = 'c4ab4d3d5e2a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox_message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_outbox_message_pending', 'outbox_message', ['id'], if_not_exists=True,
+                    sqlite_where=sa.text('processed_at IS NULL'),
+                    postgresql_where=sa.text('processed_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_outbox_message_pending', table_name='outbox_message')
+    op.drop_table('outbox_message')
@@ -0,0 +1,171 @@
+"""partition appointment by month
+
+Revision ID: c9e2a7f4d813
+Revises: b7d1f4a9c6e3
+Create Date: 2026-10-18 21:03:52.640178
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e2a7f4d813'
+down_revision = 'b7d1f4a9c6e3'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, instructor_id, student_id, start_time, end_time, is_available, topic, status, student_name'
+# Miesiące naprzód tworzone przez migrację; dalsze tworzy zadanie maintain_partitions
+MONTHS_AHEAD = 3
+
+TABLE = '''
+CREATE TABLE {name} (
+    id INTEGER NOT NULL DEFAULT nextval('appointment_id_seq'),
+    instructor_id INTEGER NOT NULL,
+    student_id INTEGER,
+    start_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    end_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    is_available BOOLEAN,
+    topic VARCHAR(200),
+    status VARCHAR(20),
+    student_name VARCHAR(101),
+    {constraints}
+)
+'''
+
+# Postgres nie pozwala na ograniczenie wykluczające na tabeli partycjonowanej bez klucza
+# partycjonowania, więc każda partycja ma własne - nakładanie się terminów z różnych
+# miesięcy przy równoległych wstawieniach nie jest już wykluczane przez bazę
+NO_OVERLAP = 'EXCLUDE USING gist (instructor_id WITH =, tsrange(start_time, end_time) WITH &&)'
+
+INDEXES = (
+    'CREATE INDEX ix_appointment_instructor_id_start_time ON appointment (instructor_id, start_time)',
+    'CREATE INDEX ix_appointment_available_start_time ON appointment (start_time) WHERE is_available = true',
+    'CREATE INDEX ix_appointment_student_id_start_time ON appointment (student_id, start_time)',
+)
+
+
+def _months(first, last):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield month, following
+        month = following
+
+
+def _is_partitioned(bind, table):
+    return bind.execute(sa.text(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+        'WHERE c.relname = :table)'
+    ), {'table': table}).scalar()
+
+
+def _drop_old_indexes():
+    # Nazwy indeksów są wspólne dla schematu - nowa tabela dostaje te same
+    op.execute('ALTER TABLE appointment DROP CONSTRAINT IF EXISTS appointment_instructor_no_overlap')
+    for name in ('ix_appointment_instructor_id_start_time', 'ix_appointment_available_start_time',
+                 'ix_appointment_student_id_start_time'):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def _create_plain_archive():
+    op.create_table(
+        'appointment_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('instructor_id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('is_available', sa.Boolean(), nullable=True),
+        sa.Column('topic', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('student_name', sa.String(length=101), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_appointment_archive_instructor_id_start_time', 'appointment_archive',
+                    ['instructor_id', 'start_time'], if_not_exists=True)
+
+
+def upgrade():
+    # Partycjonowanie tylko na Postgresie; na SQLite appointment zostaje zwykłą tabelą,
+    # a archiwum jest pustą tabelą, żeby raporty miały jedną ścieżkę odczytu.
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        _create_plain_archive()
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    if not _is_partitioned(bind, 'appointment_archive'):
+        # create_all() mógł utworzyć archiwum jako zwykłą (pustą) tabelę
+        op.execute('DROP TABLE IF EXISTS appointment_archive')
+        op.execute(TABLE.format(name='appointment_archive', constraints='PRIMARY KEY (id, start_time)')
+                   + ' PARTITION BY RANGE (start_time)')
+        op.execute('CREATE INDEX ix_appointment_archive_instructor_id_start_time '
+                   'ON appointment_archive (instructor_id, start_time)')
+
+    if _is_partitioned(bind, 'appointment'):
+        return
+
+    first, last = bind.execute(sa.text('SELECT min(start_time), max(start_time) FROM appointment')).one()
+    today = datetime.utcnow().date()
+    first = min(first.date(), today) if first else today
+    months = today.month - 1 + MONTHS_AHEAD
+    ahead = date(today.year + months // 12, months % 12 + 1, 1)
+    last = max(last.date(), ahead) if last else ahead
+
+    _drop_old_indexes()
+    op.execute('ALTER TABLE appointment RENAME TO appointment_unpartitioned')
+    op.execute('ALTER TABLE appointment_unpartitioned '
+               'RENAME CONSTRAINT appointment_pkey TO appointment_unpartitioned_pkey')
+    # Sekwencja ID przechodzi na nową tabelę (inaczej zniknęłaby razem ze starą)
+    op.execute('ALTER SEQUENCE appointment_id_seq OWNED BY NONE')
+    op.execute(TABLE.format(name='appointment', constraints='''PRIMARY KEY (id, start_time),
+    FOREIGN KEY (instructor_id) REFERENCES "user" (id),
+    FOREIGN KEY (student_id) REFERENCES "user" (id)''') + ' PARTITION BY RANGE (start_time)')
+    for statement in INDEXES:
+        op.execute(statement)
+
+    for month, following in _months(first, last):
+        name = f'appointment_{month:%Y_%m}'
+        op.execute(f"CREATE TABLE {name} PARTITION OF appointment FOR VALUES FROM ('{month}') TO ('{following}')")
+        op.execute(f'ALTER TABLE {name} ADD CONSTRAINT {name}_no_overlap {NO_OVERLAP}')
+    op.execute('CREATE TABLE appointment_default PARTITION OF appointment DEFAULT')
+    op.execute(f'ALTER TABLE appointment_default ADD CONSTRAINT appointment_default_no_overlap {NO_OVERLAP}')
+
+    op.execute(f'INSERT INTO appointment ({COLUMNS}) SELECT {COLUMNS} FROM appointment_unpartitioned')
+    op.execute('DROP TABLE appointment_unpartitioned')
+    op.execute('ALTER SEQUENCE appointment_id_seq OWNED BY appointment.id')
+
+
+def downgrade():
+    # Terminy z archiwum wracają do zwykłej tabeli appointment
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.drop_index('ix_appointment_archive_instructor_id_start_time', table_name='appointment_archive')
+        op.drop_table('appointment_archive')
+        return
+
+    if _is_partitioned(bind, 'appointment'):
+        op.execute('ALTER TABLE appointment RENAME TO appointment_partitioned')
+        op.execute('ALTER TABLE appointment_partitioned '
+                   'RENAME CONSTRAINT appointment_pkey TO appointment_partitioned_pkey')
+        op.execute('ALTER SEQUENCE appointment_id_seq OWNED BY NONE')
+        for name in ('ix_appointment_instructor_id_start_time', 'ix_appointment_available_start_time',
+                     'ix_appointment_student_id_start_time'):
+            op.execute(f'ALTER INDEX {name} RENAME TO {name}_partitioned')
+        op.execute(TABLE.format(name='appointment', constraints='''PRIMARY KEY (id),
+    FOREIGN KEY (instructor_id) REFERENCES "user" (id),
+    FOREIGN KEY (student_id) REFERENCES "user" (id)'''))
+        op.execute(f'INSERT INTO appointment ({COLUMNS}) SELECT {COLUMNS} FROM appointment_partitioned')
+        op.execute(f'INSERT INTO appointment ({COLUMNS}) SELECT {COLUMNS} FROM appointment_archive')
+        op.execute('DROP TABLE appointment_partitioned')
+        op.execute('ALTER SEQUENCE appointment_id_seq OWNED BY appointment.id')
+        for statement in INDEXES:
+            op.execute(statement)
+        op.execute(f'ALTER TABLE appointment ADD CONSTRAINT appointment_instructor_no_overlap {NO_OVERLAP}')
+
+    op.execute('DROP TABLE IF EXISTS appointment_archive')
@@ -0,0 +1,39 @@
+"""add outbox retry columns
+
+Revision ID: d5f8b2c6a914
+Revises: c9e2a7f4d813
+Create Date: 2026-10-19 09:12:37.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f8b2c6a914'
+down_revision = 'c9e2a7f4d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kolumny mogą już istnieć, gdy tabelę utworzył db.create_all()
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('outbox_message')}
+    if 'next_attempt_at' not in columns:
+        op.add_column('outbox_message', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    if 'dead_at' not in columns:
+        op.add_column('outbox_message', sa.Column('dead_at', sa.DateTime(), nullable=True))
+
+    op.drop_index('ix_outbox_message_pending', table_name='outbox_message', if_exists=True)
+    op.create_index('ix_outbox_message_pending', 'outbox_message', ['id'],
+                    sqlite_where=sa.text('processed_at IS NULL AND dead_at IS NULL'),
+                    postgresql_where=sa.text('processed_at IS NULL AND dead_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_outbox_message_pending', table_name='outbox_message')
+    op.create_index('ix_outbox_message_pending', 'outbox_message', ['id'],
+                    sqlite_where=sa.text('processed_at IS NULL'),
+                    postgresql_where=sa.text('processed_at IS NULL'))
+    op.drop_column('outbox_message', 'dead_at')
+    op.drop_column('outbox_message', 'next_attempt_at')
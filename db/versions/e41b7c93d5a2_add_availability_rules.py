@@ -0,0 +1,53 @@
+"""add availability rules
+
+Revision ID: e41b7c93d5a2
+Revises: 8d2f4a6c1e07
+Create Date: 2026-10-18 17:22:48.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c93d5a2'
+down_revision = '8d2f4a6c1e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'availability_rule',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('instructor_id', sa.Integer(), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.Time(), nullable=False),
+        sa.Column('end_time', sa.Time(), nullable=False),
+        sa.Column('slot_minutes', sa.Integer(), nullable=False),
+        sa.Column('timezone', sa.String(length=64), nullable=False),
+        sa.Column('valid_from', sa.Date(), nullable=False),
+        sa.Column('valid_until', sa.Date(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['instructor_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_availability_rule_instructor_id', 'availability_rule', ['instructor_id'],
+                    if_not_exists=True)
+    op.create_table(
+        'availability_exception',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rule_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['rule_id'], ['availability_rule.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('rule_id', 'day', name='uq_availability_exception_rule_id_day'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('availability_exception')
+    op.drop_index('ix_availability_rule_instructor_id', table_name='availability_rule')
+    op.drop_table('availability_rule')
@@ -0,0 +1,28 @@
+"""add user feed secret
+
+Revision ID: e7a3c1d9b052
+Revises: d5f8b2c6a914
+Create Date: 2026-10-19 10:26:51.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c1d9b052'
+down_revision = 'd5f8b2c6a914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kolumna może już istnieć, gdy tabelę utworzył db.create_all(). Dotychczasowe adresy
+    # kanałów ICS (bez sekretu) przestają działać; nowy adres powstaje przy kolejnym wejściu.
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('user')}
+    if 'feed_secret' not in columns:
+        op.add_column('user', sa.Column('feed_secret', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    op.drop_column('user', 'feed_secret')
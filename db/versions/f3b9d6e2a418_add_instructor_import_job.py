@@ -0,0 +1,40 @@
+"""add instructor import job
+
+Revision ID: f3b9d6e2a418
+Revises: e7a3c1d9b052
+Create Date: 2026-10-19 14:12:37.402816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d6e2a418'
+down_revision = 'e7a3c1d9b052'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'instructor_import_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('created', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('errors', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('instructor_import_job')
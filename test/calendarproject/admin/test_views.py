@@ -1,13 +1,18 @@
+import io
 import pytest
 import json
-from datetime import datetime
+from datetime import date, datetime, time, timezone
 import pytz
 from flask import url_for
 from flask_login import login_user
 from calendarproject.models.user import User
 from calendarproject.models.appointment import Appointment
+from calendarproject.models.availability_rule import AvailabilityRule
 from calendarproject.models.notification import Notification
 from calendarproject.extensions import db
+from calendarproject import tasks
+from calendarproject.utils import availability_rules, instructor_deletion, instructor_import, slot_search, utilization
+from calendarproject.utils.outbox import relay
 
 class TestAdminViews:
     """Test suite for the admin dashboard and functionality."""
@@ -156,7 +161,14 @@ class TestAdminViews:
         instructor = User.query.filter_by(username='attempted').first()
         assert instructor is None
 
-    def test_delete_instructor_success(self, client, db, admin_user, instructor_user):
+    @pytest.fixture
+    def queued(self, monkeypatch):
+        """Record deletion jobs sent to Celery instead of queueing them."""
+        job_ids = []
+        monkeypatch.setattr(tasks.delete_instructor, 'delay', job_ids.append)
+        return job_ids
+
+    def test_delete_instructor_success(self, client, db, admin_user, instructor_user, queued):
         """Test successful instructor deletion by admin."""
         self.login(client, 'adminuser', 'adminpassword')
 
@@ -179,20 +191,28 @@ class TestAdminViews:
         # Delete instructor
         response = client.post(f'/admin/delete_instructor/{instructor_id}')
 
-        # Check the response
-        assert response.status_code == 200
+        # The request only schedules the job
+        assert response.status_code == 202
         response_data = json.loads(response.data)
         assert response_data['status'] == 'success'
+        assert queued == [response_data['job']['id']]
+        assert response_data['job']['status'] == 'pending'
 
         # Verify instructor was soft deleted
         instructor = User.query.get(instructor_id)
         assert instructor.deleted is True
 
+        instructor_deletion.run(queued[0])
+
         # Verify appointments were deleted
         appointments = Appointment.query.filter_by(instructor_id=instructor_id).all()
         assert len(appointments) == 0
 
-    def test_delete_instructor_not_admin(self, client, db, regular_user, instructor_user):
+        job = client.get(response_data['status_url']).get_json()['job']
+        assert job['status'] == 'done'
+        assert job['deleted_appointments'] == 1
+
+    def test_delete_instructor_not_admin(self, client, db, regular_user, instructor_user, queued):
         """Test that non-admin users cannot delete instructors."""
         # Ensure DB is clean after previous test failures
         db.session.rollback()
@@ -212,8 +232,9 @@ class TestAdminViews:
         # Verify instructor was not deleted
         instructor = User.query.get(instructor_id)
         assert instructor.deleted is False
+        assert queued == []
 
-    def test_delete_instructor_notifications(self, client, db, admin_user, instructor_user):
+    def test_delete_instructor_notifications(self, client, db, admin_user, instructor_user, queued):
         """Test that notifications are created when an instructor with booked appointments is deleted."""
         # Ensure DB is clean after previous test failures
         db.session.rollback()
@@ -251,13 +272,211 @@ class TestAdminViews:
         instructor_id = instructor_user.id
         response = client.post(f'/admin/delete_instructor/{instructor_id}')
 
-        assert response.status_code == 200
-        response_data = json.loads(response.data)
-        assert response_data['status'] == 'success'
-        assert response_data['notified_students'] == 1
+        assert response.status_code == 202
+        job = instructor_deletion.run(queued[0])
+        assert job.notified_students == 1
+        relay()
 
         # Verify notification was created
         notification = Notification.query.filter_by(user_id=student.id).first()
         assert notification is not None
         assert notification.type == 'instructor_deleted'
-        assert 'zostało usunięte' in notification.message or 'zostalo usuniete' in notification.message.lower()
\ No newline at end of file
+        assert 'zostało usunięte' in notification.message or 'zostalo usuniete' in notification.message.lower()
+
+    def test_delete_instructor_in_chunks(self, client, db, admin_user, instructor_user, queued):
+        """Test that the deletion job works in chunks and notifies each student once."""
+        students = []
+        for index in range(2):
+            student = User(username=f'student{index}', email=f'student{index}@example.com',
+                           first_name='Student', last_name=str(index))
+            student.set_password('password')
+            students.append(student)
+        db.session.add_all(students)
+        db.session.commit()
+        db.session.add_all([
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 1, 7, hour),
+                        end_time=datetime(2030, 1, 7, hour + 1), is_available=student is None,
+                        student_id=student.id if student else None)
+            for hour, student in zip(range(8, 13), [students[0], None, students[1], students[0], None])
+        ])
+        db.session.commit()
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.post(f'/admin/delete_instructor/{instructor_user.id}')
+        assert response.status_code == 202
+        # A second request returns the job already in progress
+        again = client.post(f'/admin/delete_instructor/{instructor_user.id}')
+        assert again.get_json()['job']['id'] == response.get_json()['job']['id']
+        assert len(queued) == 1
+
+        job = instructor_deletion.run(queued[0], chunk_size=2)
+        assert job.status == 'done'
+        assert job.deleted_appointments == 5
+        assert job.notified_students == 2
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 0
+
+        relay()
+        for student in students:
+            assert Notification.query.filter_by(user_id=student.id, type='instructor_deleted').count() == 1
+
+    def test_booking_during_pending_deletion(self, client, db, admin_user, instructor_user, queued):
+        """Test that slots of an instructor whose deletion job is still pending cannot be found or booked."""
+        slot = Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 1, 7, 10),
+                           end_time=datetime(2030, 1, 7, 11), is_available=True)
+        rule = AvailabilityRule(instructor_id=instructor_user.id, weekday=0, start_time=time(12), end_time=time(13),
+                                slot_minutes=60, timezone='UTC', valid_from=date(2030, 1, 1))
+        db.session.add_all([slot, rule])
+        db.session.commit()
+        slot_id, rule_id = slot.id, rule.id
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.post(f'/admin/delete_instructor/{instructor_user.id}')
+        assert response.status_code == 202
+        assert response.get_json()['job']['status'] == 'pending'
+        # The job has not run yet: the slot still exists, the rules are already gone
+        assert db.session.get(Appointment, slot_id) is not None
+        assert db.session.get(AvailabilityRule, rule_id) is None
+
+        now = datetime(2030, 1, 1)
+        assert Appointment.available_slots_query(datetime(2030, 1, 7), datetime(2030, 1, 8)).count() == 0
+        assert slot_search.earliest_free_slots(now, 5) == []
+        assert Appointment.try_book(slot_id, admin_user.id, 'Topic', now) is None
+        start = int(datetime(2030, 1, 7, 12).replace(tzinfo=timezone.utc).timestamp())
+        assert availability_rules.book_occurrence(rule_id, start, admin_user.id, 'Topic', now) is None
+        db.session.rollback()
+        assert db.session.get(Appointment, slot_id).is_available is True
+
+    def test_delete_instructor_queue_unavailable(self, client, db, admin_user, instructor_user, monkeypatch):
+        """Test that the job is marked failed when it cannot be queued."""
+        def unavailable(job_id):
+            raise ConnectionError('broker down')
+        monkeypatch.setattr(tasks.delete_instructor, 'delay', unavailable)
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.post(f'/admin/delete_instructor/{instructor_user.id}')
+        assert response.status_code == 503
+        job_id = response.get_json()['job']['id']
+        assert client.get(f'/admin/deletion_jobs/{job_id}').get_json()['job']['status'] == 'failed'
+
+    def test_instructor_page(self, client, db, admin_user, instructor_user):
+        """Test that the instructor table is paginated by id with aggregated counts."""
+        second = User(username='second', email='second@example.com', first_name='Second',
+                      last_name='Instructor', is_instructor=True)
+        second.set_password('password')
+        db.session.add(second)
+        db.session.add_all([
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 1, 7, 10),
+                        end_time=datetime(2030, 1, 7, 11), is_available=True),
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 1, 7, 11),
+                        end_time=datetime(2030, 1, 7, 12), is_available=False, status='pending',
+                        student_id=admin_user.id),
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 1, 7, 12),
+                        end_time=datetime(2030, 1, 7, 13), is_available=False, status='confirmed',
+                        student_id=admin_user.id),
+        ])
+        db.session.commit()
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.get('/admin/api/instructors?limit=1')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [item['username'] for item in data['items']] == ['instructor']
+        assert data['items'][0]['slots'] == 3
+        assert data['items'][0]['booked'] == 2
+        assert data['items'][0]['pending'] == 1
+        assert data['next'] == {'after_id': instructor_user.id}
+
+        data = client.get(f"/admin/api/instructors?limit=1&after_id={data['next']['after_id']}").get_json()
+        assert [item['username'] for item in data['items']] == ['second']
+        assert data['items'][0]['slots'] == 0
+        assert data['next'] is None
+
+    def test_appointment_page(self, client, db, admin_user, instructor_user):
+        """Test that instructor appointments are paginated by (start_time, id)."""
+        start = datetime(2030, 1, 7, 10)
+        db.session.add_all([
+            Appointment(instructor_id=instructor_user.id, start_time=start.replace(hour=hour),
+                        end_time=start.replace(hour=hour + 1), is_available=True)
+            for hour in (12, 10, 11)
+        ])
+        db.session.commit()
+        self.login(client, 'adminuser', 'adminpassword')
+
+        url = f'/admin/api/instructors/{instructor_user.id}/appointments'
+        data = client.get(f'{url}?limit=2').get_json()
+        assert [item['start'] for item in data['items']] == ['2030-01-07T10:00:00', '2030-01-07T11:00:00']
+        assert data['next']['after'] == '2030-01-07T11:00:00'
+
+        data = client.get(url, query_string={'limit': 2, **data['next']}).get_json()
+        assert [item['start'] for item in data['items']] == ['2030-01-07T12:00:00']
+        assert data['next'] is None
+
+        response = client.get(f'{url}?after=yesterday&after_id=1')
+        assert response.status_code == 400
+
+    def test_dashboard_api_access_denied(self, client, regular_user, instructor_user):
+        """Test that regular users cannot read the dashboard tables."""
+        self.login(client, 'regularuser', 'userpassword')
+        assert client.get('/admin/api/instructors').status_code == 403
+        response = client.get(f'/admin/api/instructors/{instructor_user.id}/appointments')
+        assert response.status_code == 403
+
+    def test_import_instructors(self, client, db, admin_user, regular_user, monkeypatch):
+        """Test that admins can onboard instructors from a CSV file in a background job."""
+        job_ids = []
+        monkeypatch.setattr(tasks.import_instructors, 'delay', job_ids.append)
+        data = ('username,email,first_name,last_name,password\n'
+                'newinstructor,new@example.com,New,Instructor,secret1\n'
+                'regularuser,dup@example.com,Dup,User,secret1\n')
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.post('/admin/import_instructors',
+                               data={'file': (io.BytesIO(data.encode()), 'instructors.csv')},
+                               content_type='multipart/form-data')
+
+        # The request only stores and schedules the job
+        assert response.status_code == 202
+        response_data = response.get_json()
+        assert response_data['status'] == 'success'
+        assert job_ids == [response_data['job']['id']]
+        assert User.query.filter_by(username='newinstructor').count() == 0
+
+        instructor_import.run(job_ids[0], workers=1)
+
+        job = client.get(response_data['status_url']).get_json()['job']
+        assert job['status'] == 'done'
+        assert job['created'] == 1
+        assert job['errors'] == [{'line': 3, 'message': 'Nazwa użytkownika regularuser już istnieje.'}]
+        assert User.query.filter_by(username='newinstructor', is_instructor=True).count() == 1
+
+    def test_import_instructors_access_denied(self, client, regular_user):
+        """Test that regular users cannot import instructors."""
+        self.login(client, 'regularuser', 'userpassword')
+        response = client.post('/admin/import_instructors',
+                               data={'file': (io.BytesIO(b'username\n'), 'instructors.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 403
+
+    def test_utilization_report(self, client, db, admin_user, instructor_user):
+        """Test that the utilization report is served from the rollups."""
+        start = datetime(2030, 1, 7, 10)
+        db.session.add(Appointment(instructor_id=instructor_user.id, start_time=start,
+                                   end_time=datetime(2030, 1, 7, 12), is_available=True))
+        db.session.commit()
+        utilization.mark_all()
+        utilization.refresh()
+        self.login(client, 'adminuser', 'adminpassword')
+
+        response = client.get('/admin/utilization?start=2030-01-01&end=2030-02-01')
+        assert response.status_code == 200
+        entry, = response.get_json()['instructors']
+        assert entry['id'] == instructor_user.id
+        assert entry['offered_hours'] == 2
+        assert entry['utilization'] == 0
+
+        assert client.get('/admin/utilization?start=2030-02-01&end=2030-01-01').status_code == 400
+
+    def test_utilization_report_access_denied(self, client, regular_user):
+        """Test that regular users cannot read the utilization report."""
+        self.login(client, 'regularuser', 'userpassword')
+        assert client.get('/admin/utilization?start=2030-01-01&end=2030-02-01').status_code == 403
@@ -1,11 +1,15 @@
 import pytest
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import pytz
 from calendarproject.models.user import User
 from calendarproject.models.appointment import Appointment
+from calendarproject.models.availability_rule import AvailabilityRule
 from calendarproject.models.notification import Notification
 from calendarproject.extensions import db
+from calendarproject.utils import ics_feeds
+from calendarproject.utils.calendar_cache import invalidate_slots
+from calendarproject.utils.outbox import relay
 
 class TestCalendarViews:
     """Test suite for the calendar views (student functionality)."""
@@ -108,6 +112,205 @@ class TestCalendarViews:
         assert appointment['titleMessage'] == 'Dostępny'
         assert appointment['color'] == '#1B8359'  # Available appointment color
 
+    def test_get_appointments_with_booked_overlay(self, client, db, student_user, instructor_user,
+                                                  available_appointment):
+        """Test that the feed merges cached free slots with the student's own bookings."""
+        self.login(client, 'student', 'password')
+
+        # Termin przechodzący przez granicę tygodni UTC musi pojawić się tylko raz
+        monday = datetime(2030, 1, 7)
+        week_crossing = Appointment(
+            instructor_id=instructor_user.id,
+            start_time=monday - timedelta(hours=1),
+            end_time=monday + timedelta(hours=1),
+            is_available=True
+        )
+        booked = Appointment(
+            instructor_id=instructor_user.id,
+            student_id=student_user.id,
+            start_time=monday + timedelta(hours=3),
+            end_time=monday + timedelta(hours=4),
+            is_available=False,
+            topic='My topic',
+            status='confirmed'
+        )
+        db.session.add_all([week_crossing, booked])
+        db.session.commit()
+
+        response = client.get(
+            f'/calendar/get_appointments?start=2029-12-31T00:00:00&end=2030-01-14T00:00:00'
+            f'&timeZone=UTC&instructor_id={instructor_user.id}'
+        )
+
+        assert response.status_code == 200
+        events = json.loads(response.data)
+        assert [e['id'] for e in events].count(week_crossing.id) == 1
+        booked_event = next(e for e in events if e['id'] == booked.id)
+        assert booked_event['titleMessage'] == 'Temat konsultacji: My topic'
+        assert booked_event['color'] == '#9C27B0'
+        assert all(e['id'] != available_appointment.id for e in events)
+
+    def test_get_appointments_not_modified(self, client, db, fake_redis, statements, student_user,
+                                           instructor_user, available_appointment):
+        """Test that a matching If-None-Match answers 304 without querying appointments."""
+        self.login(client, 'student', 'password')
+        day = datetime.utcnow().date()
+        url = (f'/calendar/get_appointments?start={day}T00:00:00&end={day + timedelta(days=7)}T00:00:00'
+               f'&timeZone=UTC&instructor_id={instructor_user.id}')
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert [e['id'] for e in json.loads(response.data)] == [available_appointment.id]
+        etag = response.headers['ETag']
+
+        statements.clear()
+        response = client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert not [statement for statement in statements if 'FROM appointment' in statement]
+
+        # Zmiana terminów instruktora podbija wersję, więc ten sam ETag jest już nieaktualny
+        Appointment.query.get(available_appointment.id).is_available = False
+        db.session.commit()
+        invalidate_slots(instructor_user.id, available_appointment.start_time, available_appointment.end_time)
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_get_appointments_window_limit(self, client, student_user):
+        """Test that ranges longer than the configured window are rejected."""
+        self.login(client, 'student', 'password')
+
+        response = client.get('/calendar/get_appointments?start=2030-01-01T00:00:00&end=2031-01-01T00:00:00')
+        assert response.status_code == 400
+
+        response = client.get('/calendar/get_appointments?start=2030-01-01T00:00:00&end=2032-01-01T00:00:00&stream=1')
+        assert response.status_code == 400
+
+    def test_get_appointments_streamed(self, client, app, db, student_user, instructor_user):
+        """Test that stream mode returns every event of a long range as one JSON array."""
+        self.login(client, 'student', 'password')
+
+        start = datetime(2030, 1, 7, 8, 0)
+        db.session.execute(Appointment.__table__.insert(), [{
+            'instructor_id': instructor_user.id,
+            'start_time': start + timedelta(days=i),
+            'end_time': start + timedelta(days=i, hours=1),
+            'is_available': True,
+        } for i in range(7)])
+        booked = Appointment(instructor_id=instructor_user.id, student_id=student_user.id,
+                             start_time=start + timedelta(days=200), end_time=start + timedelta(days=200, hours=1),
+                             is_available=False, topic='Topic', status='pending')
+        db.session.add(booked)
+        db.session.commit()
+
+        app.config['CALENDAR_STREAM_CHUNK'] = 3
+        try:
+            response = client.get('/calendar/get_appointments?start=2030-01-01T00:00:00'
+                                  '&end=2030-12-31T00:00:00&stream=1')
+        finally:
+            app.config['CALENDAR_STREAM_CHUNK'] = 500
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        events = json.loads(response.data)
+        assert len(events) == 8
+        assert [e['start'] for e in events[:7]] == [(start + timedelta(days=i)).isoformat() for i in range(7)]
+        assert events[-1]['id'] == booked.id
+
+    def test_ics_feed(self, client, db, student_user, instructor_user):
+        """Test that the tokenized ICS feed is served without a session."""
+        self.login(client, 'student', 'password')
+        url = client.get('/calendar/feed').json['url']
+        client.get('/logout')
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/calendar'
+        assert response.data.startswith(b'BEGIN:VCALENDAR')
+
+        assert client.get('/calendar/feed/invalid.ics').status_code == 404
+
+    def test_ics_feed_regenerate(self, client, db, student_user):
+        """Test that regenerating the feed URL revokes the previous one."""
+        self.login(client, 'student', 'password')
+        old_url = client.get('/calendar/feed').json['url']
+
+        response = client.post('/calendar/feed/regenerate')
+        assert response.status_code == 200
+        new_url = response.json['url']
+        assert new_url != old_url
+        assert client.get('/calendar/feed').json['url'] == new_url
+        client.get('/logout')
+
+        assert client.get(old_url).status_code == 404
+        assert client.get(new_url).status_code == 200
+
+    def test_ics_feed_revalidation(self, client, db, student_user, monkeypatch):
+        """Test that a cached feed answers 304 for both If-None-Match and If-Modified-Since."""
+        self.login(client, 'student', 'password')
+        url = client.get('/calendar/feed').json['url']
+        modified = datetime(2030, 1, 7, 8, 0, tzinfo=pytz.UTC)
+        monkeypatch.setattr(ics_feeds, 'feed_etag', lambda *args: 'v1')
+        monkeypatch.setattr(ics_feeds, 'cached_feed', lambda *args: (b'BEGIN:VCALENDAR', modified))
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.last_modified == modified
+
+        assert client.get(url, headers={'If-None-Match': '"v1"'}).status_code == 304
+        response = client.get(url, headers={'If-Modified-Since': 'Mon, 07 Jan 2030 08:00:00 GMT'})
+        assert response.status_code == 304
+
+    def test_earliest_slots(self, client, db, student_user, instructor_user, available_appointment):
+        """Test the earliest free slots search endpoint and its validation."""
+        self.login(client, 'student', 'password')
+
+        response = client.get(f'/api/slots/earliest?limit=5&instructor_id={instructor_user.id}')
+        assert response.status_code == 200
+        assert [e['id'] for e in response.json] == [available_appointment.id]
+        assert response.json[0]['instructor'] == 'Test Instructor'
+
+        after = (datetime.utcnow() + timedelta(days=2)).isoformat()
+        assert client.get(f'/api/slots/earliest?after={after}').json == []
+        assert client.get('/api/slots/earliest?min_duration=120').json == []
+
+        assert client.get('/api/slots/earliest?limit=0').status_code == 400
+        assert client.get('/api/slots/earliest?after=nope').status_code == 400
+
+    def test_get_availability(self, client, db, student_user, instructor_user):
+        """Test the free/busy masks for a Tuesday 10-12 window."""
+        self.login(client, 'student', 'password')
+
+        tuesday = datetime(2030, 1, 8)
+        db.session.add(Appointment(
+            instructor_id=instructor_user.id,
+            start_time=tuesday + timedelta(hours=9),
+            end_time=tuesday + timedelta(hours=13),
+            is_available=True
+        ))
+        db.session.commit()
+
+        response = client.get('/api/availability?start=2030-01-08T10:00:00&end=2030-01-08T12:00:00&timeZone=UTC')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['cells'] == 8
+        assert data['cell_minutes'] == 15
+        instructor = next(i for i in data['instructors'] if i['id'] == instructor_user.id)
+        assert instructor['free'] == '11111111'
+        assert instructor['free_all'] is True
+
+    def test_get_availability_invalid_window(self, client, student_user):
+        """Test that windows longer than five weeks are rejected."""
+        self.login(client, 'student', 'password')
+
+        response = client.get('/api/availability?start=2030-01-01T00:00:00&end=2030-03-01T00:00:00')
+
+        assert response.status_code == 400
+
     def test_book_appointment_success(self, client, db, student_user, available_appointment):
         """Test successfully booking an appointment."""
         self.login(client, 'student', 'password')
@@ -134,6 +337,9 @@ class TestCalendarViews:
         assert appointment.topic == 'Test consultation topic'
         assert appointment.status == 'pending'
 
+        # Notifications are delivered from the outbox by the relay task
+        relay()
+
         # Verify notification was created
         notification = Notification.query.filter_by(
             user_id=appointment.instructor_id,
@@ -171,7 +377,7 @@ class TestCalendarViews:
             content_type='application/json'
         )
 
-        assert response.status_code == 400
+        assert response.status_code == 409
         response_data = json.loads(response.data)
         assert response_data['status'] == 'error'
         assert 'już zarezerwowany' in response_data['message']
@@ -203,7 +409,7 @@ class TestCalendarViews:
             content_type='application/json'
         )
 
-        assert response.status_code == 400
+        assert response.status_code == 409
         response_data = json.loads(response.data)
         assert response_data['status'] == 'error'
         assert 'mniej niż 30 minut' in response_data['message']
@@ -241,6 +447,9 @@ class TestCalendarViews:
         assert appointment.topic is None
         assert appointment.status == 'available'
 
+        # Notifications are delivered from the outbox by the relay task
+        relay()
+
         # Verify notification was created
         notification = Notification.query.filter_by(
             user_id=instructor_user.id,
@@ -285,7 +494,31 @@ class TestCalendarViews:
         # Try to cancel other student's appointment
         response = client.post(f'/calendar/cancel/{other_appointment.id}')
 
-        assert response.status_code == 403
+        assert response.status_code == 409
         response_data = json.loads(response.data)
         assert response_data['status'] == 'error'
-        assert 'własne terminy' in response_data['message']
\ No newline at end of file
+        assert 'własne terminy' in response_data['message']
+
+    def test_book_availability_rule_slot(self, client, db, student_user, instructor_user):
+        """Test that rule slots are listed without rows and materialized only when booked."""
+        day = (datetime.utcnow() + timedelta(days=3)).date()
+        rule = AvailabilityRule(instructor_id=instructor_user.id, weekday=day.weekday(), start_time=time(10),
+                                end_time=time(11), slot_minutes=30, timezone='UTC', valid_from=day)
+        db.session.add(rule)
+        db.session.commit()
+
+        self.login(client, 'student', 'password')
+        response = client.get(f'/calendar/get_appointments?start={day}T00:00:00&end={day + timedelta(days=1)}T00:00:00')
+        events = json.loads(response.data)
+        assert [event['id'] for event in events][0].startswith(f'rule-{rule.id}-')
+        assert len(events) == 2
+        assert Appointment.query.count() == 0
+
+        booked = client.post(f'/calendar/book/{events[0]["id"]}', json={'topic': 'Rule slot'})
+        again = client.post(f'/calendar/book/{events[0]["id"]}', json={'topic': 'Rule slot'})
+
+        assert booked.status_code == 200
+        assert again.status_code == 409
+        appointment = Appointment.query.one()
+        assert appointment.student_id == student_user.id
+        assert appointment.topic == 'Rule slot'
@@ -1,3 +1,4 @@
+import io
 import pytest
 import json
 from datetime import datetime, timedelta
@@ -6,6 +7,8 @@ from calendarproject.models.user import User
 from calendarproject.models.appointment import Appointment
 from calendarproject.models.notification import Notification
 from calendarproject.extensions import db
+from calendarproject.utils.calendar_cache import invalidate_slots, refresh_pending
+from calendarproject.utils.outbox import relay
 from flask_login import current_user
 
 class TestInstructorViews:
@@ -118,6 +121,68 @@ class TestInstructorViews:
         # Check instructor data is in the response
         assert len(instructors) > 0
         assert any(i['id'] == instructor_user.id for i in instructors)
+        listed = next(i for i in instructors if i['id'] == instructor_user.id)
+        assert {'next_free_slot', 'free_7d', 'free_30d'} <= set(listed)
+
+    def test_get_instructors_not_modified(self, client, db, fake_redis, statements, instructor_user, student_user,
+                                          available_appointment):
+        """Test that the directory is served from Redis with an ETag and revalidates without queries."""
+        self.login(client, 'student', 'password')
+
+        response = client.get('/api/instructors')
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'private, max-age=60'
+        assert next(i for i in response.json if i['id'] == instructor_user.id)['free_7d'] == 1
+        etag = response.headers['ETag']
+
+        statements.clear()
+        response = client.get('/api/instructors', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert not [statement for statement in statements if 'FROM appointment' in statement]
+
+        # Nowy termin trafia do katalogu po przeliczeniu w tle, co zmienia jego wersję
+        start = available_appointment.start_time + timedelta(days=1)
+        db.session.add(Appointment(instructor_id=instructor_user.id, start_time=start,
+                                   end_time=start + timedelta(hours=1), is_available=True))
+        db.session.commit()
+        invalidate_slots(instructor_user.id, start, start + timedelta(hours=1))
+        refresh_pending()
+
+        response = client.get('/api/instructors', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert next(i for i in response.json if i['id'] == instructor_user.id)['free_7d'] == 2
+
+    def test_add_recurring_appointments(self, client, db, instructor_user):
+        """Test creating a recurring plan, rejecting collisions and skipping them on request."""
+        self.login(client, 'instructor', 'password')
+        monday = (datetime.utcnow() + timedelta(days=7 - datetime.utcnow().weekday() + 7)).date()
+        plan = {
+            'start_date': monday.isoformat(),
+            'end_date': (monday + timedelta(days=13)).isoformat(),
+            'slot_minutes': 60,
+            'pattern': [{'weekday': 0, 'start': '08:00', 'end': '10:00'}],
+        }
+
+        response = client.post('/instructor/add_recurring_appointments', data=json.dumps(plan))
+        assert response.status_code == 201
+        assert response.json['created'] == 4
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 4
+
+        plan['slot_minutes'] = 30
+        response = client.post('/instructor/add_recurring_appointments', data=json.dumps(plan))
+        assert response.status_code == 409
+        assert len(response.json['conflicts']) == 8
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 4
+
+        plan['pattern'][0]['end'] = '11:00'
+        plan['skip_conflicts'] = True
+        response = client.post('/instructor/add_recurring_appointments', data=json.dumps(plan))
+        assert response.status_code == 201
+        assert response.json == {'status': 'success', 'created': 4, 'skipped': 8}
+
+        plan['slot_minutes'] = 1
+        response = client.post('/instructor/add_recurring_appointments', data=json.dumps(plan))
+        assert response.status_code == 400
 
     def test_instructor_calendar_access(self, client, instructor_user, student_user):
         """Test that only instructors can access the instructor calendar."""
@@ -200,6 +265,24 @@ class TestInstructorViews:
         expected_time = datetime.fromisoformat(start_time.replace('Z', '+00:00')).strftime('%Y-%m-%dT%H:%M:%S')
         assert created_time == expected_time
 
+    def test_add_appointment_overlap(self, client, instructor_user, available_appointment):
+        """Test that overlapping slots and full days with existing slots are rejected."""
+        self.login(client, 'instructor', 'password')
+        start = available_appointment.start_time.replace(tzinfo=pytz.UTC)
+
+        for slot_start, slot_end in (
+            (start + timedelta(minutes=30), start + timedelta(hours=2)),
+            (start.replace(hour=0, minute=0, second=0, microsecond=0),
+             start.replace(hour=23, minute=59, second=59, microsecond=0)),
+        ):
+            response = client.post('/instructor/add_appointment', content_type='application/json',
+                                   data=json.dumps({'start': slot_start.isoformat(), 'end': slot_end.isoformat()}))
+            assert response.status_code == 409
+
+        response = client.post('/instructor/add_appointment', content_type='application/json', data=json.dumps({
+            'start': (start + timedelta(days=1)).isoformat(), 'end': (start + timedelta(days=3)).isoformat()}))
+        assert response.status_code == 400
+
     def test_add_appointment_invalid_time(self, client, instructor_user):
         """Test adding appointment with invalid time (too soon)."""
         self.login(client, 'instructor', 'password')
@@ -283,6 +366,9 @@ class TestInstructorViews:
         appointment = Appointment.query.get(pending_appointment.id)
         assert appointment.status == 'confirmed'
 
+        # Notifications are delivered from the outbox by the relay task
+        relay()
+
         # Verify notification was created
         notification = Notification.query.filter_by(
             user_id=pending_appointment.student_id,
@@ -292,6 +378,18 @@ class TestInstructorViews:
         assert notification.type == 'appointment'
         assert 'zaakceptowana' in notification.message
 
+    def test_confirm_appointment_twice(self, client, instructor_user, pending_appointment):
+        """Test that a second confirmation of the same appointment loses with 409."""
+        self.login(client, 'instructor', 'password')
+
+        first = client.post(f'/instructor/confirm_appointment/{pending_appointment.id}')
+        second = client.post(f'/instructor/confirm_appointment/{pending_appointment.id}')
+
+        assert first.status_code == 200
+        assert second.status_code == 409
+        relay()
+        assert Notification.query.filter_by(related_id=pending_appointment.id).count() == 1
+
     def test_reject_appointment(self, client, instructor_user, pending_appointment):
         """Test rejecting a pending appointment."""
         self.login(client, 'instructor', 'password')
@@ -309,6 +407,9 @@ class TestInstructorViews:
         assert appointment.student_id is None
         assert appointment.topic is None
 
+        # Notifications are delivered from the outbox by the relay task
+        relay()
+
         # Verify notification was created
         notification = Notification.query.filter_by(
             type='appointment',
@@ -352,10 +453,123 @@ class TestInstructorViews:
         assert appointment.student_id is None
         assert appointment.topic is None
 
+        # Notifications are delivered from the outbox by the relay task
+        relay()
+
         # Verify notification was created
         notification = Notification.query.filter_by(
             user_id=student_user.id,
             related_id=confirmed_appointment.id
         ).first()
         assert notification is not None
-        assert 'anulowana' in notification.message
\ No newline at end of file
+        assert 'anulowana' in notification.message
+
+    def test_batch_actions(self, client, db, instructor_user, student_user, available_appointment, pending_appointment):
+        """Test that a batch applies mixed actions in one request and reports each item."""
+        start_time = datetime.now(pytz.UTC) + timedelta(days=3)
+        confirmed = Appointment(
+            instructor_id=instructor_user.id,
+            student_id=student_user.id,
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            is_available=False,
+            topic='Confirmed appointment',
+            status='confirmed'
+        )
+        db.session.add(confirmed)
+        db.session.commit()
+        available_id, pending_id, confirmed_id = available_appointment.id, pending_appointment.id, confirmed.id
+
+        self.login(client, 'instructor', 'password')
+        response = client.post('/instructor/batch', json={'actions': [
+            {'action': 'delete', 'id': available_id},
+            {'action': 'confirm', 'id': pending_id},
+            {'action': 'cancel', 'id': confirmed_id},
+            {'action': 'reject', 'id': 999999},
+        ]})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['succeeded'] == 3
+        assert data['failed'] == 1
+        assert [result['id'] for result in data['results']] == [available_id, pending_id, confirmed_id, 999999]
+        assert data['results'][3]['status'] == 'error'
+
+        db.session.expire_all()
+        assert db.session.get(Appointment, available_id) is None
+        assert db.session.get(Appointment, pending_id).status == 'confirmed'
+        cancelled = db.session.get(Appointment, confirmed_id)
+        assert cancelled.is_available is True
+        assert cancelled.student_id is None
+
+        relay()
+        messages = {n.related_id: n.message for n in Notification.query.filter_by(user_id=student_user.id)}
+        assert 'zaakceptowana' in messages[pending_id]
+        assert 'anulowana' in messages[confirmed_id]
+
+    def test_batch_actions_invalid(self, client, instructor_user, student_user, available_appointment):
+        """Test that malformed or duplicated actions are rejected without changes."""
+        self.login(client, 'instructor', 'password')
+
+        unknown = client.post('/instructor/batch', json={'actions': [{'action': 'move', 'id': available_appointment.id}]})
+        duplicate = client.post('/instructor/batch', json={'actions': [
+            {'action': 'delete', 'id': available_appointment.id},
+            {'action': 'delete', 'id': available_appointment.id},
+        ]})
+
+        assert unknown.status_code == 400
+        assert duplicate.status_code == 400
+        assert db.session.get(Appointment, available_appointment.id) is not None
+
+        client.get('/logout')
+        self.login(client, 'student', 'password')
+        assert client.post('/instructor/batch', json={'actions': []}).status_code == 403
+
+    def test_stats(self, client, instructor_user, student_user, available_appointment, pending_appointment):
+        """Test the instructor stats endpoint and its validation."""
+        start = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+        end = (datetime.utcnow() + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S')
+
+        self.login(client, 'instructor', 'password')
+        response = client.get(f'/instructor/stats?start={start}&end={end}')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['counts'] == {'available': 1, 'pending': 1, 'confirmed': 0, 'rejected': 0}
+        assert data['booked_hours'] == 1.0
+        assert client.get(f'/instructor/stats?start={end}&end={start}').status_code == 400
+
+        client.get('/logout')
+        self.login(client, 'student', 'password')
+        assert client.get(f'/instructor/stats?start={start}&end={end}').status_code == 403
+
+    def test_import_appointments(self, client, instructor_user):
+        """Test the streamed CSV import endpoint and the CLI command."""
+        day = (datetime.utcnow() + timedelta(days=5)).strftime('%Y-%m-%d')
+        csv_data = f'start,end\n{day}T10:00,{day}T11:00\n{day}T10:30,{day}T11:30\n'.encode()
+
+        self.login(client, 'instructor', 'password')
+        response = client.post('/instructor/import_appointments', data={
+            'file': (io.BytesIO(csv_data), 'slots.csv'),
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        reports = [json.loads(line) for line in response.data.splitlines()]
+        assert reports[-1] == {'status': 'success', 'processed': 2, 'created': 1, 'failed': 1}
+        assert reports[0]['errors'][0]['line'] == 3
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 1
+
+    def test_import_appointments_cli(self, app, tmp_path, instructor_user):
+        """Test that the import CLI command reports progress and errors."""
+        day = (datetime.utcnow() + timedelta(days=5)).strftime('%Y%m%d')
+        path = tmp_path / 'slots.ics'
+        path.write_text('BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\n'
+                        f'DTSTART:{day}T100000Z\r\nDTEND:{day}T110000Z\r\n'
+                        'END:VEVENT\r\nEND:VCALENDAR\r\n')
+
+        result = app.test_cli_runner().invoke(args=['import-appointments', str(path),
+                                                    '--instructor', str(instructor_user.id)])
+
+        assert result.exit_code == 0, result.output
+        assert 'zapisano 1' in result.output
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 1
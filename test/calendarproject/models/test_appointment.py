@@ -0,0 +1,273 @@
+import pytest
+import threading
+from datetime import datetime, timedelta
+from calendarproject.app import create_app
+from calendarproject.extensions import db as _db
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+
+
+class TestAppointmentQueries:
+    """Test suite for the calendar feed queries on the Appointment model."""
+
+    @pytest.fixture
+    def instructor_user(self, db):
+        """Create an instructor user for testing."""
+        instructor = User(
+            username='instructor',
+            email='instructor@example.com',
+            first_name='Test',
+            last_name='Instructor',
+            is_instructor=True
+        )
+        instructor.set_password('password')
+        db.session.add(instructor)
+        db.session.commit()
+        return instructor
+
+    def explain(self, db, query):
+        """Helper returning the SQLite query plan of a query as a single string."""
+        compiled = query.statement.compile(db.engine)
+        params = compiled.construct_params()
+        values = tuple(params[name] for name in compiled.positiontup)
+        with db.engine.connect() as connection:
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), values).all()
+        return ' '.join(row[-1] for row in rows)
+
+    def test_available_slots_for_instructor_use_instructor_index(self, db):
+        """Test that the student feed filtered by instructor uses the (instructor_id, start_time) index."""
+        start = datetime(2024, 10, 7)
+        query = Appointment.available_slots_query(start, start + timedelta(days=7), instructor_id=2)
+
+        plan = self.explain(db, query)
+
+        assert 'USING INDEX ix_appointment_instructor_id_start_time' in plan
+        assert 'SCAN appointment' not in plan
+
+    def test_available_slots_for_all_instructors_use_partial_index(self, db):
+        """Test that the student feed without instructor uses the partial index on available slots."""
+        start = datetime(2024, 10, 7)
+        query = Appointment.available_slots_query(start, start + timedelta(days=7))
+
+        plan = self.explain(db, query)
+
+        assert 'USING INDEX ix_appointment_available_start_time' in plan
+        assert 'SCAN appointment' not in plan
+
+    def test_student_bookings_use_student_index(self, db):
+        """Test that the booked overlay of the student feed uses the (student_id, start_time) index."""
+        start = datetime(2024, 10, 7)
+        query = Appointment.student_bookings_query(1, start, start + timedelta(days=7))
+
+        plan = self.explain(db, query)
+
+        assert 'USING INDEX ix_appointment_student_id_start_time' in plan
+        assert 'SCAN appointment' not in plan
+
+    def test_instructor_feed_uses_instructor_index(self, db):
+        """Test that the instructor feed uses the (instructor_id, start_time) index."""
+        start = datetime(2024, 10, 7)
+        query = Appointment.instructor_feed_query(2, start, start + timedelta(days=7))
+
+        plan = self.explain(db, query)
+
+        assert 'USING INDEX ix_appointment_instructor_id_start_time' in plan
+        assert 'SCAN appointment' not in plan
+
+    def test_instructor_feed_overlap_semantics(self, db, instructor_user):
+        """Test that appointments overlapping the range boundaries are returned, touching ones are not."""
+        window_start = datetime(2030, 1, 7, 8, 0)
+        window_end = datetime(2030, 1, 7, 16, 0)
+        slots = {
+            'crosses_start': (window_start - timedelta(minutes=30), window_start + timedelta(minutes=30)),
+            'inside': (window_start + timedelta(hours=2), window_start + timedelta(hours=3)),
+            'crosses_end': (window_end - timedelta(minutes=30), window_end + timedelta(minutes=30)),
+            'ends_at_start': (window_start - timedelta(hours=1), window_start),
+            'starts_at_end': (window_end, window_end + timedelta(hours=1)),
+        }
+        ids = {}
+        for name, (start_time, end_time) in slots.items():
+            appointment = Appointment(
+                instructor_id=instructor_user.id,
+                start_time=start_time,
+                end_time=end_time,
+                is_available=True
+            )
+            db.session.add(appointment)
+            db.session.flush()
+            ids[appointment.id] = name
+        db.session.commit()
+
+        found = Appointment.instructor_feed_query(instructor_user.id, window_start, window_end).all()
+
+        assert sorted(ids[appointment.id] for appointment in found) == ['crosses_end', 'crosses_start', 'inside']
+
+
+    def test_instructor_feed_reads_single_table(self, db):
+        """Test that the instructor feed columns come from the appointment table alone."""
+        start = datetime(2024, 10, 7)
+        query = Appointment.instructor_feed_query(2, start, start + timedelta(days=7)).with_entities(
+            Appointment.id, Appointment.student_name)
+
+        plan = self.explain(db, query)
+
+        assert 'user' not in plan
+        assert 'ix_appointment_instructor_id_start_time' in plan
+
+    def test_conflict_check_is_bounded_index_range(self, db):
+        """Test that the overlap check seeks a bounded start_time range on the instructor index."""
+        start = datetime(2030, 1, 7, 10, 0)
+        query = db.session.query(Appointment.id).filter(
+            Appointment.instructor_id == 2, Appointment.overlapping(start, start + timedelta(hours=1)))
+
+        plan = self.explain(db, query)
+
+        assert 'ix_appointment_instructor_id_start_time (instructor_id=? AND start_time>? AND start_time<?)' in plan
+
+    def test_try_add_rejects_overlaps(self, db, instructor_user):
+        """Test that try_add refuses overlapping slots but accepts touching ones and other instructors."""
+        day = datetime(2030, 1, 7)
+        assert Appointment.try_add(instructor_user.id, day.replace(hour=10), day.replace(hour=11)) is not None
+
+        assert Appointment.try_add(instructor_user.id, day.replace(hour=10, minute=30), day.replace(hour=12)) is None
+        assert Appointment.try_add(instructor_user.id, day.replace(hour=9), day.replace(hour=10, minute=1)) is None
+        assert Appointment.try_add(instructor_user.id, day, day.replace(hour=23, minute=59, second=59)) is None
+        assert Appointment.try_add(instructor_user.id, day.replace(hour=11), day.replace(hour=12)) is not None
+        assert Appointment.try_add(instructor_user.id + 1, day.replace(hour=10), day.replace(hour=11)) is not None
+        db.session.commit()
+
+        assert Appointment.query.filter_by(instructor_id=instructor_user.id).count() == 2
+
+
+class TestAppointmentTransitions:
+    """Test suite for the atomic appointment state transitions."""
+
+    STUDENTS = 8
+    SLOTS = 5
+
+    @pytest.fixture
+    def stress_app(self, tmp_path):
+        """Create an app on a file-based SQLite database so each thread gets its own connection."""
+        app = create_app(settings_override={
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'stress.db'}",
+        })
+        yield app
+        with app.app_context():
+            _db.engine.dispose()
+
+    def test_concurrent_booking_has_no_double_bookings(self, stress_app):
+        """Test that students racing for the same slots book each slot exactly once."""
+        with stress_app.app_context():
+            instructor = User(username='instructor', email='instructor@example.com', password_hash='-',
+                              first_name='Test', last_name='Instructor', is_instructor=True)
+            students = [User(username=f'student{i}', email=f'student{i}@example.com', password_hash='-',
+                             first_name='Student', last_name=str(i)) for i in range(self.STUDENTS)]
+            _db.session.add_all([instructor] + students)
+            _db.session.flush()
+            start = datetime.utcnow() + timedelta(days=1)
+            slots = [Appointment(instructor_id=instructor.id, start_time=start + timedelta(hours=i),
+                                 end_time=start + timedelta(hours=i, minutes=45), is_available=True)
+                     for i in range(self.SLOTS)]
+            _db.session.add_all(slots)
+            _db.session.commit()
+            slot_ids = [slot.id for slot in slots]
+            student_ids = [student.id for student in students]
+
+        barrier = threading.Barrier(self.STUDENTS)
+        wins = []
+        errors = []
+
+        def race(student_id):
+            with stress_app.app_context():
+                barrier.wait()
+                for slot_id in slot_ids:
+                    try:
+                        booked = Appointment.try_book(slot_id, student_id, 'Race', datetime.utcnow())
+                        _db.session.commit()
+                        if booked is not None:
+                            wins.append((slot_id, student_id))
+                    except Exception as e:
+                        _db.session.rollback()
+                        errors.append(e)
+
+        threads = [threading.Thread(target=race, args=(student_id,)) for student_id in student_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert sorted(slot_id for slot_id, _ in wins) == sorted(slot_ids)
+        with stress_app.app_context():
+            booked = {appointment.id: appointment.student_id for appointment in Appointment.query.all()}
+            for slot_id, student_id in wins:
+                assert booked[slot_id] == student_id
+
+    def test_try_book_respects_lead_time(self, db):
+        """Test that slots starting within 30 minutes cannot be booked."""
+        instructor = User(username='instructor', email='instructor@example.com', password_hash='-',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        db.session.add(instructor)
+        db.session.commit()
+        now = datetime.utcnow()
+        soon = Appointment(instructor_id=instructor.id, start_time=now + timedelta(minutes=20),
+                           end_time=now + timedelta(minutes=80), is_available=True)
+        db.session.add(soon)
+        db.session.commit()
+
+        assert Appointment.try_book(soon.id, instructor.id, 'Topic', now) is None
+        db.session.rollback()
+
+    def test_release_many_returns_previous_students(self, db):
+        """Test that release_many frees only matching rows and reports the students they had."""
+        instructor = User(username='instructor', email='instructor@example.com', password_hash='-',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com', password_hash='-',
+                       first_name='Test', last_name='Student')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        start = datetime.utcnow() + timedelta(days=1)
+        pending = Appointment(instructor_id=instructor.id, student_id=student.id, start_time=start,
+                              end_time=start + timedelta(hours=1), is_available=False, status='pending')
+        confirmed = Appointment(instructor_id=instructor.id, student_id=student.id, start_time=start + timedelta(hours=2),
+                                end_time=start + timedelta(hours=3), is_available=False, status='confirmed')
+        db.session.add_all([pending, confirmed])
+        db.session.commit()
+
+        released = Appointment.release_many([pending.id, confirmed.id], instructor.id, 'pending', 'rejected')
+        db.session.commit()
+
+        assert [(row.id, row.student_id) for row in released] == [(pending.id, student.id)]
+        db.session.expire_all()
+        assert db.session.get(Appointment, pending.id).student_id is None
+        assert db.session.get(Appointment, confirmed.id).status == 'confirmed'
+
+    def test_student_name_snapshot(self, db):
+        """Test that booking copies the student's name, cancelling clears it and renames propagate."""
+        instructor = User(username='instructor', email='instructor@example.com', password_hash='-',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com', password_hash='-',
+                       first_name='Anna', last_name='Nowak')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        now = datetime.utcnow()
+        slot = Appointment(instructor_id=instructor.id, start_time=now + timedelta(days=1),
+                           end_time=now + timedelta(days=1, hours=1), is_available=True)
+        db.session.add(slot)
+        db.session.commit()
+
+        assert Appointment.try_book(slot.id, student.id, 'Topic', now) is not None
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Appointment, slot.id).student_name == 'Anna Nowak'
+
+        student.last_name = 'Kowalska'
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Appointment, slot.id).student_name == 'Anna Kowalska'
+
+        assert Appointment.try_cancel(slot.id, student.id, now) is not None
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Appointment, slot.id).student_name is None
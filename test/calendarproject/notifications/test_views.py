@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import pytz
 from calendarproject.models.user import User
 from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment_archive import ArchivedAppointment
 from calendarproject.models.notification import Notification
 from calendarproject.extensions import db
 
@@ -123,6 +124,28 @@ class TestNotificationViews:
         assert 'status' in appointment_data['extendedProps']
         assert appointment_data['extendedProps']['status'] == 'confirmed'
 
+    def test_get_notification_details_archived(self, client, db, instructor_user, student_user):
+        """Test that details of an appointment moved to the archive are still returned, read-only."""
+        start_time = datetime(2029, 1, 8, 10)
+        db.session.add(ArchivedAppointment(id=1000, instructor_id=instructor_user.id, student_id=student_user.id,
+                                           start_time=start_time, end_time=start_time + timedelta(hours=1),
+                                           is_available=False, topic='Old topic', status='pending',
+                                           student_name='Student User'))
+        notification = Notification(user_id=instructor_user.id, message='Old booking', type='appointment',
+                                    related_id=1000, is_read=False)
+        db.session.add(notification)
+        db.session.commit()
+        self.login(client, 'instructor', 'password')
+
+        response = client.get(f'/api/notifications/{notification.id}/details')
+
+        assert response.status_code == 200
+        appointment_data = json.loads(response.data)['appointment']
+        assert appointment_data['id'] == 1000
+        assert 'Old topic' in appointment_data['title']
+        assert appointment_data['extendedProps']['student'] == 'Student User'
+        assert 'can_accept' not in appointment_data['extendedProps']
+
     def test_get_notification_details_unauthorized(self, client, db, student_user, instructor_user, notification):
         """Test that users cannot access other users' notification details."""
         # Create another user
@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils import availability
+from calendarproject.utils.calendar_cache import invalidate_slots
+
+
+class TestAvailability:
+    """Test suite for the free/busy bitmap engine."""
+
+    @pytest.fixture
+    def instructors(self, db):
+        """Create two instructors for testing."""
+        users = [
+            User(username=f'instructor{i}', email=f'instructor{i}@example.com',
+                 first_name='Test', last_name=f'Instructor{i}', is_instructor=True)
+            for i in range(2)
+        ]
+        for user in users:
+            user.set_password('password')
+        db.session.add_all(users)
+        db.session.commit()
+        return users
+
+    def test_build_masks_rounds_to_cells(self):
+        """Test that slots cover every 15-minute cell they touch and are clipped to the week."""
+        week = datetime(2030, 1, 7)
+        rows = [
+            (week + timedelta(minutes=20), week + timedelta(minutes=50), True),
+            (week - timedelta(hours=1), week + timedelta(minutes=15), False),
+        ]
+
+        free, busy = availability.build_masks(rows, week)
+
+        assert availability.to_bits(free, 5) == '01110'
+        assert availability.to_bits(busy, 5) == '10000'
+
+    def test_window_masks_across_week_boundary(self, db, instructors):
+        """Test that a window spanning two weeks joins both weeks' masks."""
+        first, second = instructors
+        monday = datetime(2030, 1, 7)
+        db.session.add_all([
+            Appointment(instructor_id=first.id, start_time=monday - timedelta(minutes=30),
+                        end_time=monday + timedelta(minutes=30), is_available=True),
+            Appointment(instructor_id=second.id, start_time=monday,
+                        end_time=monday + timedelta(minutes=15), is_available=False),
+        ])
+        db.session.commit()
+
+        start, cells, masks = availability.window_masks(
+            [first.id, second.id], monday - timedelta(hours=1), monday + timedelta(hours=1))
+
+        assert start == monday - timedelta(hours=1)
+        assert cells == 8
+        assert availability.to_bits(masks[first.id][0], cells) == '00111100'
+        assert masks[first.id][1] == 0
+        assert masks[second.id][0] == 0
+        assert availability.to_bits(masks[second.id][1], cells) == '00001000'
+
+    def test_stale_masks_are_not_stored(self, db, fake_redis, instructors, monkeypatch):
+        """Test that masks loaded before a concurrent change are not written back for that instructor."""
+        first, second = instructors
+        monday = datetime(2030, 1, 7)
+        slot = Appointment(instructor_id=first.id, start_time=monday, end_time=monday + timedelta(hours=1),
+                           is_available=True)
+        db.session.add(slot)
+        db.session.commit()
+        load_from_db = availability._load_from_db
+
+        def load_then_change(instructor_ids, week):
+            loaded = load_from_db(instructor_ids, week)
+            # Rezerwacja zatwierdzona i unieważniona w trakcie ładowania masek
+            slot.is_available = False
+            db.session.commit()
+            invalidate_slots(first.id, slot.start_time, slot.end_time)
+            return loaded
+        monkeypatch.setattr(availability, '_load_from_db', load_then_change)
+
+        masks = availability.week_masks([first.id, second.id], monday)
+
+        assert masks[first.id][0] != 0
+        key = availability.week_key(monday)
+        assert fake_redis.hget(key, first.id) is None
+        assert fake_redis.hget(key, second.id) is not None
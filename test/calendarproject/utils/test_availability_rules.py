@@ -0,0 +1,123 @@
+import pytest
+from datetime import date, datetime, time, timedelta, timezone
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.availability_rule import AvailabilityException, AvailabilityRule
+from calendarproject.utils import availability, ics_feeds, instructor_directory, instructor_stats, slot_search
+from calendarproject.utils.availability_rules import (book_occurrence, event_id, free_occurrences, occurrences,
+                                                      parse_rules)
+from calendarproject.utils.calendar_feeds import instructor_events
+from calendarproject.utils.recurring import PlanError
+
+
+class TestAvailabilityRules:
+    """Test suite for lazily expanded weekly availability rules."""
+
+    @pytest.fixture
+    def instructor(self, db):
+        """Create an instructor and a student."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com', first_name='Test', last_name='Student')
+        for user in (instructor, student):
+            user.set_password('password')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        return instructor, student
+
+    @pytest.fixture
+    def rule(self, db, instructor):
+        """Mondays 10:00-12:00 Warsaw time in 1-hour slots, except one Monday."""
+        rule = AvailabilityRule(instructor_id=instructor[0].id, weekday=0, start_time=time(10), end_time=time(12),
+                                slot_minutes=60, timezone='Europe/Warsaw', valid_from=date(2030, 1, 1),
+                                exceptions=[AvailabilityException(day=date(2030, 1, 14))])
+        db.session.add(rule)
+        db.session.commit()
+        return rule
+
+    def test_occurrences_follow_local_time_and_exceptions(self, rule):
+        """Test that slots keep local hours across DST and skip exception days."""
+        january = occurrences(rule, datetime(2030, 1, 7), datetime(2030, 1, 21))
+        april = occurrences(rule, datetime(2030, 4, 1), datetime(2030, 4, 2))
+
+        assert january == [(datetime(2030, 1, 7, 9), datetime(2030, 1, 7, 10)),
+                           (datetime(2030, 1, 7, 10), datetime(2030, 1, 7, 11))]
+        assert april[0] == (datetime(2030, 4, 1, 8), datetime(2030, 4, 1, 9))
+        assert occurrences(rule, datetime(2029, 12, 1), datetime(2029, 12, 31)) == []
+
+    def test_stored_appointments_hide_occurrences(self, db, instructor, rule):
+        """Test that an occurrence overlapped by a stored appointment is not offered."""
+        db.session.add(Appointment(instructor_id=instructor[0].id, start_time=datetime(2030, 1, 7, 9, 30),
+                                   end_time=datetime(2030, 1, 7, 9, 45), is_available=True))
+        db.session.commit()
+
+        free = free_occurrences(datetime(2030, 1, 7), datetime(2030, 1, 8))
+
+        assert [(rule_id, start) for rule_id, _, start, _ in free] == [(rule.id, datetime(2030, 1, 7, 10))]
+
+    def test_booking_materializes_a_single_row(self, db, instructor, rule):
+        """Test that booking stores one appointment and a second booking of the slot fails."""
+        _, student = instructor
+        start = int(datetime(2030, 1, 7, 9, 0).replace(tzinfo=timezone.utc).timestamp())
+        now = datetime(2030, 1, 1)
+
+        booked = book_occurrence(rule.id, start, student.id, 'Topic', now)
+        db.session.commit()
+
+        assert booked is not None
+        appointment = db.session.get(Appointment, booked[0])
+        assert (appointment.student_id, appointment.is_available, appointment.student_name) == \
+            (student.id, False, 'Test Student')
+        assert book_occurrence(rule.id, start, student.id, 'Topic', now) is None
+        assert book_occurrence(rule.id, start + 1800, student.id, 'Topic', now) is None
+        assert Appointment.query.count() == 1
+
+    def test_occurrences_reach_every_free_slot_view(self, db, instructor, rule):
+        """Test that free rule slots show up in the instructor feed, ICS, masks, directory, search and stats."""
+        instructor_id = instructor[0].id
+        week = datetime(2030, 1, 7)
+        first, second = datetime(2030, 1, 7, 9), datetime(2030, 1, 7, 10)
+        # Zwykły wolny termin w tym samym tygodniu
+        db.session.add(Appointment(instructor_id=instructor_id, start_time=datetime(2030, 1, 8, 9),
+                                   end_time=datetime(2030, 1, 8, 10), is_available=True))
+        db.session.commit()
+
+        events = instructor_events(instructor_id, week, week + timedelta(days=7))
+        assert [event['id'] for event in events if event.get('rule_id')] == \
+            [event_id(rule.id, first), event_id(rule.id, second)]
+        assert all(event['is_available'] for event in events)
+
+        block = ics_feeds._instructor_week(instructor_id, week, '20300101T000000Z')
+        assert block.count('BEGIN:VEVENT') == 3
+        assert f'UID:appointment-{event_id(rule.id, first)}@kalendarz-konsultacji' in block
+        assert block.index('DTSTART:20300107T090000Z') < block.index('DTSTART:20300108T090000Z')
+
+        free, busy = availability._load_from_db([instructor_id], week)[instructor_id]
+        assert free == availability.build_masks([(first, second + timedelta(hours=1), True),
+                                                 (datetime(2030, 1, 8, 9), datetime(2030, 1, 8, 10), True)], week)[0]
+        assert busy == 0
+
+        summary = instructor_directory.build_summaries(datetime(2030, 1, 1))[instructor_id]
+        # 14 stycznia jest wyjątkiem reguły
+        assert (summary['next_free_slot'], summary['free_7d'], summary['free_30d']) == (first, 2, 7)
+
+        rows = slot_search.earliest_free_slots(datetime(2030, 1, 1), 4)
+        assert [row.id for row in rows] == [event_id(rule.id, first), event_id(rule.id, second), rows[2].id,
+                                            event_id(rule.id, datetime(2030, 1, 21, 9))]
+        assert rows[2].start_time == datetime(2030, 1, 8, 9)
+        assert [row.id for row in slot_search.earliest_free_slots(datetime(2030, 1, 1), 2, [instructor_id + 99])] == []
+
+        stats = instructor_stats.build_stats(instructor_id, week, week + timedelta(days=7))
+        assert stats['counts']['available'] == 3
+
+    def test_parse_rules_validates(self):
+        """Test that rules are parsed per pattern interval and invalid data is rejected."""
+        rules = parse_rules({'pattern': [{'weekday': 0, 'start': '10:00', 'end': '12:00'},
+                                         {'weekday': 2, 'start': '14:00', 'end': '15:00'}],
+                             'slot_minutes': 30, 'timeZone': 'Europe/Warsaw', 'start_date': '2030-01-01',
+                             'exceptions': ['2030-01-07']})
+
+        assert [(rule.weekday, len(rule.exceptions)) for rule in rules] == [(0, 1), (2, 0)]
+        with pytest.raises(PlanError):
+            parse_rules({'pattern': [], 'slot_minutes': 30, 'start_date': '2030-01-01'})
+
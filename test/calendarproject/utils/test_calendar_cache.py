@@ -0,0 +1,137 @@
+import pytest
+from datetime import datetime, timedelta
+import pytz
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.user import User
+from calendarproject.models.utilization_rollup import UtilizationRollup
+from calendarproject.utils import calendar_cache
+from calendarproject.utils.calendar_cache import (PENDING_DAYS_KEY, PENDING_WEEKS_KEY, get_available_events,
+                                                  invalidate_slots, refresh_pending, slots_key)
+from calendarproject.utils.weeks import week_start, weeks_overlapping
+
+
+class TestCalendarCache:
+    """Test suite for the week bucketing of the calendar slot cache."""
+
+    def test_week_start_is_monday_utc(self):
+        """Test that aware datetimes are bucketed by their UTC Monday."""
+        # Poniedziałek 00:30 w Warszawie to jeszcze niedziela w UTC
+        warsaw = pytz.timezone('Europe/Warsaw')
+        value = warsaw.localize(datetime(2024, 10, 14, 0, 30))
+
+        assert week_start(value) == datetime(2024, 10, 7)
+        assert week_start(datetime(2024, 10, 14, 0, 30)) == datetime(2024, 10, 14)
+
+    def test_weeks_overlapping_month_view(self):
+        """Test that a month view range is split into every UTC week it touches."""
+        weeks = weeks_overlapping(datetime(2024, 9, 30), datetime(2024, 11, 11))
+
+        assert weeks[0] == datetime(2024, 9, 30)
+        assert weeks[-1] == datetime(2024, 11, 4)
+        assert len(weeks) == 6
+
+    def test_weeks_overlapping_excludes_touching_week(self):
+        """Test that a range ending exactly on Monday does not include the next week."""
+        weeks = weeks_overlapping(datetime(2024, 10, 9, 12), datetime(2024, 10, 14))
+
+        assert weeks == [datetime(2024, 10, 7)]
+
+    def test_slots_key(self):
+        """Test the cache keys for one instructor and for all instructors."""
+        week = datetime(2024, 10, 7)
+
+        assert slots_key(5, week) == 'calendar:slots:5:2024-10-07'
+        assert slots_key(None, week) == 'calendar:slots:all:2024-10-07'
+
+
+class TestCalendarCacheRedis:
+    """Test suite for the Redis-backed slot cache, run against a fake Redis."""
+
+    WEEK = datetime(2030, 1, 7)
+
+    @pytest.fixture
+    def instructor(self, db):
+        instructor = User(username='instructor', email='instructor@example.com',
+                          first_name='Jan', last_name='Kowalski', is_instructor=True)
+        instructor.set_password('password')
+        db.session.add(instructor)
+        db.session.commit()
+        return instructor
+
+    def add_slot(self, db, instructor, start):
+        slot = Appointment(instructor_id=instructor.id, start_time=start, end_time=start + timedelta(hours=1),
+                           is_available=True)
+        db.session.add(slot)
+        db.session.commit()
+        return slot
+
+    def test_miss_then_hit(self, db, fake_redis, instructor):
+        """Test that a missing week is loaded from the database once and then served from Redis."""
+        slot = self.add_slot(db, instructor, self.WEEK + timedelta(days=1, hours=9))
+        start, end = self.WEEK, self.WEEK + timedelta(days=7)
+
+        assert [event['id'] for event in get_available_events(instructor.id, start, end)] == [slot.id]
+        assert fake_redis.get(slots_key(instructor.id, self.WEEK)) is not None
+
+        # Trafienie nie dotyka bazy: usunięty bez unieważnienia termin wciąż jest w cache
+        db.session.delete(slot)
+        db.session.commit()
+        assert [event['id'] for event in get_available_events(instructor.id, start, end)] == [slot.id]
+        assert calendar_cache.cache_stats() == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+    def test_invalidation_drops_only_changed_weeks(self, db, fake_redis, instructor):
+        """Test that a change removes the weeks it overlaps and bumps the version, keeping other weeks."""
+        self.add_slot(db, instructor, self.WEEK + timedelta(days=1, hours=9))
+        following = self.WEEK + timedelta(days=7)
+        get_available_events(instructor.id, self.WEEK, following + timedelta(days=7))
+        version = calendar_cache.get_version(instructor.id)
+
+        invalidate_slots(instructor.id, self.WEEK + timedelta(days=2), self.WEEK + timedelta(days=2, hours=1))
+
+        assert fake_redis.get(slots_key(instructor.id, self.WEEK)) is None
+        assert fake_redis.get(slots_key(None, self.WEEK)) is None
+        assert fake_redis.get(slots_key(instructor.id, following)) is not None
+        assert calendar_cache.get_version(instructor.id) != version
+        assert fake_redis.smembers(PENDING_WEEKS_KEY) == {f'{instructor.id}:2030-01-07'.encode()}
+        assert fake_redis.smembers(PENDING_DAYS_KEY) == {f'{instructor.id}:2030-01-09'.encode()}
+
+    def test_stale_read_is_not_stored(self, db, fake_redis, instructor, monkeypatch):
+        """Test that a week loaded before a concurrent change is returned but not written back to Redis."""
+        slot = self.add_slot(db, instructor, self.WEEK + timedelta(days=1, hours=9))
+        load_week = calendar_cache._load_week
+
+        def load_then_change(instructor_id, week):
+            payload = load_week(instructor_id, week)
+            # Rezerwacja zatwierdzona i unieważniona w trakcie ładowania tygodnia
+            slot.is_available = False
+            db.session.commit()
+            invalidate_slots(instructor.id, slot.start_time, slot.end_time)
+            return payload
+        monkeypatch.setattr(calendar_cache, '_load_week', load_then_change)
+
+        events = get_available_events(instructor.id, self.WEEK, self.WEEK + timedelta(days=7))
+
+        assert [event['id'] for event in events] == [slot.id]
+        assert fake_redis.get(slots_key(instructor.id, self.WEEK)) is None
+
+        monkeypatch.setattr(calendar_cache, '_load_week', load_week)
+        assert get_available_events(instructor.id, self.WEEK, self.WEEK + timedelta(days=7)) == []
+
+    def test_refresh_pending_marks_utilization_days(self, db, fake_redis, instructor):
+        """Test that queued changes are recomputed in the background and the queue is drained."""
+        slot = self.add_slot(db, instructor, self.WEEK + timedelta(days=1, hours=9))
+        invalidate_slots(instructor.id, slot.start_time, slot.end_time)
+
+        assert db.session.get(UtilizationRollup, (instructor.id, slot.start_time.date())) is None
+        assert refresh_pending() == 2
+        assert db.session.get(UtilizationRollup, (instructor.id, slot.start_time.date())).pending_changes == 1
+        assert fake_redis.smembers(PENDING_WEEKS_KEY) == set()
+        assert refresh_pending() == 0
+
+    def test_without_redis_marks_utilization_days_directly(self, db, instructor):
+        """Test that utilization days are still marked when Redis is unreachable."""
+        slot = self.add_slot(db, instructor, self.WEEK + timedelta(days=1, hours=9))
+
+        invalidate_slots(instructor.id, slot.start_time, slot.end_time)
+
+        assert db.session.get(UtilizationRollup, (instructor.id, slot.start_time.date())).pending_changes == 1
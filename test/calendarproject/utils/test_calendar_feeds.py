@@ -0,0 +1,59 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.calendar_feeds import instructor_events, student_booking_events
+
+
+class TestCalendarFeeds:
+    """Test suite for the column-projected calendar feed queries."""
+
+    @pytest.fixture
+    def users(self, db):
+        """Create an instructor and a student for testing."""
+        instructor = User(username='instructor', email='instructor@example.com',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com',
+                       first_name='Student', last_name='User')
+        instructor.set_password('password')
+        student.set_password('password')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        return instructor, student
+
+    def test_instructor_events_include_student_name(self, db, users):
+        """Test that the instructor feed rows carry the student's name from the join."""
+        instructor, student = users
+        start = datetime(2030, 1, 7, 8, 0)
+        free = Appointment(instructor_id=instructor.id, start_time=start,
+                           end_time=start + timedelta(hours=1), is_available=True)
+        booked = Appointment(instructor_id=instructor.id, student_id=student.id,
+                             start_time=start + timedelta(hours=1), end_time=start + timedelta(hours=2),
+                             is_available=False, topic='Topic', status='pending')
+        db.session.add_all([free, booked])
+        db.session.commit()
+
+        events = {e['id']: e for e in instructor_events(instructor.id, start, start + timedelta(days=1))}
+
+        assert events[free.id]['student'] == ''
+        assert events[free.id]['titleMessage'] == 'Dostępny'
+        assert events[booked.id]['student'] == 'Student User'
+        assert events[booked.id]['color'] == '#996C00'
+        assert events[booked.id]['start'] == start + timedelta(hours=1)
+
+    def test_student_booking_events_only_own_bookings(self, db, users):
+        """Test that the booked overlay contains only the student's own bookings."""
+        instructor, student = users
+        start = datetime(2030, 1, 7, 8, 0)
+        booked = Appointment(instructor_id=instructor.id, student_id=student.id,
+                             start_time=start, end_time=start + timedelta(hours=1),
+                             is_available=False, topic='Topic', status='confirmed')
+        free = Appointment(instructor_id=instructor.id, start_time=start + timedelta(hours=1),
+                           end_time=start + timedelta(hours=2), is_available=True)
+        db.session.add_all([booked, free])
+        db.session.commit()
+
+        events = student_booking_events(student.id, start, start + timedelta(days=1))
+
+        assert [e['id'] for e in events] == [booked.id]
+        assert events[0]['color'] == '#9C27B0'
@@ -0,0 +1,38 @@
+from flask import jsonify
+from calendarproject.utils.http_cache import is_fresh, make_etag, not_modified, with_etag
+
+
+class TestHttpCache:
+    """Test suite for the conditional response helpers used by the calendar feeds."""
+
+    def test_make_etag_depends_on_every_part(self):
+        """Test that the ETag changes when the version or the query changes."""
+        etag = make_etag('instructor', 1, '42', 'start=a&end=b')
+
+        assert etag == make_etag('instructor', 1, '42', 'start=a&end=b')
+        assert etag != make_etag('instructor', 1, '43', 'start=a&end=b')
+        assert etag != make_etag('instructor', 1, '42', 'start=a&end=c')
+
+    def test_is_fresh_matches_if_none_match(self, app):
+        """Test that a matching If-None-Match header makes the response fresh."""
+        etag = make_etag('student', 1, '42')
+
+        with app.test_request_context(headers={'If-None-Match': f'"{etag}"'}):
+            assert is_fresh(etag)
+            assert not is_fresh(make_etag('student', 1, '43'))
+            assert not is_fresh(None)
+
+    def test_not_modified_and_with_etag(self, app):
+        """Test that both full and 304 responses carry the strong ETag."""
+        etag = make_etag('student', 1, '42')
+
+        with app.test_request_context():
+            response = not_modified(etag)
+            assert response.status_code == 304
+            assert response.get_etag() == (etag, False)
+
+            response = with_etag(jsonify([]), etag)
+            assert response.get_etag() == (etag, False)
+            assert response.headers['Cache-Control'] == 'private, no-cache'
+
+            assert with_etag(jsonify([]), None).get_etag() == (None, None)
@@ -0,0 +1,106 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils import ics_feeds
+from calendarproject.utils.calendar_cache import ics_week_key, invalidate_slots
+
+
+class TestICSFeeds:
+    """Test suite for the iCalendar subscription feeds."""
+
+    @pytest.fixture
+    def users(self, db):
+        """Create an instructor and a student for testing."""
+        instructor = User(username='instructor', email='instructor@example.com',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com',
+                       first_name='Student', last_name='User')
+        instructor.set_password('password')
+        student.set_password('password')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        return instructor, student
+
+    def test_fold_and_escape(self):
+        """Test RFC 5545 text escaping and 75-octet line folding."""
+        assert ics_feeds.escape('a,b;c\\d\ne') == 'a\\,b\\;c\\\\d\\ne'
+
+        folded = ics_feeds.fold('SUMMARY:' + 'ż' * 60)
+        lines = folded.split('\r\n')
+        assert all(len(line.encode()) <= 75 for line in lines)
+        assert ''.join(line[1:] if i else line for i, line in enumerate(lines)) == 'SUMMARY:' + 'ż' * 60
+
+    def test_token_roundtrip(self, app, users):
+        """Test that feed tokens identify the owner and reject tampering."""
+        instructor, student = users
+        with app.test_request_context():
+            assert ics_feeds.read_token(ics_feeds.feed_token(instructor)) == (
+                'instructor', instructor.id, instructor.feed_secret)
+            token = ics_feeds.feed_token(student)
+            kind, user_id, secret = ics_feeds.read_token(token)
+            assert (kind, user_id) == ('student', student.id)
+            assert ics_feeds.owns_feed(student, kind, secret)
+            assert not ics_feeds.owns_feed(instructor, kind, secret)
+            assert ics_feeds.read_token(token[:-2] + 'xx') is None
+            assert ics_feeds.read_token('garbage') is None
+
+            # Nowy sekret unieważnia wcześniejszy token
+            ics_feeds.regenerate_feed_secret(student)
+            assert not ics_feeds.owns_feed(student, kind, secret)
+            assert ics_feeds.feed_token(student) != token
+
+    def test_build_feeds(self, app, db, users):
+        """Test that instructor feeds contain all slots and student feeds only own bookings."""
+        instructor, student = users
+        now = datetime(2030, 1, 9, 12, 0)
+        start = datetime(2030, 1, 14, 8, 0)
+        free = Appointment(instructor_id=instructor.id, start_time=start,
+                           end_time=start + timedelta(hours=1), is_available=True)
+        booked = Appointment(instructor_id=instructor.id, student_id=student.id,
+                             start_time=start + timedelta(days=1), end_time=start + timedelta(days=1, hours=1),
+                             is_available=False, topic='Egzamin, termin 2', status='confirmed')
+        far = Appointment(instructor_id=instructor.id, start_time=now + timedelta(weeks=60),
+                          end_time=now + timedelta(weeks=60, hours=1), is_available=True)
+        db.session.add_all([free, booked, far])
+        db.session.commit()
+
+        body = ics_feeds.build_feed('instructor', instructor, now).decode()
+        assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+        assert f'UID:appointment-{free.id}@' in body
+        assert f'UID:appointment-{booked.id}@' in body
+        assert f'UID:appointment-{far.id}@' not in body
+        assert 'DTSTART:20300114T080000Z' in body
+        assert 'SUMMARY:Konsultacja: Egzamin\\, termin 2' in body
+        assert 'DESCRIPTION:Student: Student User' in body
+
+        body = ics_feeds.build_feed('student', student, now).decode()
+        assert body.count('BEGIN:VEVENT') == 1
+        assert 'STATUS:CONFIRMED' in body
+        assert 'DESCRIPTION:Prowadzący: Test Instructor' in body
+
+    def test_stale_week_block_is_not_stored(self, app, db, fake_redis, users, monkeypatch):
+        """Test that a week block built before a concurrent booking is not written back to Redis."""
+        instructor, student = users
+        now = datetime(2030, 1, 9, 12, 0)
+        start = datetime(2030, 1, 14, 8, 0)
+        slot = Appointment(instructor_id=instructor.id, start_time=start,
+                           end_time=start + timedelta(hours=1), is_available=True)
+        db.session.add(slot)
+        db.session.commit()
+        build_week = ics_feeds._BUILDERS['instructor']
+
+        def build_then_book(user_id, week, stamp):
+            block = build_week(user_id, week, stamp)
+            if week <= start < week + timedelta(days=7):
+                # Rezerwacja zatwierdzona i unieważniona w trakcie budowania tygodnia
+                slot.is_available = False
+                slot.student_id = student.id
+                db.session.commit()
+                invalidate_slots(instructor.id, slot.start_time, slot.end_time, student.id)
+            return block
+        monkeypatch.setitem(ics_feeds._BUILDERS, 'instructor', build_then_book)
+
+        ics_feeds.build_feed('instructor', instructor, now)
+
+        assert fake_redis.get(ics_week_key(f'instructor:{instructor.id}', datetime(2030, 1, 14))) is None
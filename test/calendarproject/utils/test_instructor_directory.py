@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.instructor_directory import build_summaries
+
+
+class TestInstructorDirectory:
+    """Test suite for the precomputed instructor directory summaries."""
+
+    @pytest.fixture
+    def instructors(self, db):
+        """Create two active instructors and a deleted one."""
+        users = [
+            User(username='zofia', email='zofia@example.com', first_name='Zofia', last_name='Nowak', is_instructor=True),
+            User(username='adam', email='adam@example.com', first_name='Adam', last_name='Kowalski', is_instructor=True),
+            User(username='gone', email='gone@example.com', first_name='Gone', last_name='Away', is_instructor=True,
+                 deleted=True),
+        ]
+        for user in users:
+            user.set_password('password')
+        db.session.add_all(users)
+        db.session.commit()
+        return users
+
+    def test_summaries_count_bookable_slots(self, db, instructors):
+        """Test next free slot and 7/30-day counts, skipping booked, too-soon and deleted instructors."""
+        busy, idle, deleted = instructors
+        now = datetime(2030, 1, 7, 12, 0)
+
+        def slot(instructor, offset, available=True):
+            start = now + offset
+            return Appointment(instructor_id=instructor.id, start_time=start, end_time=start + timedelta(hours=1),
+                               is_available=available)
+
+        db.session.add_all([
+            slot(busy, timedelta(minutes=10)),             # za mniej niż 30 minut
+            slot(busy, timedelta(days=1)),
+            slot(busy, timedelta(days=2), available=False),
+            slot(busy, timedelta(days=10)),
+            slot(busy, timedelta(days=45)),
+            slot(deleted, timedelta(days=1)),
+        ])
+        db.session.commit()
+
+        summaries = build_summaries(now)
+
+        assert set(summaries) == {busy.id, idle.id}
+        assert summaries[busy.id]['next_free_slot'] == now + timedelta(days=1)
+        assert summaries[busy.id]['free_7d'] == 1
+        assert summaries[busy.id]['free_30d'] == 2
+        assert summaries[idle.id] == {
+            'id': idle.id, 'first_name': 'Adam', 'last_name': 'Kowalski', 'full_name': 'Adam Kowalski',
+            'next_free_slot': None, 'free_7d': 0, 'free_30d': 0,
+        }
+
+        assert list(build_summaries(now, [idle.id])) == [idle.id]
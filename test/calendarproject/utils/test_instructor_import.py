@@ -0,0 +1,74 @@
+import io
+import pytest
+from calendarproject.models.user import User
+from calendarproject.utils import instructor_import
+from calendarproject.utils.instructor_import import hash_passwords, import_instructors, password_pool
+
+
+class TestInstructorImport:
+    """Test suite for the bulk CSV instructor import."""
+
+    HEADER = 'username,email,first_name,last_name,password\n'
+
+    @pytest.fixture
+    def existing(self, db):
+        """Create an account whose username and email are already taken."""
+        user = User(username='taken', email='taken@example.com', first_name='Taken', last_name='User')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def test_import_reports_row_errors(self, db, existing):
+        """Test that valid rows are created in batches and invalid ones reported by line."""
+        lines = io.StringIO(self.HEADER
+                            + 'anowak,anowak@example.com,Anna,Nowak,secret1\n'
+                            + 'taken,other@example.com,Jan,Kowalski,secret1\n'
+                            + 'jkowalski,taken@example.com,Jan,Kowalski,secret1\n'
+                            + 'bad,bad@example.com,Bad,Name,secret1\n'
+                            + 'noemail,not-an-email,No,Email,secret1\n'
+                            + 'pwisniewski,pw@example.com,Piotr,Wiśniewski,secret1\n'
+                            + 'anowak,second@example.com,Anna,Nowak,secret1\n'
+                            + 'shortpw,short@example.com,Short,Password,123\n')
+
+        report = import_instructors(lines, chunk_size=3, workers=1)
+
+        assert report['processed'] == 8
+        assert report['created'] == 2
+        assert [error['line'] for error in report['errors']] == [3, 4, 5, 6, 8, 9]
+        assert 'anowak' in report['errors'][4]['message']
+
+        created = User.query.filter(User.username.in_(['anowak', 'pwisniewski'])).all()
+        assert len(created) == 2
+        assert all(user.is_instructor and not user.is_admin for user in created)
+        assert created[0].check_password('secret1')
+
+    def test_import_requires_header(self, db):
+        """Test that a file without the expected columns is rejected as a whole."""
+        report = import_instructors(io.StringIO('name,mail\nx,y\n'), chunk_size=10, workers=1)
+        assert report['created'] == 0
+        assert report['errors'][0]['line'] == 1
+
+    def test_hash_passwords_in_process_pool(self):
+        """Test that one pool hashes several chunks, returning one valid hash per password, in order."""
+        chunks = [['first1', 'second2', 'third3'], ['fourth4', 'fifth5']]
+        with password_pool(2) as pool:
+            hashes = [hash_passwords(chunk, pool, workers=2) for chunk in chunks]
+        user = User()
+        for chunk, chunk_hashes in zip(chunks, hashes):
+            for password, password_hash in zip(chunk, chunk_hashes):
+                user.password_hash = password_hash
+                assert user.check_password(password)
+
+    def test_run_job(self, db, existing):
+        """Test that the import job stores progress and row errors and forgets the uploaded file."""
+        job = instructor_import.start(existing, self.HEADER
+                                      + 'anowak,anowak@example.com,Anna,Nowak,secret1\n'
+                                      + 'taken,other@example.com,Jan,Kowalski,secret1\n')
+
+        job = instructor_import.run(job.id, chunk_size=1, workers=1)
+
+        assert (job.status, job.processed, job.created, job.failed) == ('done', 2, 1, 1)
+        assert job.errors == [{'line': 3, 'message': 'Nazwa użytkownika taken już istnieje.'}]
+        assert job.data is None
+        assert instructor_import.run(job.id) is None
@@ -0,0 +1,51 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.instructor_stats import build_stats
+
+
+class TestInstructorStats:
+    """Test suite for the aggregated instructor statistics."""
+
+    @pytest.fixture
+    def instructor(self, db):
+        """Create an instructor and a student."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com', first_name='Test', last_name='Student')
+        for user in (instructor, student):
+            user.set_password('password')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        return instructor, student
+
+    def test_counts_and_weekly_hours(self, db, instructor):
+        """Test status counts and booked hours grouped into UTC weeks."""
+        instructor, student = instructor
+        monday = datetime(2030, 1, 7)
+
+        def slot(offset, hours, status='pending', student_id=None, instructor_id=instructor.id):
+            start = monday + offset
+            return Appointment(instructor_id=instructor_id, student_id=student_id, start_time=start,
+                               end_time=start + timedelta(hours=hours), is_available=student_id is None,
+                               status=status)
+
+        db.session.add_all([
+            slot(timedelta(hours=10), 1),
+            slot(timedelta(days=1, hours=10), 1, status='rejected'),
+            slot(timedelta(days=2, hours=10), 2, student_id=student.id),
+            slot(timedelta(days=8, hours=10), 1.5, status='confirmed', student_id=student.id),
+            slot(timedelta(days=20), 1, student_id=student.id),                      # poza zakresem
+            slot(timedelta(hours=12), 1, student_id=student.id, instructor_id=student.id),
+        ])
+        db.session.commit()
+
+        stats = build_stats(instructor.id, monday, monday + timedelta(days=14))
+
+        assert stats['counts'] == {'available': 2, 'pending': 1, 'confirmed': 1, 'rejected': 1}
+        assert stats['booked_hours'] == 3.5
+        assert stats['weeks'] == [
+            {'week': '2030-01-07', 'booked_hours': 2.0, 'confirmed_hours': 0.0},
+            {'week': '2030-01-14', 'booked_hours': 1.5, 'confirmed_hours': 1.5},
+        ]
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+from sqlalchemy import select, literal
+from calendarproject.utils import json_provider
+
+
+class TestJSONProvider:
+    """Test suite for the application-wide JSON provider."""
+
+    def test_datetimes_are_iso_formatted(self, app):
+        """Test that datetimes are encoded as ISO 8601 instead of HTTP dates."""
+        value = datetime(2030, 1, 7, 8, 30)
+
+        with app.test_request_context():
+            response = app.json.response({'start': value, 'items': [value]})
+
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.data) == {'start': '2030-01-07T08:30:00', 'items': ['2030-01-07T08:30:00']}
+
+    def test_rows_are_encoded_as_objects(self, app, db):
+        """Test that SQLAlchemy rows can be returned from handlers directly."""
+        row = db.session.execute(select(literal(1).label('id'), literal('x').label('name'))).one()
+
+        assert json.loads(app.json.dumps([row])) == [{'id': 1, 'name': 'x'}]
+
+    def test_stdlib_fallback(self, app, monkeypatch):
+        """Test that the provider produces the same output without orjson."""
+        value = {'start': datetime(2030, 1, 7, 8, 30, 0, 500), 'name': 'Jeleń'}
+        fast = app.json.dumps(value)
+
+        monkeypatch.setattr(json_provider, 'orjson', None)
+
+        assert json.loads(app.json.dumps(value)) == json.loads(fast)
+        assert app.json.loads('{"a": 1}') == {'a': 1}
+
+    def test_stream_array_chunks(self, app):
+        """Test that streamed arrays are valid JSON for empty, partial and full chunks."""
+        for count in (0, 1, 3, 7):
+            chunks = list(app.json.stream_array(({'i': i} for i in range(count)), chunk_size=3))
+
+            assert json.loads(b''.join(chunks)) == [{'i': i} for i in range(count)]
@@ -0,0 +1,99 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.notification import Notification
+from calendarproject.models.outbox import OutboxMessage
+from calendarproject.utils import outbox
+from calendarproject.utils.notifications import notify, notify_instructor_new_appointment
+
+
+class TestOutbox:
+    """Test suite for the transactional outbox and its relay."""
+
+    @pytest.fixture
+    def user(self, db):
+        """Create a user to notify."""
+        user = User(username='instructor', email='instructor@example.com',
+                    first_name='Test', last_name='Instructor', is_instructor=True)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def test_notify_is_written_with_the_transaction(self, db, user):
+        """Test that notifications wait in the outbox until the relay runs."""
+        notify(user_id=user.id, message='Hello', type='appointment', related_id=7)
+        notify_instructor_new_appointment(user.id, '2030-01-07 10:00')
+        db.session.commit()
+
+        assert Notification.query.count() == 0
+        assert OutboxMessage.query.filter(OutboxMessage.processed_at.is_(None)).count() == 2
+
+        assert outbox.relay() == 2
+
+        notification = Notification.query.one()
+        assert notification.user_id == user.id
+        assert notification.related_id == 7
+        assert OutboxMessage.query.filter(OutboxMessage.processed_at.is_(None)).count() == 0
+        assert outbox.relay() == 0
+
+    def test_relay_processes_in_batches(self, db, user):
+        """Test that the relay drains more messages than one batch holds."""
+        for i in range(5):
+            notify(user_id=user.id, message=f'Message {i}', type='appointment')
+        db.session.commit()
+
+        assert outbox.relay(batch_size=2) == 5
+        assert Notification.query.count() == 5
+
+    def test_unknown_channel_backs_off_then_is_dead_lettered(self, db, user):
+        """Test that failures wait an exponentially growing delay and stop after MAX_ATTEMPTS."""
+        outbox.enqueue('pigeon', user_id=user.id)
+        db.session.commit()
+
+        assert outbox.relay() == 1
+        message = OutboxMessage.query.one()
+        assert message.attempts == 1
+        assert message.next_attempt_at > datetime.utcnow() + outbox.RETRY_BASE - timedelta(seconds=5)
+        # Przed upływem odstępu wiadomość nie jest pobierana ponownie
+        assert outbox.relay() == 0
+
+        now = datetime.utcnow()
+        for _ in range(outbox.MAX_ATTEMPTS + 2):
+            now += outbox.RETRY_MAX + timedelta(seconds=1)
+            outbox.relay_batch(now=now)
+
+        db.session.expire_all()
+        message = OutboxMessage.query.one()
+        assert message.processed_at is None
+        assert message.dead_at is not None
+        assert message.attempts == outbox.MAX_ATTEMPTS
+        assert 'pigeon' in message.last_error
+
+        assert outbox.retry_dead() == 1
+        message = OutboxMessage.query.one()
+        assert (message.dead_at, message.attempts, message.next_attempt_at) == (None, 0, None)
+
+    def test_retry_delay_grows_to_the_cap(self):
+        """Test the exponential backoff schedule."""
+        assert outbox.retry_delay(1) == outbox.RETRY_BASE
+        assert outbox.retry_delay(3) == outbox.RETRY_BASE * 4
+        assert outbox.retry_delay(20) == outbox.RETRY_MAX
+
+    def test_failing_channel_does_not_block_other_channels(self, db, user, monkeypatch):
+        """Test that a channel raising is recorded as a failure while other channels are delivered."""
+        def broken(messages):
+            raise ConnectionError('SMTP niedostępny')
+        monkeypatch.setitem(outbox.CHANNELS, 'email', broken)
+        outbox.enqueue('email', user_id=user.id, subject='Subject', body='Body')
+        notify(user_id=user.id, message='Hello', type='appointment')
+        db.session.commit()
+
+        assert outbox.relay() == 2
+        assert outbox.relay() == 0
+
+        assert Notification.query.count() == 1
+        email = OutboxMessage.query.filter_by(channel='email').one()
+        assert email.processed_at is None
+        assert email.attempts == 1
+        assert 'SMTP niedostępny' in email.last_error
@@ -0,0 +1,139 @@
+import os
+
+import pytest
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from calendarproject.app import create_app
+from calendarproject.extensions import db as _db
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.appointment_archive import ArchivedAppointment
+from calendarproject.utils import partitions
+from calendarproject.utils.instructor_stats import build_stats
+
+
+class TestPartitions:
+    """Test suite for monthly appointment partition maintenance and the archive read path."""
+
+    @pytest.fixture
+    def instructor(self, db):
+        """Create an instructor."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        instructor.set_password('password')
+        db.session.add(instructor)
+        db.session.commit()
+        return instructor
+
+    def test_partition_names(self):
+        """Test that partition names encode their month and ignore other tables."""
+        assert partitions.partition_name(datetime(2030, 1, 1)) == 'appointment_2030_01'
+        assert partitions.partition_month('appointment_2030_01') == datetime(2030, 1, 1)
+        assert partitions.partition_month('appointment_default') is None
+
+    def test_plan_creates_ahead_and_archives_past_retention(self):
+        """Test which months are created and which are archived."""
+        existing = {datetime(2029, month, 1) for month in range(1, 13)} | {datetime(2030, 1, 1)}
+
+        create, archive = partitions.plan(existing, datetime(2030, 1, 15, 12), months_ahead=2, retention_months=6)
+
+        assert create == [datetime(2030, 2, 1), datetime(2030, 3, 1)]
+        assert archive == [datetime(2029, month, 1) for month in range(1, 7)]
+
+    def test_maintain_is_noop_without_partitioning(self, db):
+        """Test that maintenance does nothing on databases without partitioned tables."""
+        assert partitions.maintain() == {'created': [], 'archived': []}
+
+    def test_reports_read_archived_appointments(self, db, instructor):
+        """Test that stats reach archived rows while live queries do not."""
+        start = datetime(2029, 1, 8, 10)
+        db.session.add(ArchivedAppointment(id=1000, instructor_id=instructor.id, start_time=start,
+                                           end_time=start + timedelta(hours=2), is_available=False,
+                                           status='confirmed'))
+        db.session.add(Appointment(instructor_id=instructor.id, start_time=start + timedelta(days=1),
+                                   end_time=start + timedelta(days=1, hours=1), is_available=True))
+        db.session.commit()
+
+        stats = build_stats(instructor.id, datetime(2029, 1, 1), datetime(2029, 2, 1))
+
+        assert stats['counts']['confirmed'] == 1
+        assert stats['counts']['available'] == 1
+        assert stats['booked_hours'] == 2
+        assert Appointment.instructor_feed_query(instructor.id, datetime(2029, 1, 1),
+                                                 datetime(2029, 2, 1)).count() == 1
+
+
+POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+
+PARTITIONED = """
+CREATE TABLE {name} (
+    id SERIAL,
+    instructor_id INTEGER NOT NULL,
+    student_id INTEGER,
+    start_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    end_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    is_available BOOLEAN,
+    topic VARCHAR(200),
+    status VARCHAR(20),
+    student_name VARCHAR(101),
+    PRIMARY KEY (id, start_time)
+) PARTITION BY RANGE (start_time)
+"""
+
+
+@pytest.mark.postgres
+@pytest.mark.skipif(not POSTGRES_URL, reason='TEST_POSTGRES_URL is not set')
+class TestPostgresPartitions:
+    """Test suite for partition maintenance against a real (throwaway) Postgres database."""
+
+    @pytest.fixture(params=[True, False], ids=['default_partition', 'no_default_partition'])
+    def postgres(self, request):
+        """Partitioned appointment tables, with and without the default partition."""
+        app = create_app(settings_override={'TESTING': True, 'SQLALCHEMY_DATABASE_URI': POSTGRES_URL,
+                                            'APPOINTMENT_PARTITION_MONTHS_AHEAD': 1,
+                                            'APPOINTMENT_RETENTION_MONTHS': 12})
+        ctx = app.app_context()
+        ctx.push()
+        _db.session.execute(text('DROP SCHEMA public CASCADE'))
+        _db.session.execute(text('CREATE SCHEMA public'))
+        _db.session.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+        _db.session.commit()
+        _db.create_all()
+        _db.session.execute(text('DROP TABLE appointment, appointment_archive CASCADE'))
+        _db.session.execute(text(PARTITIONED.format(name='appointment')))
+        _db.session.execute(text(PARTITIONED.format(name='appointment_archive')))
+        if request.param:
+            _db.session.execute(text('CREATE TABLE appointment_default PARTITION OF appointment DEFAULT'))
+        _db.session.commit()
+        yield request.param
+        _db.session.remove()
+        _db.engine.dispose()
+        ctx.pop()
+
+    def test_maintain_creates_and_archives_partitions(self, postgres):
+        """Test that old partitions move to the archive and new ones are created ahead."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        instructor.set_password('password')
+        _db.session.add(instructor)
+        _db.session.commit()
+        partitions.create_partition(datetime(2029, 1, 1))
+        _db.session.commit()
+        start = datetime(2029, 1, 8, 10)
+        old = Appointment(instructor_id=instructor.id, start_time=start, end_time=start + timedelta(hours=1),
+                          is_available=False, status='confirmed')
+        _db.session.add(old)
+        _db.session.commit()
+        old_id = old.id
+        _db.session.expunge_all()
+
+        result = partitions.maintain(now=datetime(2030, 3, 15))
+
+        assert result == {'created': ['appointment_2030_03', 'appointment_2030_04'],
+                          'archived': ['appointment_2029_01']}
+        assert partitions.partitions(partitions.PARENT) == {datetime(2030, 3, 1), datetime(2030, 4, 1)}
+        assert partitions.partitions(partitions.ARCHIVE) == {datetime(2029, 1, 1)}
+        assert _db.session.get(Appointment, old_id) is None
+        assert _db.session.get(ArchivedAppointment, old_id).start_time == start
+        # A second run has nothing left to do
+        assert partitions.maintain(now=datetime(2030, 3, 15)) == {'created': [], 'archived': []}
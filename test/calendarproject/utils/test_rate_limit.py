@@ -0,0 +1,100 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from calendarproject.models.user import User
+from calendarproject.utils import rate_limit
+from calendarproject.utils.rate_limit import Limit, rules_for
+
+
+class FakeBucket:
+    """Stands in for the Lua script: records calls and answers with a fixed result."""
+
+    def __init__(self, result=(1, 0), error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        if self.error:
+            raise self.error
+        return list(self.result)
+
+
+class TestRateLimit:
+    """Test suite for the Redis token-bucket rate limiter."""
+
+    @pytest.fixture
+    def bucket(self, monkeypatch):
+        bucket = FakeBucket()
+        monkeypatch.setattr(rate_limit, '_token_bucket', bucket)
+        return bucket
+
+    @pytest.fixture
+    def student_user(self, db):
+        student = User(username='student', email='student@example.com',
+                       first_name='Student', last_name='User')
+        student.set_password('password')
+        db.session.add(student)
+        db.session.commit()
+        return student
+
+    def test_route_rule_overrides_blueprint_rule(self):
+        """Test that a route entry wins over its blueprint entry."""
+        config = {'calendar': [('ip', 100, 60)], 'calendar.book': [('user', 5, 60)]}
+
+        assert rules_for('calendar.book', config) == ('calendar.book', [Limit('user', 5, 60)])
+        assert rules_for('calendar.cancel', config) == ('calendar', [Limit('ip', 100, 60)])
+        assert rules_for('auth.login', config) == (None, [])
+        assert rules_for(None, config) == (None, [])
+
+    def test_throttled_login_gets_429_before_the_view(self, client, bucket, monkeypatch):
+        """Test that an exhausted bucket answers 429 with Retry-After without touching the view."""
+        bucket.result = (0, 2500)
+        monkeypatch.setattr(User, 'check_password', lambda *args: pytest.fail('view should not run'))
+
+        response = client.post('/login', data={'username': 'student', 'password': 'password'},
+                               headers={'Accept': 'text/html'})
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '3'
+        keys, args = bucket.calls[0]
+        assert keys == ['ratelimit:auth.login:ip:127.0.0.1']
+        assert args[0] == 10
+
+    def test_throttled_booking_gets_json_429(self, client, bucket, student_user):
+        """Test that API clients get a JSON error and both user and IP buckets are charged."""
+        client.post('/login', data={'username': 'student', 'password': 'password'})
+        bucket.calls.clear()
+        bucket.result = (0, 400)
+
+        response = client.post('/calendar/book/1', json={'topic': 'Test'})
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        assert response.json['status'] == 'error'
+        keys, _ = bucket.calls[0]
+        assert keys == [f'ratelimit:calendar.book:user:{student_user.id}',
+                        'ratelimit:calendar.book:ip:127.0.0.1']
+
+    def test_get_requests_are_not_limited(self, client, bucket):
+        """Test that rendering the login form does not consume tokens."""
+        response = client.get('/login')
+
+        assert response.status_code == 200
+        assert bucket.calls == []
+
+    def test_anonymous_user_scope_is_skipped(self, app, bucket):
+        """Test that the user bucket is skipped when nobody is logged in."""
+        with app.test_request_context('/calendar/book/1', method='POST'):
+            assert rate_limit.consume('calendar.book', [Limit('user', 5, 60)]) is None
+        assert bucket.calls == []
+
+    def test_fails_open_without_redis(self, client, bucket):
+        """Test that requests pass through when Redis is unreachable."""
+        bucket.error = ConnectionError('down')
+
+        response = client.post('/login', data={'username': 'nobody', 'password': 'x'})
+
+        assert response.status_code == 200
+        assert len(bucket.calls) == 1
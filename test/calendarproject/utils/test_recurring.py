@@ -0,0 +1,114 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.recurring import PlanError, build_plan, find_conflicts, insert_slots
+
+NOW = datetime(2030, 3, 1, 12, 0)
+
+
+def plan(**overrides):
+    data = {
+        'start_date': '2030-03-18',
+        'end_date': '2030-04-07',
+        'timeZone': 'Europe/Warsaw',
+        'slot_minutes': 30,
+        'pattern': [{'weekday': 0, 'start': '10:00', 'end': '11:30'},
+                    {'weekday': 2, 'start': '14:00', 'end': '15:00'}],
+        'exceptions': ['2030-03-25'],
+    }
+    data.update(overrides)
+    return data
+
+
+class TestRecurringPlan:
+    """Test suite for the recurring availability generator."""
+
+    @pytest.fixture
+    def instructor_user(self, db):
+        """Create an instructor user for testing."""
+        instructor = User(username='instructor', email='instructor@example.com',
+                          first_name='Test', last_name='Instructor', is_instructor=True)
+        instructor.set_password('password')
+        db.session.add(instructor)
+        db.session.commit()
+        return instructor
+
+    def test_build_plan_follows_pattern_dst_and_exceptions(self):
+        """Test weekly expansion into slots, skipped exceptions and local hours across the DST change."""
+        slots = build_plan(plan(), NOW)
+
+        # 3 poniedziałki (jeden wyjątek) po 3 sloty + 3 środy po 2 sloty
+        assert len(slots) == 2 * 3 + 3 * 2
+        assert slots == sorted(slots)
+        assert slots[0] == (datetime(2030, 3, 18, 9, 0), datetime(2030, 3, 18, 9, 30))
+        assert all(start.date() != datetime(2030, 3, 25).date() for start, _ in slots)
+        # Po zmianie czasu (31 marca) 10:00 w Warszawie to 08:00 UTC
+        assert (datetime(2030, 4, 1, 8, 0), datetime(2030, 4, 1, 8, 30)) in slots
+
+    def test_build_plan_on_dst_changes(self):
+        """Test that slots falling into or spanning a DST change are skipped instead of duplicated."""
+        pattern = [{'weekday': 6, 'start': '01:00', 'end': '04:00'}]
+
+        # 31 marca 2030: w Warszawie po 01:59:59 CET jest 03:00 CEST
+        spring = build_plan(plan(start_date='2030-03-31', end_date='2030-03-31', pattern=pattern), NOW)
+        assert spring == [
+            (datetime(2030, 3, 31, 0, 0), datetime(2030, 3, 31, 0, 30)),   # 01:00 CET
+            (datetime(2030, 3, 31, 1, 0), datetime(2030, 3, 31, 1, 30)),   # 03:00 CEST
+            (datetime(2030, 3, 31, 1, 30), datetime(2030, 3, 31, 2, 0)),   # 03:30 CEST
+        ]
+
+        # 27 października 2030: godzina 02:00-03:00 występuje dwa razy
+        autumn = build_plan(plan(start_date='2030-10-27', end_date='2030-10-27', pattern=pattern), NOW)
+        assert all(end - start == timedelta(minutes=30) for start, end in autumn)
+        assert all(end <= following for (_, end), (following, _) in zip(autumn, autumn[1:]))
+        assert autumn[0] == (datetime(2030, 10, 26, 23, 0), datetime(2030, 10, 26, 23, 30))  # 01:00 CEST
+        assert autumn[-1] == (datetime(2030, 10, 27, 2, 30), datetime(2030, 10, 27, 3, 0))   # 03:30 CET
+
+    @pytest.mark.parametrize('overrides', [
+        {'slot_minutes': 0},
+        {'timeZone': 'Mars/Olympus'},
+        {'end_date': '2030-03-01'},
+        {'end_date': '2031-06-01'},
+        {'pattern': []},
+        {'pattern': [{'weekday': 7, 'start': '10:00', 'end': '11:00'}]},
+        {'pattern': [{'weekday': 0, 'start': '11:00', 'end': '10:00'}]},
+        {'pattern': [{'weekday': 0, 'start': '10:00', 'end': '12:00'},
+                     {'weekday': 0, 'start': '11:00', 'end': '13:00'}]},
+        {'exceptions': ['not-a-date']},
+        {'start_date': '2030-03-01', 'pattern': [{'weekday': 4, 'start': '12:30', 'end': '14:00'}]},
+        {'slot_minutes': 120},
+    ])
+    def test_build_plan_rejects_invalid_plans(self, overrides):
+        """Test that invalid plans are rejected before anything is written."""
+        with pytest.raises(PlanError):
+            build_plan(plan(**overrides), NOW)
+
+    def test_find_conflicts_with_existing_rows(self, db, instructor_user):
+        """Test that the set-based collision query returns exactly the overlapping plan slots."""
+        slots = build_plan(plan(), NOW)
+        db.session.add_all([
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 3, 18, 9, 15),
+                        end_time=datetime(2030, 3, 18, 9, 45), is_available=True),
+            Appointment(instructor_id=instructor_user.id, start_time=datetime(2030, 3, 20, 14, 0),
+                        end_time=datetime(2030, 3, 20, 15, 0), is_available=True),
+        ])
+        db.session.commit()
+
+        assert find_conflicts(instructor_user.id, slots) == [
+            (datetime(2030, 3, 18, 9, 0), datetime(2030, 3, 18, 9, 30)),
+            (datetime(2030, 3, 18, 9, 30), datetime(2030, 3, 18, 10, 0)),
+        ]
+        assert find_conflicts(instructor_user.id + 1, slots) == []
+
+    def test_insert_slots(self, db, instructor_user):
+        """Test that generated slots are inserted as available appointments."""
+        slots = build_plan(plan(), NOW)
+
+        insert_slots(instructor_user.id, slots)
+        db.session.commit()
+
+        rows = Appointment.query.filter_by(instructor_id=instructor_user.id).order_by(Appointment.start_time).all()
+        assert [(row.start_time, row.end_time) for row in rows] == slots
+        assert all(row.is_available for row in rows)
+        assert find_conflicts(instructor_user.id, slots) == slots
@@ -0,0 +1,80 @@
+import io
+import pytest
+import pytz
+from datetime import datetime
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.slot_import import import_slots, iter_csv, iter_ics
+
+
+class TestSlotImport:
+    """Test suite for the streaming CSV/ICS availability import."""
+
+    NOW = datetime(2030, 1, 1)
+
+    @pytest.fixture
+    def instructor(self, db):
+        """Create an instructor."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        instructor.set_password('password')
+        db.session.add(instructor)
+        db.session.commit()
+        return instructor
+
+    def test_csv_rows_report_line_numbers(self):
+        """Test that CSV rows are parsed lazily with local times and per-line errors."""
+        lines = io.StringIO('start,end\n2030-01-07T10:00,2030-01-07T11:00\nnot a date,x\n')
+
+        rows = list(iter_csv(lines, pytz.timezone('Europe/Warsaw')))
+
+        assert rows[0][0] == 2
+        assert rows[0][1] == pytz.timezone('Europe/Warsaw').localize(datetime(2030, 1, 7, 10))
+        assert rows[1][0] == 3 and rows[1][1] is None
+
+    def test_ics_events_are_unfolded(self):
+        """Test DTSTART/DTEND parsing with UTC, TZID and folded lines, and RRULE rejection."""
+        lines = io.StringIO(
+            'BEGIN:VCALENDAR\r\n'
+            'BEGIN:VEVENT\r\n'
+            'DTSTART:20300107T090000Z\r\n'
+            'DTEND;TZID=Europe/Warsaw:2030010\r\n'
+            ' 7T110000\r\n'
+            'END:VEVENT\r\n'
+            'BEGIN:VEVENT\r\n'
+            'DTSTART:20300108T090000Z\r\n'
+            'DTEND:20300108T100000Z\r\n'
+            'RRULE:FREQ=WEEKLY\r\n'
+            'END:VEVENT\r\n'
+            'END:VCALENDAR\r\n'
+        )
+
+        rows = list(iter_ics(lines, pytz.UTC))
+
+        assert rows[0] == (2, pytz.UTC.localize(datetime(2030, 1, 7, 9)),
+                           pytz.timezone('Europe/Warsaw').localize(datetime(2030, 1, 7, 11)))
+        assert rows[1][0] == 7 and rows[1][1] is None
+
+    def test_import_in_chunks_skips_overlaps(self, db, instructor):
+        """Test chunked import with overlaps inside the file, across chunks and with stored slots."""
+        db.session.add(Appointment(instructor_id=instructor.id, start_time=datetime(2030, 1, 7, 8),
+                                   end_time=datetime(2030, 1, 7, 9), is_available=True))
+        db.session.commit()
+        lines = io.StringIO(
+            'start,end\n'
+            '2030-01-07T08:30,2030-01-07T09:30\n'   # koliduje z zapisanym terminem
+            '2030-01-07T10:00,2030-01-07T11:00\n'
+            '2030-01-07T10:30,2030-01-07T11:30\n'   # koliduje w porcji
+            '2030-01-07T12:00,2030-01-07T13:00\n'
+            '2030-01-07T12:00,2030-01-07T13:00\n'   # koliduje z poprzednią porcją
+            '2029-12-31T10:00,2029-12-31T11:00\n'   # w przeszłości
+        )
+
+        reports = list(import_slots(instructor.id, lines, 'csv', pytz.UTC, self.NOW, chunk_size=4))
+
+        assert [report['processed'] for report in reports] == [4, 6]
+        assert reports[-1]['created'] == 2
+        assert reports[-1]['failed'] == 4
+        assert [error['line'] for error in reports[0]['errors']] == [2, 4]
+        assert [error['line'] for error in reports[1]['errors']] == [6, 7]
+        assert Appointment.query.filter_by(instructor_id=instructor.id).count() == 3
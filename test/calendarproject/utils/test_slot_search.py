@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.utils.slot_search import earliest_free_slots, slot_events
+
+
+class TestSlotSearch:
+    """Test suite for the earliest free slot search."""
+
+    @pytest.fixture
+    def instructors(self, db):
+        """Create three instructors for testing."""
+        users = [User(username=f'instructor{i}', email=f'instructor{i}@example.com',
+                      first_name='Test', last_name=f'Instructor{i}', is_instructor=True) for i in range(3)]
+        for user in users:
+            user.set_password('password')
+        db.session.add_all(users)
+        db.session.commit()
+        return users
+
+    @pytest.fixture
+    def slots(self, db, instructors):
+        """Interleave free slots of all instructors, one every 15 minutes, plus booked and past ones."""
+        start = datetime(2030, 1, 7, 8, 0)
+        rows = []
+        for i in range(30):
+            slot_start = start + timedelta(minutes=15 * i)
+            rows.append({
+                'instructor_id': instructors[i % 3].id,
+                'start_time': slot_start,
+                'end_time': slot_start + timedelta(minutes=30 if i % 5 == 0 else 15),
+                'is_available': i % 7 != 3,
+            })
+        rows.append({'instructor_id': instructors[0].id, 'start_time': start - timedelta(days=1),
+                     'end_time': start - timedelta(days=1, hours=-1), 'is_available': True})
+        db.session.execute(Appointment.__table__.insert(), rows)
+        db.session.commit()
+        return start, rows
+
+    @staticmethod
+    def expected(rows, after, limit, instructor_ids=None, min_duration=timedelta(0)):
+        matching = sorted(
+            (row['start_time'], row['instructor_id']) for row in rows
+            if row['is_available'] and row['start_time'] > after
+            and (instructor_ids is None or row['instructor_id'] in instructor_ids)
+            and row['end_time'] - row['start_time'] >= min_duration
+        )
+        return matching[:limit]
+
+    @pytest.mark.parametrize('limit', [1, 4, 7, 100])
+    def test_all_instructors_in_start_order(self, slots, limit):
+        """Test that the scan returns the earliest free slots across batches."""
+        start, rows = slots
+
+        found = earliest_free_slots(start, limit)
+
+        assert [(r.start_time, r.instructor_id) for r in found] == self.expected(rows, start, limit)
+
+    def test_instructor_subset_is_merged(self, slots, instructors):
+        """Test that per-instructor cursors are merged into one ordered result."""
+        start, rows = slots
+        ids = [instructors[2].id, instructors[0].id]
+
+        found = earliest_free_slots(start, 6, ids)
+
+        assert [(r.start_time, r.instructor_id) for r in found] == self.expected(rows, start, 6, set(ids))
+
+    def test_min_duration(self, slots, instructors):
+        """Test that slots shorter than the requested duration are skipped."""
+        start, rows = slots
+        ids = [instructor.id for instructor in instructors]
+
+        for instructor_ids in (None, ids):
+            found = earliest_free_slots(start, 3, instructor_ids, timedelta(minutes=30))
+            assert [(r.start_time, r.instructor_id) for r in found] == \
+                self.expected(rows, start, 3, min_duration=timedelta(minutes=30))
+
+    def test_slot_events_include_instructor_name(self, slots, instructors):
+        """Test that results carry the instructor's full name."""
+        start, _ = slots
+
+        events = slot_events(earliest_free_slots(start - timedelta(minutes=1), 1))
+
+        assert events[0]['instructor'] == 'Test Instructor0'
+        assert events[0]['start'] == start
@@ -0,0 +1,131 @@
+import pytest
+import pytz
+from datetime import date, datetime, timedelta
+from calendarproject.models.user import User
+from calendarproject.models.appointment import Appointment
+from calendarproject.models.utilization_rollup import UtilizationRollup
+from calendarproject.extensions import db as _db
+from calendarproject.utils import utilization
+
+
+class TestUtilization:
+    """Test suite for the incrementally maintained utilization rollups."""
+
+    MONDAY = datetime(2030, 1, 7)
+    NOW = datetime(2030, 1, 1)
+
+    @pytest.fixture
+    def users(self, db):
+        """Create an instructor and a student."""
+        instructor = User(username='instructor', email='instructor@example.com', first_name='Test',
+                          last_name='Instructor', is_instructor=True)
+        student = User(username='student', email='student@example.com', first_name='Test', last_name='Student')
+        for user in (instructor, student):
+            user.set_password('password')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        return instructor, student
+
+    def add_slots(self, instructor, hours):
+        slots = [Appointment(instructor_id=instructor.id, start_time=self.MONDAY + timedelta(hours=hour),
+                             end_time=self.MONDAY + timedelta(hours=hour + 1), is_available=True)
+                 for hour in hours]
+        _db.session.add_all(slots)
+        _db.session.commit()
+        utilization.mark_changed(instructor.id, [slot.start_time for slot in slots])
+        return [slot.id for slot in slots]
+
+    def test_transitions_count_events_and_refresh_hours(self, db, users):
+        """Test that transitions bump event counters and refresh recomputes only changed days."""
+        instructor, student = users
+        first, second, third, fourth = self.add_slots(instructor, [9, 10, 11, 12])
+
+        for slot_id in (first, second, third, fourth):
+            assert Appointment.try_book(slot_id, student.id, 'Topic', self.NOW) is not None
+        Appointment.try_confirm(first, instructor.id)
+        Appointment.try_release(second, instructor.id, 'pending', 'rejected')
+        Appointment.try_cancel(third, student.id, self.NOW)
+        db.session.commit()
+
+        rollup = db.session.get(UtilizationRollup, (instructor.id, self.MONDAY.date()))
+        assert (rollup.bookings, rollup.rejections, rollup.cancellations) == (4, 1, 1)
+        assert rollup.pending_changes > 0
+
+        assert utilization.refresh() == 1
+        db.session.refresh(rollup)
+        assert rollup.pending_changes == 0
+        assert (rollup.slots, rollup.booked) == (4, 2)
+        assert rollup.offered_seconds == 4 * 3600
+        assert rollup.booked_seconds == 2 * 3600
+        assert rollup.confirmed_seconds == 3600
+        # Nothing left to recompute
+        assert utilization.refresh() == 0
+
+    def test_report_reads_rollups(self, db, users):
+        """Test weekly hours and rates in the report."""
+        instructor, student = users
+        slot_ids = self.add_slots(instructor, [9, 10, 24 * 7 + 9])
+        Appointment.try_book(slot_ids[0], student.id, None, self.NOW)
+        Appointment.try_book(slot_ids[2], student.id, None, self.NOW)
+        Appointment.try_release(slot_ids[2], instructor.id, 'pending', 'rejected')
+        db.session.commit()
+        utilization.refresh()
+
+        report = utilization.report(self.MONDAY, self.MONDAY + timedelta(days=14))
+
+        entry, = report['instructors']
+        assert entry['full_name'] == 'Test Instructor'
+        assert entry['offered_hours'] == 3
+        assert entry['booked_hours'] == 1
+        assert entry['utilization'] == pytest.approx(0.333)
+        assert entry['bookings'] == 2
+        assert entry['rejection_rate'] == 0.5
+        assert [week['week'] for week in entry['weeks']] == ['2030-01-07', '2030-01-14']
+        assert entry['weeks'][1]['utilization'] == 0
+        assert report['pending_days'] == 0
+
+    def test_report_covers_whole_utc_days(self, db, users):
+        """Test that a range in another timezone is widened to whole UTC days and the covered range returned."""
+        instructor, _ = users
+        self.add_slots(instructor, [-1, 9])  # niedziela 23:00 UTC i poniedziałek 09:00 UTC
+        utilization.refresh()
+        warsaw = pytz.timezone('Europe/Warsaw')
+
+        # Poniedziałek 00:00 w Warszawie to niedziela 23:00 UTC
+        report = utilization.report(warsaw.localize(datetime(2030, 1, 7)), warsaw.localize(datetime(2030, 1, 8)))
+
+        assert (report['requested_start'], report['requested_end']) == \
+            (datetime(2030, 1, 6, 23), datetime(2030, 1, 7, 23))
+        assert (report['start'], report['end']) == (datetime(2030, 1, 6), datetime(2030, 1, 8))
+        assert report['instructors'][0]['offered_hours'] == 2
+
+    def test_changes_during_refresh_stay_pending(self, db, users, monkeypatch):
+        """Test that a day changed while refresh computes it is recomputed on the next run."""
+        instructor, _ = users
+        self.add_slots(instructor, [9])
+        day_totals = utilization._day_totals
+
+        def concurrent_change(days):
+            totals = day_totals(days)
+            UtilizationRollup.record([(instructor.id, self.MONDAY, None)])
+            return totals
+        monkeypatch.setattr(utilization, '_day_totals', concurrent_change)
+        utilization.refresh(batch_size=10)
+        monkeypatch.undo()
+
+        rollup = db.session.get(UtilizationRollup, (instructor.id, self.MONDAY.date()))
+        assert rollup.pending_changes == 1
+        assert rollup.slots == 1
+        assert utilization.refresh() == 1
+
+    def test_mark_all_backfills_days(self, db, users):
+        """Test that mark_all marks every day that has appointments."""
+        instructor, _ = users
+        db.session.add(Appointment(instructor_id=instructor.id, start_time=self.MONDAY,
+                                   end_time=self.MONDAY + timedelta(hours=1), is_available=True))
+        db.session.commit()
+
+        assert utilization.mark_all() == 1
+        assert utilization.refresh() == 1
+        rollup = db.session.get(UtilizationRollup, (instructor.id, date(2030, 1, 7)))
+        assert rollup.offered_seconds == 3600
@@ -1,8 +1,19 @@
+import fnmatch
+import sys
+
 import pytest
+from redis.exceptions import WatchError
+from sqlalchemy import event
+from flask import g
 from config import settings
 from calendarproject.app import create_app
 from calendarproject.extensions import db as _db
 
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "postgres: needs a throwaway Postgres database in TEST_POSTGRES_URL (skipped otherwise)"
+    )
+
 @pytest.fixture(scope="session")
 def app():
     """
@@ -50,4 +61,206 @@ def db(app):
         _db.session.execute(table.delete())
 
     _db.session.commit()
-    return _db
\ No newline at end of file
+    # Drop objects left in the identity map by the previous test (SQLite reuses ids),
+    # including the user Flask-Login cached on the shared application context
+    _db.session.remove()
+    g.pop('_login_user', None)
+    return _db
+
+class FakeRedis:
+    """
+    In-memory stand-in for the subset of the Redis client the app uses (strings,
+    hashes, sets, pipelines with WATCH). Expiry is recorded but never enforced.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.versions = {}
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, xx=False, ex=None, keepttl=False):
+        if (nx and key in self.data) or (xx and key not in self.data):
+            return None
+        self.data[key] = self._encode(value)
+        if ex is not None:
+            self.ttls[key] = ex
+        elif not keepttl:
+            self.ttls.pop(key, None)
+        self._touch(key)
+        return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = self._encode(value)
+        self._touch(key)
+        return value
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                deleted += 1
+                self._touch(key)
+        return deleted
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return key in self.data
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        hash_ = self.data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        for name, item in items.items():
+            hash_[self._encode(name)] = self._encode(item)
+        self._touch(key)
+        return len(items)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(self._encode(field))
+
+    def hmget(self, key, fields):
+        hash_ = self.data.get(key, {})
+        return [hash_.get(self._encode(field)) for field in fields]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hvals(self, key):
+        return list(self.data.get(key, {}).values())
+
+    def hdel(self, key, *fields):
+        hash_ = self.data.get(key, {})
+        removed = sum(hash_.pop(self._encode(field), None) is not None for field in fields)
+        self._touch(key)
+        return removed
+
+    def hincrby(self, key, field, amount=1):
+        hash_ = self.data.setdefault(key, {})
+        value = int(hash_.get(self._encode(field), 0)) + amount
+        hash_[self._encode(field)] = self._encode(value)
+        self._touch(key)
+        return value
+
+    def sadd(self, key, *members):
+        set_ = self.data.setdefault(key, set())
+        before = len(set_)
+        set_.update(self._encode(member) for member in members)
+        self._touch(key)
+        return len(set_) - before
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def spop(self, key, count=None):
+        set_ = self.data.get(key, set())
+        popped = [set_.pop() for _ in range(min(count or 1, len(set_)))]
+        if not set_:
+            self.data.pop(key, None)
+        self._touch(key)
+        return popped if count is not None else (popped[0] if popped else None)
+
+    def scan_iter(self, match='*', count=None):
+        return [key.encode() for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def ping(self):
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Buffers commands until execute(); after watch() commands run immediately until multi()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+        self.watched = {}
+        self.immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.reset()
+
+    def reset(self):
+        self.commands = []
+        self.watched = {}
+        self.immediate = False
+
+    def watch(self, *keys):
+        self.immediate = True
+        self.watched.update({key: self.client.versions.get(key, 0) for key in keys})
+
+    def multi(self):
+        self.immediate = False
+
+    def execute(self):
+        changed = any(self.client.versions.get(key, 0) != version for key, version in self.watched.items())
+        commands, self.commands = self.commands, []
+        self.watched = {}
+        if changed:
+            raise WatchError('Watched variable changed.')
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def command(*args, **kwargs):
+            if self.immediate:
+                return method(*args, **kwargs)
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+
+@pytest.fixture(scope="function")
+def fake_redis(monkeypatch):
+    """
+    Replace the shared Redis client with a FakeRedis in every app module that imported it.
+    """
+    from calendarproject.initializers import redis
+    fake = FakeRedis()
+    for module in list(sys.modules.values()):
+        if getattr(module, '__name__', '').startswith('calendarproject') and getattr(module, 'redis', None) is redis:
+            monkeypatch.setattr(module, 'redis', fake)
+    return fake
+
+
+@pytest.fixture(scope="function")
+def statements(app):
+    """
+    SQL statements executed while the test runs, for asserting which tables were queried.
+    """
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    engine = _db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)